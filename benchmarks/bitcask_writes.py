@@ -0,0 +1,49 @@
+"""Compare ``BitcaskCache`` with ``FileSystemCache`` for many small items.
+
+Every key is written, overwritten and read once. Run with::
+
+    python benchmarks/bitcask_writes.py --keys 100000
+"""
+
+import argparse
+import tempfile
+import typing as _t
+from time import perf_counter
+
+from cachelib import BitcaskCache
+from cachelib import FileSystemCache
+
+
+def measure(cache: _t.Any, keys: int) -> tuple[float, float]:
+    value = b"x" * 100
+    start = perf_counter()
+    for _ in range(2):
+        for i in range(keys):
+            cache.set(f"key-{i}", value)
+    writes = 2 * keys / (perf_counter() - start)
+    start = perf_counter()
+    for i in range(keys):
+        cache.get(f"key-{i}")
+    reads = keys / (perf_counter() - start)
+    return writes, reads
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"keys={args.keys}")
+    print(f"{'backend':>16} {'writes/s':>10} {'reads/s':>10}")
+    for name, cls in (
+        ("FileSystemCache", FileSystemCache),
+        ("BitcaskCache", BitcaskCache),
+    ):
+        with tempfile.TemporaryDirectory() as path:
+            cache = cls(path, threshold=0, default_timeout=0)
+            writes, reads = measure(cache, args.keys)
+        print(f"{name:>16} {writes:>10.0f} {reads:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Compare the cost of ``FileSystemCache.set`` once the cache is full,
+pruning by listing the whole directory and by ``eviction_samples``.
+
+The cache is filled up to its threshold, then every further ``set``
+has to delete a file first. Run with::
+
+    python benchmarks/fs_eviction.py --files 1000 10000 50000
+"""
+
+import argparse
+import tempfile
+from time import perf_counter
+
+from cachelib import FileSystemCache
+
+
+def time_full_sets(files: int, samples: int, shard_depth: int, sets: int) -> float:
+    with tempfile.TemporaryDirectory() as path:
+        cache = FileSystemCache(
+            path,
+            threshold=files,
+            default_timeout=0,
+            shard_depth=shard_depth,
+            eviction_samples=samples,
+        )
+        # fill without pruning, then switch the threshold on
+        cache._threshold = 0
+        for i in range(files):
+            cache.set(f"fill-{i}", i)
+        cache._threshold = files
+        start = perf_counter()
+        for i in range(sets):
+            cache.set(f"key-{i}", i)
+        return (perf_counter() - start) / sets
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--shard-depth", type=int, default=1)
+    parser.add_argument("--sets", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"samples={args.samples} shard_depth={args.shard_depth}")
+    print(f"{'files':>8} {'scan (ms/set)':>14} {'sampled (ms/set)':>17}")
+    for files in args.files:
+        scan = time_full_sets(files, 0, args.shard_depth, args.sets)
+        sampled = time_full_sets(files, args.samples, args.shard_depth, args.sets)
+        print(f"{files:>8} {scan * 1000:>14.2f} {sampled * 1000:>17.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare ``FileSystemCache.get`` latency with buffered reads and with
+the ``mmap_threshold`` read path, for values from 1 KB to 100 MB.
+
+``bytes`` values are pickled in-band. Arrays are pickled with their data
+out-of-band, using NumPy when it is installed and a minimal buffer
+holder otherwise. Run with::
+
+    python benchmarks/fs_large_values.py --sizes 1K 1M 100M
+"""
+
+import argparse
+import pickle
+import tempfile
+import typing as _t
+from time import perf_counter
+
+from cachelib import FileSystemCache
+
+UNITS = {"K": 1024, "M": 1024**2}
+
+
+class Array:
+    """Stand-in for a NumPy array, its data is pickled out-of-band."""
+
+    def __init__(self, data: _t.Any):
+        self.data = memoryview(data)
+
+    def __reduce_ex__(self, protocol: _t.SupportsIndex) -> _t.Any:
+        return Array, (pickle.PickleBuffer(self.data),)
+
+
+def make_array(size: int) -> _t.Any:
+    try:
+        import numpy
+    except ImportError:
+        return Array(bytearray(size))
+    return numpy.zeros(size, dtype=numpy.uint8)
+
+
+def parse_size(text: str) -> int:
+    unit = UNITS.get(text[-1].upper(), 1)
+    return int(text.rstrip("kKmM")) * unit
+
+
+def time_get(cache: FileSystemCache, key: str, size: int) -> float:
+    repeat = max(3, min(1000, 100 * 1024**2 // max(size, 1) // 10))
+    start = perf_counter()
+    for _ in range(repeat):
+        cache.get(key)
+    return (perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", nargs="+", default=["1K", "10K", "100K", "1M", "10M", "100M"]
+    )
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'kind':>6} {'buffered (ms)':>14} {'mmap (ms)':>10}")
+    for text in args.sizes:
+        size = parse_size(text)
+        for kind, value in (("bytes", b"x" * size), ("array", make_array(size))):
+            results = []
+            for threshold in (0, 1):
+                with tempfile.TemporaryDirectory() as path:
+                    cache = FileSystemCache(
+                        path, threshold=0, default_timeout=0, mmap_threshold=threshold
+                    )
+                    cache.set("value", value)
+                    results.append(time_get(cache, "value", size) * 1000)
+            print(f"{text:>6} {kind:>6} {results[0]:>14.3f} {results[1]:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Measure ``FileSystemCache.set`` throughput.
+
+Every process writes its own keys into one shared cache directory,
+overwrites them and deletes half of them again. The file count is
+checked against the number of files left. The counter file is compared
+with a baseline that keeps the count as a pickled cache item, read and
+rewritten by every set and delete without a lock, as the cache did
+before. Run with::
+
+    python benchmarks/fs_sets.py --processes 1 4
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import typing as _t
+from time import perf_counter
+
+from cachelib import FileSystemCache
+
+
+class PickledCountCache(FileSystemCache):
+    """Counts the files in a cache item like older versions."""
+
+    def _init_count(self) -> None:
+        self._update_count(value=len(list(self._list_dir())))
+
+    @property
+    def _file_count(self) -> int:
+        return self.get(self._fs_count_file) or 0
+
+    def _update_count(
+        self,
+        delta: int | None = None,
+        value: int | None = None,
+        size_delta: int = 0,
+        size_value: int | None = None,
+    ) -> None:
+        if value is not None:
+            new_count = value
+        elif delta:
+            new_count = self._file_count + delta
+        else:
+            return
+        self.set(self._fs_count_file, new_count, mgmt_element=True)
+
+
+CACHES: dict[str, type[FileSystemCache]] = {
+    "counter file": FileSystemCache,
+    "pickled count": PickledCountCache,
+}
+
+
+def worker(
+    cls: type[FileSystemCache],
+    path: str,
+    worker_id: int,
+    keys: int,
+    barrier: _t.Any,
+) -> None:
+    cache = cls(path, threshold=10 * keys)
+    barrier.wait()
+    for i in range(keys):
+        cache.set(f"key-{worker_id}-{i}", i)
+        cache.set(f"key-{worker_id}-{i}", i)
+    for i in range(0, keys, 2):
+        cache.delete(f"key-{worker_id}-{i}")
+
+
+def run(cls: type[FileSystemCache], processes: int, keys: int) -> tuple[float, int]:
+    with tempfile.TemporaryDirectory() as path:
+        cache = cls(path, threshold=10 * keys)
+        barrier = multiprocessing.Barrier(processes + 1)
+        workers = [
+            multiprocessing.Process(target=worker, args=(cls, path, i, keys, barrier))
+            for i in range(processes)
+        ]
+        for w in workers:
+            w.start()
+        barrier.wait()
+        start = perf_counter()
+        for w in workers:
+            w.join()
+        elapsed = perf_counter() - start
+        count = cache._file_count
+    return (2.5 * processes * keys) / elapsed, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--keys", type=int, default=2_000)
+    args = parser.parse_args()
+
+    print(f"keys per process={args.keys}")
+    print(f"{'cache':<14} {'processes':>10} {'ops/s':>12} {'count':>8} {'expected':>8}")
+    for name, cls in CACHES.items():
+        for processes in args.processes:
+            ops, count = run(cls, processes, args.keys)
+            expected = processes * (args.keys // 2)
+            print(f"{name:<14} {processes:>10} {ops:>12.0f} {count:>8} {expected:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Measure ``FileSystemCache.set`` throughput and the calls into the
+operating system each write makes.
+
+Keys are written once to create their files and a second time to replace
+them, with a counting threshold and with a threshold of 0. Calls are
+counted for the functions of :mod:`os` that map onto one system call,
+writes and closes of the buffered temporary file are not included. With
+``--strace`` the writes run under ``strace -c`` instead, which counts
+every system call. Run with::
+
+    python benchmarks/fs_writes.py --keys 5000
+"""
+
+import argparse
+import collections
+import functools
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import typing as _t
+from time import perf_counter
+
+from cachelib import FileSystemCache
+
+COUNTED = (
+    "chmod",
+    "close",
+    "fchmod",
+    "fdopen",
+    "fstat",
+    "link",
+    "lseek",
+    "open",
+    "pread",
+    "pwrite",
+    "read",
+    "remove",
+    "rename",
+    "replace",
+    "stat",
+    "utime",
+    "write",
+)
+
+calls: collections.Counter[str] = collections.Counter()
+
+
+def count_calls() -> None:
+    for name in COUNTED:
+        fn = getattr(os, name, None)
+        if fn is None:
+            continue
+
+        @functools.wraps(fn)
+        def counted(*args: _t.Any, _fn: _t.Any = fn, **kwargs: _t.Any) -> _t.Any:
+            calls[_fn.__name__] += 1
+            return _fn(*args, **kwargs)
+
+        setattr(os, name, counted)
+
+
+def run(threshold: int, keys: int) -> list[tuple[str, float, float]]:
+    results = []
+    with tempfile.TemporaryDirectory() as path:
+        cache = FileSystemCache(path, threshold=threshold, default_timeout=0)
+        for phase in ("create", "replace"):
+            calls.clear()
+            start = perf_counter()
+            for i in range(keys):
+                cache.set(f"key-{i}", i)
+            elapsed = perf_counter() - start
+            results.append((phase, keys / elapsed, sum(calls.values()) / keys))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=5_000)
+    parser.add_argument(
+        "--strace", action="store_true", help="count all system calls with strace"
+    )
+    parser.add_argument("--threshold", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.threshold is not None:
+        # a single run traced by strace
+        run(args.threshold, args.keys)
+        return
+    if args.strace:
+        if shutil.which("strace") is None:
+            sys.exit("strace is not installed")
+        for threshold in (10 * args.keys, 0):
+            print(f"threshold={threshold}")
+            subprocess.run(
+                ["strace", "-c", "-f", sys.executable, __file__]
+                + [f"--keys={args.keys}", f"--threshold={threshold}"],
+                check=True,
+            )
+        return
+
+    count_calls()
+    print(f"keys={args.keys}")
+    print(f"{'threshold':>10} {'phase':>8} {'writes/s':>10} {'calls/set':>10}")
+    for threshold in (10 * args.keys, 0):
+        for phase, rate, per_set in run(threshold, args.keys):
+            print(f"{threshold:>10} {phase:>8} {rate:>10.0f} {per_set:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
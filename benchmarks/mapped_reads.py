@@ -0,0 +1,72 @@
+"""Compare ``get`` throughput of ``MappedFileCache`` with the other caches
+that several processes can share.
+
+Every cache is filled with the same keys and read from one or more
+processes at once. Run with::
+
+    python benchmarks/mapped_reads.py --keys 1000 --processes 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import typing as _t
+from functools import partial
+from time import perf_counter
+
+from cachelib import BaseCache
+from cachelib import FileSystemCache
+from cachelib import MappedFileCache
+from cachelib import SharedMemoryCache
+from cachelib import SqliteCache
+
+
+def caches(path: str, keys: int) -> dict[str, _t.Callable[[], BaseCache]]:
+    options = {"threshold": 2 * keys, "default_timeout": 0}
+    return {
+        "mapped": partial(MappedFileCache, os.path.join(path, "mapped"), **options),
+        "shared_memory": partial(
+            SharedMemoryCache, os.path.join(path, "shm"), **options
+        ),
+        "sqlite": partial(SqliteCache, os.path.join(path, "sqlite"), **options),
+        "file": partial(FileSystemCache, os.path.join(path, "files"), **options),
+    }
+
+
+def read(factory: _t.Callable[[], BaseCache], keys: int, rounds: int) -> float:
+    cache = factory()
+    names = [f"key-{i}" for i in range(keys)]
+    start = perf_counter()
+    for _ in range(rounds):
+        for name in names:
+            cache.get(name)
+    return keys * rounds / (perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=1_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("fork")
+    print(f"keys={args.keys} processes={args.processes}")
+    print(f"{'cache':>14} {'reads/s':>12} {'total reads/s':>14}")
+    with tempfile.TemporaryDirectory() as path:
+        for name, factory in caches(path, args.keys).items():
+            cache = factory()
+            cache.set_many({f"key-{i}": {"id": i} for i in range(args.keys)})
+            single = read(factory, args.keys, args.rounds)
+            with context.Pool(args.processes) as pool:
+                total = sum(
+                    pool.starmap(
+                        read, [(factory, args.keys, args.rounds)] * args.processes
+                    )
+                )
+            print(f"{name:>14} {single:>12.0f} {total:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
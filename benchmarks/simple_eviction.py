@@ -0,0 +1,51 @@
+"""Compare ``SimpleCache.set`` latency between eviction policies.
+
+The cache is filled up to ``threshold`` first, so that every measured
+``set`` has to evict an item. Run with::
+
+    python benchmarks/simple_eviction.py --threshold 100000
+"""
+
+import argparse
+import statistics
+from time import perf_counter_ns
+
+from cachelib import SimpleCache
+
+# the names SimpleCache accepts as eviction_policy
+POLICIES = ["expires", "lru", "lfu", "w-tinylfu", "arc", "greedy-dual-size"]
+
+
+def measure(policy: str, threshold: int, operations: int) -> list[int]:
+    cache = SimpleCache(threshold=threshold, eviction_policy=policy)
+    for i in range(threshold):
+        cache.set(f"key-{i}", i, timeout=i % 600 + 1)
+
+    timings = []
+    for i in range(threshold, threshold + operations):
+        start = perf_counter_ns()
+        cache.set(f"key-{i}", i, timeout=i % 600 + 1)
+        timings.append(perf_counter_ns() - start)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threshold", type=int, default=100_000)
+    parser.add_argument("--operations", type=int, default=2_000)
+    parser.add_argument("--policies", nargs="+", default=POLICIES)
+    args = parser.parse_args()
+
+    print(f"threshold={args.threshold} operations={args.operations}")
+    print(f"{'policy':<18} {'p50 (us)':>12} {'p99 (us)':>12} {'max (us)':>12}")
+    for policy in args.policies:
+        timings = measure(policy, args.threshold, args.operations)
+        percentiles = statistics.quantiles(timings, n=100)
+        print(
+            f"{policy:<18} {percentiles[49] / 1000:>12.1f}"
+            f" {percentiles[98] / 1000:>12.1f} {max(timings) / 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Compare the hit ratio of ``SimpleCache`` eviction policies.
+
+Keys are requested following a Zipf distribution, every miss stores the
+key in the cache. Run with::
+
+    python benchmarks/simple_hit_ratio.py --keys 100000 --threshold 1000
+"""
+
+import argparse
+import random
+from itertools import accumulate
+
+from cachelib import SimpleCache
+
+# the names SimpleCache accepts as eviction_policy
+POLICIES = ["expires", "lru", "lfu", "w-tinylfu", "arc", "greedy-dual-size"]
+
+
+def zipf_keys(keys: int, exponent: float, requests: int, seed: int) -> list[str]:
+    weights = list(accumulate(1 / (rank**exponent) for rank in range(1, keys + 1)))
+    rng = random.Random(seed)
+    ranks = rng.choices(range(keys), cum_weights=weights, k=requests)
+    # shuffle the key space so popularity doesn't follow insertion order
+    names = [f"key-{i}" for i in range(keys)]
+    rng.shuffle(names)
+    return [names[rank] for rank in ranks]
+
+
+def hit_ratio(policy: str, threshold: int, trace: list[str]) -> float:
+    cache = SimpleCache(threshold=threshold, default_timeout=0, eviction_policy=policy)
+    hits = 0
+    for key in trace:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.set(key, key)
+    return hits / len(trace)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--threshold", type=int, default=1_000)
+    parser.add_argument("--requests", type=int, default=500_000)
+    parser.add_argument("--exponent", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policies", nargs="+", default=POLICIES)
+    args = parser.parse_args()
+
+    trace = zipf_keys(args.keys, args.exponent, args.requests, args.seed)
+    print(
+        f"keys={args.keys} threshold={args.threshold}"
+        f" requests={args.requests} exponent={args.exponent}"
+    )
+    print(f"{'policy':<18} {'hit ratio':>10}")
+    for policy in args.policies:
+        print(f"{policy:<18} {hit_ratio(policy, args.threshold, trace):>10.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compare ``SimpleCache`` and ``ShardedSimpleCache`` throughput as the
+number of threads grows.
+
+Each thread runs a mix of 90% ``get`` and 10% ``set`` over a shared key
+space. Run with::
+
+    python benchmarks/simple_threads.py --threads 1 4 16 64
+"""
+
+import argparse
+import random
+import threading
+from time import perf_counter
+
+from cachelib import ShardedSimpleCache
+from cachelib import SimpleCache
+from cachelib.base import BaseCache
+
+VALUE = {"name": "value", "items": list(range(50))}
+
+
+def run(cache: BaseCache, threads: int, operations: int, keys: int) -> float:
+    for i in range(keys):
+        cache.set(f"key-{i}", VALUE)
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        names = [f"key-{rng.randrange(keys)}" for _ in range(operations)]
+        barrier.wait()
+        for i, name in enumerate(names):
+            if i % 10 == 0:
+                cache.set(name, VALUE)
+            else:
+                cache.get(name)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = perf_counter()
+    for w in workers:
+        w.join()
+    return threads * operations / (perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--operations", type=int, default=20_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"operations per thread={args.operations} keys={args.keys}")
+    print(f"{'threads':>8} {'SimpleCache (ops/s)':>22} {'Sharded (ops/s)':>22}")
+    for threads in args.threads:
+        simple = run(
+            SimpleCache(threshold=2 * args.keys), threads, args.operations, args.keys
+        )
+        sharded = run(
+            ShardedSimpleCache(threshold=2 * args.keys, shards=args.shards),
+            threads,
+            args.operations,
+            args.keys,
+        )
+        print(f"{threads:>8} {simple:>22,.0f} {sharded:>22,.0f}")
+
+
+if __name__ == "__main__":
+    main()
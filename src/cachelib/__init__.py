@@ -1,24 +1,40 @@
+from cachelib.asynchronous import AsyncCache
 from cachelib.base import BaseCache
 from cachelib.base import NullCache
+from cachelib.bitcask import BitcaskCache
 from cachelib.dynamodb import DynamoDbCache
 from cachelib.file import FileSystemCache
+from cachelib.mapped import MappedFileCache
 from cachelib.memcached import MemcachedCache
 from cachelib.mongodb import MongoDbCache
+from cachelib.redis import AsyncRedisCache
 from cachelib.redis import RedisCache
+from cachelib.shared_memory import SharedMemoryCache
+from cachelib.simple import ShardedSimpleCache
 from cachelib.simple import SimpleCache
+from cachelib.sqlite import SqliteCache
 from cachelib.uwsgi import UWSGICache
+from cachelib.valkey import AsyncValkeyCache
 from cachelib.valkey import ValkeyCache
 
 __all__ = [
     "BaseCache",
     "NullCache",
+    "AsyncCache",
     "SimpleCache",
+    "ShardedSimpleCache",
+    "SharedMemoryCache",
     "FileSystemCache",
+    "SqliteCache",
+    "BitcaskCache",
+    "MappedFileCache",
     "MemcachedCache",
     "RedisCache",
+    "AsyncRedisCache",
     "UWSGICache",
     "DynamoDbCache",
     "MongoDbCache",
     "ValkeyCache",
+    "AsyncValkeyCache",
 ]
 __version__ = "0.15.4"
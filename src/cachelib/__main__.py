@@ -0,0 +1,62 @@
+"""Maintenance commands for caches that live outside of the process.
+
+``python -m cachelib prune CACHE_DIR`` removes the expired files of a
+:class:`~cachelib.file.FileSystemCache` and enforces its limits, so it
+can run from cron or a sidecar while the application creates its caches
+with ``prune_on_set=False``. The layout options must match the ones the
+application uses.
+"""
+
+import argparse
+import logging
+import typing as _t
+from time import sleep
+
+from cachelib.file import FileSystemCache
+
+
+def prune(args: argparse.Namespace) -> None:
+    cache = FileSystemCache(
+        args.cache_dir,
+        threshold=args.threshold,
+        max_bytes=args.max_bytes,
+        use_index=args.use_index,
+        shard_depth=args.shard_depth,
+        expiry_in_mtime=args.expiry_in_mtime,
+        prune_on_set=False,
+    )
+    while True:
+        cache._clean_up()
+        if args.interval <= 0:
+            return
+        sleep(args.interval)
+
+
+def main(argv: _t.Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m cachelib")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parser_prune = commands.add_parser(
+        "prune", help="remove expired files and enforce the limits of a cache_dir"
+    )
+    parser_prune.add_argument("cache_dir")
+    parser_prune.add_argument("--threshold", type=int, default=500)
+    parser_prune.add_argument("--max-bytes", type=int, default=0)
+    parser_prune.add_argument("--use-index", action="store_true")
+    parser_prune.add_argument("--shard-depth", type=int, default=0)
+    parser_prune.add_argument("--expiry-in-mtime", action="store_true")
+    parser_prune.add_argument(
+        "--interval",
+        type=float,
+        default=0,
+        help="keep running and prune every INTERVAL seconds",
+    )
+    parser_prune.set_defaults(run=prune)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
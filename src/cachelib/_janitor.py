@@ -0,0 +1,29 @@
+import logging
+import threading
+import typing as _t
+import weakref
+
+
+def start_janitor(cache: _t.Any, interval: float) -> threading.Thread:
+    """Start a daemon thread calling ``cache._clean_up()`` every ``interval``
+    seconds. The thread doesn't keep the cache alive and exits once the
+    cache has been garbage collected.
+    """
+    ref = weakref.ref(cache)
+    stop = threading.Event()
+
+    def run() -> None:
+        while not stop.wait(interval):
+            cache = ref()
+            if cache is None:
+                return
+            try:
+                cache._clean_up()
+            except Exception:
+                logging.warning("Exception raised by the cache janitor", exc_info=True)
+            del cache
+
+    thread = threading.Thread(target=run, name="cachelib-janitor", daemon=True)
+    thread.start()
+    weakref.finalize(cache, stop.set)
+    return thread
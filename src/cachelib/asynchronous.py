@@ -0,0 +1,160 @@
+import asyncio
+import functools
+import os
+import typing as _t
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from cachelib.base import BaseCache
+from cachelib.base import NullCache
+from cachelib.simple import ShardedSimpleCache
+from cachelib.simple import SimpleCache
+
+_T = _t.TypeVar("_T")
+
+# caches that keep their items in memory and don't block on I/O
+_IN_MEMORY = (NullCache, SimpleCache, ShardedSimpleCache)
+
+
+class AsyncCache:
+    """Wraps any cache to use it from asyncio code, with the API of
+    :class:`~cachelib.base.BaseCache` as coroutines.
+
+    Calls into the wrapped cache run on threads of their own, so blocking
+    backends such as :class:`~cachelib.file.FileSystemCache` or
+    :class:`~cachelib.mongodb.MongoDbCache` don't block the event loop and
+    don't take the threads of the default executor. Caches that keep their
+    items in memory are called directly on the event loop instead. Batches
+    are passed to the batch methods of the wrapped cache in one call.
+
+    Concurrent :meth:`get` calls for the same key share one call into the
+    wrapped cache and return the same object, a write to the key from this
+    wrapper lets the next :meth:`get` read it again.
+
+    For Redis and Valkey use :class:`~cachelib.redis.AsyncRedisCache` and
+    :class:`~cachelib.valkey.AsyncValkeyCache`, which don't need threads.
+
+    :param cache: the cache to wrap.
+    :param max_workers: the number of threads calling into the cache.
+    :param inline: whether to call the cache on the event loop. By default
+        only caches in memory are.
+    :param coalesce_reads: whether concurrent :meth:`get` calls for the same
+        key share one call into the cache.
+    """
+
+    def __init__(
+        self,
+        cache: BaseCache,
+        max_workers: int = 4,
+        inline: bool | None = None,
+        coalesce_reads: bool = True,
+    ):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.cache = cache
+        self._max_workers = max_workers
+        if inline is None:
+            inline = isinstance(cache, _IN_MEMORY)
+        self._inline = inline
+        self._coalesce_reads = coalesce_reads and not inline
+        self._reads: dict[str, asyncio.Future[_t.Any]] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_pid = -1
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # a forked process doesn't have the threads of its parent
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(
+                self._max_workers, thread_name_prefix="cachelib-async"
+            )
+            self._executor_pid = os.getpid()
+            weakref.finalize(self, self._executor.shutdown, wait=False)
+        return self._executor
+
+    def _submit(self, fn: _t.Callable[..., _T], *args: _t.Any) -> "asyncio.Future[_T]":
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._get_executor(), fn, *args)
+
+    async def _call(self, fn: _t.Callable[..., _T], *args: _t.Any) -> _T:
+        if self._inline:
+            return fn(*args)
+        return await self._submit(fn, *args)
+
+    def _forget(self, *keys: str) -> None:
+        """Let the next reads of the keys call into the cache again."""
+        if self._reads:
+            for key in keys:
+                self._reads.pop(key, None)
+
+    def _read_done(self, key: str, future: "asyncio.Future[_t.Any]") -> None:
+        if self._reads.get(key) is future:
+            del self._reads[key]
+
+    async def get(self, key: str) -> _t.Any:
+        if not self._coalesce_reads:
+            return await self._call(self.cache.get, key)
+        future = self._reads.get(key)
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            future = self._submit(self.cache.get, key)
+            self._reads[key] = future
+            future.add_done_callback(functools.partial(self._read_done, key))
+        # a cancelled caller must not cancel the read of the others
+        return await asyncio.shield(future)
+
+    async def get_many(self, *keys: str) -> list[_t.Any]:
+        return await self._call(self.cache.get_many, *keys)
+
+    async def get_dict(self, *keys: str) -> dict[str, _t.Any]:
+        return await self._call(self.cache.get_dict, *keys)
+
+    async def set(
+        self, key: str, value: _t.Any, timeout: int | None = None
+    ) -> bool | None:
+        self._forget(key)
+        return await self._call(self.cache.set, key, value, timeout)
+
+    async def add(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
+        self._forget(key)
+        return await self._call(self.cache.add, key, value, timeout)
+
+    async def set_many(
+        self, mapping: dict[str, _t.Any], timeout: int | None = None
+    ) -> list[_t.Any]:
+        self._forget(*mapping)
+        return await self._call(self.cache.set_many, mapping, timeout)
+
+    async def delete(self, key: str) -> bool:
+        self._forget(key)
+        return await self._call(self.cache.delete, key)
+
+    async def delete_many(self, *keys: str) -> list[_t.Any]:
+        self._forget(*keys)
+        return await self._call(self.cache.delete_many, *keys)
+
+    async def has(self, key: str) -> bool:
+        return await self._call(self.cache.has, key)
+
+    async def has_many(self, *keys: str) -> list[bool]:
+        return await self._call(self.cache.has_many, *keys)
+
+    async def clear(self) -> bool:
+        self._reads.clear()
+        return await self._call(self.cache.clear)
+
+    async def inc(self, key: str, delta: int = 1) -> int | None:
+        self._forget(key)
+        return await self._call(self.cache.inc, key, delta)
+
+    async def dec(self, key: str, delta: int = 1) -> int | None:
+        self._forget(key)
+        return await self._call(self.cache.dec, key, delta)
+
+    async def aclose(self) -> None:
+        """Wait for the calls into the cache to finish and stop the
+        threads.
+        """
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(executor.shutdown, wait=True)
+            )
@@ -131,6 +131,17 @@ class BaseCache:
             "explicitly if you don't care about performance."
         )
 
+    def has_many(self, *keys: str) -> list[bool]:
+        """Checks which of the given keys exist in the cache. Has the same
+        requirements as :meth:`has`::
+
+            has_foo, has_bar = cache.has_many("foo", "bar")
+
+        :param keys: The function accepts multiple keys as positional
+            arguments.
+        """
+        return [self.has(k) for k in keys]
+
     def clear(self) -> bool:
         """Clears the cache.  Keep in mind that not all caches support
         completely clearing the cache.
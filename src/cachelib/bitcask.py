@@ -0,0 +1,492 @@
+import logging
+import os
+import struct
+import sys
+import threading
+import typing as _t
+import weakref
+import zlib
+from time import time
+
+from cachelib._janitor import start_janitor
+from cachelib.base import BaseCache
+from cachelib.serializers import BitcaskSerializer
+
+# checksum, expiry timestamp, key length and value length of a record,
+# followed by the key and the value
+_RECORD = struct.Struct("<IIHI")
+# expiry timestamp, value offset, value length and key length of a hint,
+# followed by the key
+_HINT = struct.Struct("<IQIH")
+# value length of a record deleting its key
+_TOMBSTONE = 0xFFFFFFFF
+# the longest key in bytes a record can hold
+_MAX_KEY_LENGTH = 0xFFFF
+_DATA_SUFFIX = ".data"
+_HINT_SUFFIX = ".hint"
+_LOCK_FILE = "LOCK"
+
+
+def _close_all(fds: dict[int, int]) -> None:
+    for fd in fds.values():
+        os.close(fd)
+    fds.clear()
+
+
+class BitcaskCache(BaseCache):
+    """A cache that appends its items to segment files, like the Bitcask
+    storage engine. Every write is a single append to the active segment,
+    and an in-memory directory of where each value is stored lets a read
+    take a single ``pread``. This suits write-heavy caches of many small
+    items, which :class:`~cachelib.file.FileSystemCache` stores in one file
+    each.
+
+    Once the active segment reaches ``segment_bytes`` it is sealed and a
+    hint file listing its records is written next to it, so the directory
+    is rebuilt from the hint files when the cache is opened again. Sealed
+    segments are compacted when more than ``compaction_ratio`` of their
+    bytes belong to expired, overwritten or deleted items: a background
+    thread copies the live items to the active segment and removes the old
+    files. Moved items keep their place in the eviction order, though a
+    cache opened again orders its items by where they are stored.
+
+    Only one process can use a directory at a time, the threads of that
+    process can share the cache.
+
+    :param path: the directory of the segment files, created if needed.
+    :param threshold: the maximum number of items the cache stores before
+        it starts deleting some. Expired items go first, then the items
+        written the longest time ago. A threshold value of 0 indicates no
+        threshold.
+    :param default_timeout: the default timeout that is used if no timeout is
+        specified on :meth:`~BaseCache.set`. A timeout of
+        0 indicates that the cache never expires.
+    :param segment_bytes: the size at which a segment is sealed and the next
+        one started.
+    :param compaction_ratio: the share of dead bytes in the sealed segments
+        that triggers a compaction.
+    :param janitor_interval: if greater than 0, expired items are removed and
+        segments are compacted every ``janitor_interval`` seconds by a
+        background thread, instead of when a segment is sealed.
+    """
+
+    serializer = BitcaskSerializer()
+
+    #: the number of items the janitor moves per lock acquisition
+    _janitor_slice = 256
+
+    def __init__(
+        self,
+        path: str,
+        threshold: int = 500,
+        default_timeout: int = 300,
+        segment_bytes: int = 64 * 1024 * 1024,
+        compaction_ratio: float = 0.5,
+        janitor_interval: float = 0,
+    ):
+        BaseCache.__init__(self, default_timeout)
+        self._path = path
+        self._threshold = threshold
+        self._segment_bytes = segment_bytes
+        self._compaction_ratio = compaction_ratio
+        os.makedirs(path, exist_ok=True)
+
+        #: key -> (segment, value offset, value length, expires)
+        self._keydir: dict[str, tuple[int, int, int, int]] = {}
+        #: segment -> size and bytes of records that are no longer needed
+        self._sizes: dict[int, int] = {}
+        self._dead: dict[int, int] = {}
+        self._hints: list[bytes] = []
+        self._fds: dict[int, int] = {}
+        self._lock = threading.RLock()
+        self._compacting = False
+        #: no item expires before this, so the directory is only searched
+        #: for expired items once it has passed
+        self._earliest_expiry: float = 0
+        #: incremented by clear(), which stops a compaction in progress
+        self._generation = 0
+        self._compactor: threading.Thread | None = None
+        self._janitor: threading.Thread | None = None
+        weakref.finalize(self, _close_all, self._fds)
+
+        self._lock_directory()
+        self._load()
+        self._active = max(self._sizes, default=0) + 1
+        self._open_segment(self._active)
+
+        if janitor_interval > 0:
+            self._janitor = start_janitor(self, janitor_interval)
+
+    def _lock_directory(self) -> None:
+        fd = os.open(os.path.join(self._path, _LOCK_FILE), os.O_RDWR | os.O_CREAT)
+        weakref.finalize(self, os.close, fd)
+        if sys.platform == "win32":
+            return
+        import fcntl
+
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            raise RuntimeError(
+                f"the cache directory {self._path!r} is used by another process"
+            ) from e
+
+    def _segment_path(self, segment: int, suffix: str = _DATA_SUFFIX) -> str:
+        return os.path.join(self._path, f"{segment:010d}{suffix}")
+
+    def _open_segment(self, segment: int) -> None:
+        flags = os.O_RDWR | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0)
+        self._fds[segment] = os.open(self._segment_path(segment), flags, 0o600)
+        self._sizes.setdefault(segment, 0)
+        self._dead.setdefault(segment, 0)
+        self._hints = []
+
+    def _fd(self, segment: int) -> int:
+        fd = self._fds.get(segment)
+        if fd is None:
+            flags = os.O_RDONLY | getattr(os, "O_BINARY", 0)
+            fd = self._fds[segment] = os.open(self._segment_path(segment), flags)
+        return fd
+
+    def _load(self) -> None:
+        """Rebuild the key directory from the hint files, and from the
+        records of segments without one.
+        """
+        segments = sorted(
+            int(name[: -len(_DATA_SUFFIX)])
+            for name in os.listdir(self._path)
+            if name.endswith(_DATA_SUFFIX)
+        )
+        now = time()
+        for segment in segments:
+            self._sizes[segment] = os.path.getsize(self._segment_path(segment))
+            self._dead[segment] = 0
+            try:
+                with open(self._segment_path(segment, _HINT_SUFFIX), "rb") as f:
+                    entries = self._parse_hints(f.read())
+            except FileNotFoundError:
+                entries = self._parse_records(segment)
+            for key, offset, length, expires in entries:
+                self._discard(key)
+                if length == _TOMBSTONE:
+                    self._dead[segment] += _RECORD.size + len(key.encode())
+                elif expires != 0 and expires <= now:
+                    self._dead[segment] += _RECORD.size + len(key.encode()) + length
+                else:
+                    self._keydir[key] = (segment, offset, length, expires)
+
+    def _parse_hints(self, data: bytes) -> list[tuple[str, int, int, int]]:
+        entries = []
+        pos = 0
+        while pos + _HINT.size <= len(data):
+            expires, offset, length, klen = _HINT.unpack_from(data, pos)
+            pos += _HINT.size
+            key = data[pos : pos + klen].decode()
+            pos += klen
+            entries.append((key, offset, length, expires))
+        return entries
+
+    def _parse_records(self, segment: int) -> list[tuple[str, int, int, int]]:
+        """Read the records of a segment up to the first incomplete or
+        corrupt one, which a crash can leave at its end.
+        """
+        with open(self._segment_path(segment), "rb") as f:
+            data = f.read()
+        entries = []
+        pos = 0
+        while pos + _RECORD.size <= len(data):
+            crc, expires, klen, length = _RECORD.unpack_from(data, pos)
+            start = pos + _RECORD.size
+            end = start + klen + (0 if length == _TOMBSTONE else length)
+            if end > len(data) or zlib.crc32(data[pos + 4 : end]) != crc:
+                break
+            key = data[start : start + klen].decode()
+            entries.append((key, start + klen, length, expires))
+            pos = end
+        if pos < len(data):
+            os.truncate(self._segment_path(segment), pos)
+            self._sizes[segment] = pos
+        return entries
+
+    def _discard(self, key: str) -> bool:
+        """Drop a key from the directory and count its record as dead."""
+        entry = self._keydir.pop(key, None)
+        if entry is None:
+            return False
+        segment, _, length, _ = entry
+        self._dead[segment] += _RECORD.size + len(key.encode()) + length
+        return True
+
+    def _write(self, key: str, value: bytes | None, expires: int) -> int:
+        """Append a record, or a tombstone if ``value`` is ``None``, with a
+        single write to the active segment and return the offset of the
+        value.
+        """
+        bkey = key.encode()
+        length = _TOMBSTONE if value is None else len(value)
+        body = _RECORD.pack(0, expires, len(bkey), length)[4:] + bkey + (value or b"")
+        record = struct.pack("<I", zlib.crc32(body)) + body
+        segment = self._active
+        offset = self._sizes[segment]
+        os.write(self._fds[segment], record)
+        self._sizes[segment] += len(record)
+        value_offset = offset + _RECORD.size + len(bkey)
+        self._hints.append(_HINT.pack(expires, value_offset, length, len(bkey)) + bkey)
+        return value_offset
+
+    def _append(self, key: str, value: bytes | None, expires: int) -> None:
+        segment = self._active
+        value_offset = self._write(key, value, expires)
+        self._discard(key)
+        if value is None:
+            self._dead[segment] += _RECORD.size + len(key.encode())
+        else:
+            self._keydir[key] = (segment, value_offset, len(value), expires)
+            if expires != 0:
+                self._earliest_expiry = min(self._earliest_expiry, expires)
+        self._seal_if_full()
+
+    def _seal_if_full(self) -> None:
+        if self._sizes[self._active] >= self._segment_bytes:
+            self._seal()
+
+    def _seal(self) -> None:
+        """Write the hint file of the active segment and start a new one."""
+        segment = self._active
+        hint = self._segment_path(segment, _HINT_SUFFIX)
+        with open(f"{hint}.tmp", "wb") as f:
+            f.write(b"".join(self._hints))
+        os.replace(f"{hint}.tmp", hint)
+        os.close(self._fds.pop(segment))
+        self._active += 1
+        self._open_segment(self._active)
+        if self._janitor is None and self._compactor is None:
+            if self._compaction_needed():
+                self._compactor = threading.Thread(
+                    target=self._run_compaction,
+                    name="cachelib-bitcask-compaction",
+                    daemon=True,
+                )
+                self._compactor.start()
+
+    def _read(self, segment: int, offset: int, length: int) -> bytes:
+        fd = self._fd(segment)
+        if sys.platform == "win32":
+            os.lseek(fd, offset, os.SEEK_SET)
+            return os.read(fd, length)
+        return os.pread(fd, length, offset)
+
+    def _compaction_needed(self) -> bool:
+        sealed = [s for s in self._sizes if s < self._active]
+        total = sum(self._sizes[s] for s in sealed)
+        dead = sum(self._dead[s] for s in sealed)
+        return bool(sealed) and dead > self._compaction_ratio * total
+
+    def _run_compaction(self) -> None:
+        """Compact the segments until enough of them is live. Run by the
+        thread a full segment starts when there is no janitor.
+        """
+        while True:
+            with self._lock:
+                if not self._compaction_needed():
+                    self._compactor = None
+                    return
+            try:
+                self._compact()
+            except Exception:
+                logging.warning("Exception raised while compacting", exc_info=True)
+                with self._lock:
+                    self._compactor = None
+                return
+
+    def _compact(self) -> None:
+        """Copy the live items of the sealed segments to the active one and
+        remove the sealed segments, if enough of them is dead. All sealed
+        segments are compacted together, so no tombstone is dropped while
+        an older record of its key remains.
+        """
+        with self._lock:
+            if self._compacting or not self._compaction_needed():
+                return
+            self._compacting = True
+            generation = self._generation
+            sealed = sorted(s for s in self._sizes if s < self._active)
+            last = sealed[-1]
+            keys = [k for k, entry in self._keydir.items() if entry[0] <= last]
+        try:
+            self._move_items(keys, last, generation)
+        finally:
+            with self._lock:
+                self._compacting = False
+        with self._lock:
+            if generation != self._generation:
+                # clear() removed the segments
+                return
+            # oldest first, so a crash doesn't leave a tombstone removed
+            # while the record it deletes remains
+            for segment in sealed:
+                fd = self._fds.pop(segment, None)
+                if fd is not None:
+                    os.close(fd)
+                os.remove(self._segment_path(segment))
+                try:
+                    os.remove(self._segment_path(segment, _HINT_SUFFIX))
+                except FileNotFoundError:
+                    pass
+                del self._sizes[segment]
+                del self._dead[segment]
+
+    def _move_items(self, keys: list[str], last: int, generation: int) -> None:
+        """Copy the items still stored in segments up to ``last`` to the
+        active segment, a slice at a time. The items keep their place in
+        the directory, which is the order they are evicted in.
+        """
+        now = time()
+        for i in range(0, len(keys), self._janitor_slice):
+            with self._lock:
+                if generation != self._generation:
+                    return
+                for key in keys[i : i + self._janitor_slice]:
+                    entry = self._keydir.get(key)
+                    if entry is None or entry[0] > last:
+                        continue
+                    segment, offset, length, expires = entry
+                    if expires != 0 and expires <= now:
+                        self._discard(key)
+                        continue
+                    data = self._read(segment, offset, length)
+                    active = self._active
+                    value_offset = self._write(key, data, expires)
+                    self._dead[segment] += _RECORD.size + len(key.encode()) + length
+                    self._keydir[key] = (active, value_offset, length, expires)
+                    self._seal_if_full()
+
+    def _clean_up(self) -> None:
+        """Remove the expired items and compact the segments. Called
+        periodically by the janitor thread.
+        """
+        with self._lock:
+            self._remove_expired(time())
+        self._compact()
+
+    def _remove_expired(self, now: float) -> None:
+        earliest = float("inf")
+        expired = []
+        for key, (_, _, _, expires) in self._keydir.items():
+            if expires == 0:
+                continue
+            if expires <= now:
+                expired.append(key)
+            else:
+                earliest = min(earliest, expires)
+        # an expired record is dead without a tombstone
+        for key in expired:
+            self._discard(key)
+        self._earliest_expiry = earliest
+
+    def _prune(self) -> None:
+        if self._threshold == 0 or len(self._keydir) < self._threshold:
+            return
+        now = time()
+        if self._earliest_expiry <= now:
+            self._remove_expired(now)
+        # the oldest writes come first in the directory
+        while len(self._keydir) >= self._threshold:
+            self._append(next(iter(self._keydir)), None, 0)
+
+    def _normalize_timeout(self, timeout: int | None) -> int:
+        timeout = BaseCache._normalize_timeout(self, timeout)
+        if timeout != 0:
+            timeout = int(time()) + timeout
+        return int(timeout)
+
+    def _lookup(self, key: str) -> tuple[int, int, int, int] | None:
+        entry = self._keydir.get(key)
+        if entry is None:
+            return None
+        expires = entry[3]
+        if expires != 0 and expires <= time():
+            return None
+        return entry
+
+    def _dumps(self, key: str, value: _t.Any) -> bytes | None:
+        """Serialize a value, or return ``None`` if it or its key can't be
+        stored.
+        """
+        if len(key.encode()) > _MAX_KEY_LENGTH:
+            logging.warning("Key longer than %d bytes is not cached", _MAX_KEY_LENGTH)
+            return None
+        return self.serializer.dumps(value)
+
+    def get(self, key: str) -> _t.Any:
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                return None
+            data = self._read(*entry[:3])
+        return self.serializer.loads(data)
+
+    def set(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
+        payload = self._dumps(key, value)
+        if payload is None:
+            return False
+        expires = self._normalize_timeout(timeout)
+        with self._lock:
+            if key not in self._keydir:
+                self._prune()
+            self._append(key, payload, expires)
+        return True
+
+    def add(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
+        payload = self._dumps(key, value)
+        if payload is None:
+            return False
+        expires = self._normalize_timeout(timeout)
+        with self._lock:
+            if self._lookup(key) is not None:
+                return False
+            if key not in self._keydir:
+                self._prune()
+            self._append(key, payload, expires)
+        return True
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._keydir:
+                return False
+            self._append(key, None, 0)
+        return True
+
+    def has(self, key: str) -> bool:
+        with self._lock:
+            return self._lookup(key) is not None
+
+    def clear(self) -> bool:
+        with self._lock:
+            for segment in list(self._sizes):
+                fd = self._fds.pop(segment, None)
+                if fd is not None:
+                    os.close(fd)
+                os.remove(self._segment_path(segment))
+                try:
+                    os.remove(self._segment_path(segment, _HINT_SUFFIX))
+                except FileNotFoundError:
+                    pass
+            self._keydir.clear()
+            self._sizes.clear()
+            self._dead.clear()
+            self._generation += 1
+            self._active += 1
+            self._open_segment(self._active)
+        return True
+
+    def _add_delta(self, key: str, delta: int) -> int | None:
+        with self._lock:
+            value = (self.get(key) or 0) + delta
+            return value if self.set(key, value) else None
+
+    def inc(self, key: str, delta: int = 1) -> int | None:
+        return self._add_delta(key, delta)
+
+    def dec(self, key: str, delta: int = 1) -> int | None:
+        return self._add_delta(key, -delta)
@@ -0,0 +1,502 @@
+import copy
+import heapq
+import typing as _t
+from collections import OrderedDict
+from itertools import count
+
+
+class EvictionPolicy:
+    """Base class for the eviction policies used by :class:`.SimpleCache`.
+
+    A policy keeps track of the keys stored in a cache and decides which one
+    is deleted when the cache goes over its threshold. The cache calls the
+    hooks below while holding its lock, so implementations don't need to be
+    thread-safe themselves. A policy instance must not be shared between
+    caches.
+    """
+
+    #: the number of items the cache holds before it starts evicting
+    capacity: int = 0
+
+    #: whether the policy implements :meth:`expired`. Otherwise the cache
+    #: keeps track of the expiry times of its items itself.
+    tracks_expiry: bool = False
+
+    def resize(self, capacity: int) -> None:
+        """Called by the cache with its threshold before it is used."""
+        self.capacity = capacity
+
+    def on_get(self, key: str) -> None:
+        """Called after a successful lookup of ``key``."""
+
+    def on_set(self, key: str, expires: int, size: int) -> None:
+        """Called after ``key`` has been stored or overwritten.
+
+        :param key: the key that was stored.
+        :param expires: the absolute expiry timestamp, 0 if it never expires.
+        :param size: the size of the stored value in bytes.
+        """
+
+    def on_delete(self, key: str) -> None:
+        """Called after ``key`` has been removed from the cache for any
+        other reason than being returned by :meth:`victim`.
+        """
+
+    def victim(self) -> str | None:
+        """Return the next key to evict and forget about it, or ``None`` if
+        the policy doesn't track any keys.
+        """
+        raise NotImplementedError()
+
+    def expired(self, now: float) -> str | None:
+        """Return a key whose item expired before ``now`` and forget about
+        it, or ``None`` if there is none. Only called if
+        :attr:`tracks_expiry` is set.
+        """
+        raise NotImplementedError()
+
+    def clear(self) -> None:
+        """Called when the cache is cleared."""
+
+
+class ExpiresPolicy(EvictionPolicy):
+    """Evicts the items that are closest to expiring first, items that
+    never expire go first. This is the default policy of
+    :class:`.SimpleCache`, which also finds its expired items through it.
+    """
+
+    tracks_expiry = True
+
+    def __init__(self) -> None:
+        self._expires: dict[str, int] = {}
+        # the keys that never expire, oldest first
+        self._forever: dict[str, None] = {}
+        self._heap: list[tuple[int, int, str]] = []
+        self._counter = count()
+
+    def on_set(self, key: str, expires: int, size: int) -> None:
+        self.on_delete(key)
+        if expires == 0:
+            self._forever[key] = None
+            return
+        self._expires[key] = expires
+        heapq.heappush(self._heap, (expires, next(self._counter), key))
+        # drop stale entries once they outnumber the live ones
+        if len(self._heap) > 2 * len(self._expires) + 64:
+            self._heap = [(e, next(self._counter), k) for k, e in self._expires.items()]
+            heapq.heapify(self._heap)
+
+    def on_delete(self, key: str) -> None:
+        self._expires.pop(key, None)
+        self._forever.pop(key, None)
+
+    def _pop(self, now: float | None = None) -> str | None:
+        heap = self._heap
+        while heap and (now is None or heap[0][0] < now):
+            expires, _, key = heapq.heappop(heap)
+            if self._expires.get(key) == expires:
+                del self._expires[key]
+                return key
+        return None
+
+    def victim(self) -> str | None:
+        if self._forever:
+            key = next(iter(self._forever))
+            del self._forever[key]
+            return key
+        return self._pop()
+
+    def expired(self, now: float) -> str | None:
+        return self._pop(now)
+
+    def clear(self) -> None:
+        self._expires.clear()
+        self._forever.clear()
+        self._heap.clear()
+
+
+class LRUPolicy(EvictionPolicy):
+    """Evicts the least recently used items first. Every operation is
+    ``O(1)``.
+    """
+
+    def __init__(self) -> None:
+        self._keys: OrderedDict[str, None] = OrderedDict()
+
+    def on_get(self, key: str) -> None:
+        self._keys.move_to_end(key)
+
+    def on_set(self, key: str, expires: int, size: int) -> None:
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+
+    def on_delete(self, key: str) -> None:
+        self._keys.pop(key, None)
+
+    def victim(self) -> str | None:
+        if not self._keys:
+            return None
+        return self._keys.popitem(last=False)[0]
+
+    def clear(self) -> None:
+        self._keys.clear()
+
+
+class LFUPolicy(EvictionPolicy):
+    """Evicts the least frequently used items first, breaking ties by
+    evicting the least recently used one. Every operation is ``O(1)``.
+    """
+
+    def __init__(self) -> None:
+        self._freq: dict[str, int] = {}
+        self._buckets: dict[int, OrderedDict[str, None]] = {}
+        self._min_freq = 0
+
+    def _unlink(self, key: str, freq: int) -> None:
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+
+    def _link(self, key: str, freq: int) -> None:
+        self._freq[key] = freq
+        self._buckets.setdefault(freq, OrderedDict())[key] = None
+
+    def on_get(self, key: str) -> None:
+        freq = self._freq[key]
+        self._unlink(key, freq)
+        self._link(key, freq + 1)
+        if self._min_freq == freq and freq not in self._buckets:
+            self._min_freq = freq + 1
+
+    def on_set(self, key: str, expires: int, size: int) -> None:
+        if key in self._freq:
+            self.on_get(key)
+        else:
+            self._link(key, 1)
+            self._min_freq = 1
+
+    def on_delete(self, key: str) -> None:
+        freq = self._freq.pop(key, None)
+        if freq is not None:
+            self._unlink(key, freq)
+
+    def victim(self) -> str | None:
+        if not self._freq:
+            return None
+        if self._min_freq not in self._buckets:
+            self._min_freq = min(self._buckets)
+        key = self._buckets[self._min_freq].popitem(last=False)[0]
+        if not self._buckets[self._min_freq]:
+            del self._buckets[self._min_freq]
+        del self._freq[key]
+        return key
+
+    def clear(self) -> None:
+        self._freq.clear()
+        self._buckets.clear()
+        self._min_freq = 0
+
+
+def _mix64(z: int) -> int:
+    z &= 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return z ^ (z >> 31)
+
+
+class _FrequencySketch:
+    """A count-min sketch with 4 rows of small saturating counters. All
+    counters are halved once the number of increments reaches the sample
+    size, so that the sketch follows changes in popularity.
+    """
+
+    _max_count = 15
+    _halve = bytes(i >> 1 for i in range(256))
+
+    def __init__(self, capacity: int) -> None:
+        width = 64
+        while width < 4 * capacity:
+            width <<= 1
+        self._mask = width - 1
+        self._table = bytearray(4 * width)
+        self._sample_size = 10 * max(capacity, 1)
+        self._additions = 0
+
+    def _indexes(self, key: str) -> tuple[int, int, int, int]:
+        # two rounds of the splitmix64 finalizer give 32 bits for each row
+        h1 = _mix64(hash(key))
+        h2 = _mix64(h1 ^ 0x9E3779B97F4A7C15)
+        mask = self._mask
+        width = mask + 1
+        return (
+            h1 & mask,
+            width + ((h1 >> 32) & mask),
+            2 * width + (h2 & mask),
+            3 * width + ((h2 >> 32) & mask),
+        )
+
+    def frequency(self, key: str) -> int:
+        return min(self._table[i] for i in self._indexes(key))
+
+    def increment(self, key: str) -> None:
+        table = self._table
+        for i in self._indexes(key):
+            if table[i] < self._max_count:
+                table[i] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._additions //= 2
+            self._table = bytearray(table.translate(self._halve))
+
+
+class WTinyLFUPolicy(EvictionPolicy):
+    """Window TinyLFU. New items enter a small LRU window. Items leaving
+    the window are only admitted to the main segmented LRU if a frequency
+    sketch estimates them to be more popular than the item they would
+    replace. This keeps one-hit wonders from flushing popular items out of
+    the cache and works well for skewed (e.g. Zipfian) access patterns.
+
+    :param window_ratio: the share of the capacity used by the LRU window.
+    :param protected_ratio: the share of the main segment reserved for
+        items that have been accessed more than once.
+    """
+
+    def __init__(self, window_ratio: float = 0.01, protected_ratio: float = 0.8):
+        self._window_ratio = window_ratio
+        self._protected_ratio = protected_ratio
+        self._window: OrderedDict[str, None] = OrderedDict()
+        self._probation: OrderedDict[str, None] = OrderedDict()
+        self._protected: OrderedDict[str, None] = OrderedDict()
+        self.resize(self.capacity)
+
+    def resize(self, capacity: int) -> None:
+        super().resize(capacity)
+        self._window_cap = max(1, int(capacity * self._window_ratio))
+        self._main_cap = max(0, capacity - self._window_cap)
+        self._protected_cap = int(self._main_cap * self._protected_ratio)
+        self._sketch = _FrequencySketch(capacity)
+
+    def on_get(self, key: str) -> None:
+        self._sketch.increment(key)
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+        elif key in self._probation:
+            del self._probation[key]
+            self._protected[key] = None
+            if len(self._protected) > self._protected_cap:
+                demoted = self._protected.popitem(last=False)[0]
+                self._probation[demoted] = None
+
+    def on_set(self, key: str, expires: int, size: int) -> None:
+        if key in self._window or key in self._probation or key in self._protected:
+            self.on_get(key)
+        else:
+            self._sketch.increment(key)
+            self._window[key] = None
+            # move items out of the window while the main segment has room
+            main_size = len(self._probation) + len(self._protected)
+            if len(self._window) > self._window_cap and main_size < self._main_cap:
+                self._probation[self._window.popitem(last=False)[0]] = None
+
+    def on_delete(self, key: str) -> None:
+        self._window.pop(key, None)
+        self._probation.pop(key, None)
+        self._protected.pop(key, None)
+
+    def victim(self) -> str | None:
+        while len(self._window) > self._window_cap:
+            candidate = next(iter(self._window))
+            main_size = len(self._probation) + len(self._protected)
+            if main_size < self._main_cap:
+                del self._window[candidate]
+                self._probation[candidate] = None
+                continue
+            main = self._probation or self._protected
+            if not main:
+                break
+            victim = next(iter(main))
+            del self._window[candidate]
+            if self._sketch.frequency(candidate) > self._sketch.frequency(victim):
+                del main[victim]
+                self._probation[candidate] = None
+                return victim
+            return candidate
+        for segment in (self._probation, self._protected, self._window):
+            if segment:
+                return segment.popitem(last=False)[0]
+        return None
+
+    def clear(self) -> None:
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+        self._sketch = _FrequencySketch(self.capacity)
+
+
+class ARCPolicy(EvictionPolicy):
+    """Adaptive Replacement Cache. Balances between recency and frequency
+    by keeping items seen once and items seen more than once in separate
+    LRU lists and adapting their target sizes using the history of recently
+    evicted keys.
+    """
+
+    def __init__(self) -> None:
+        self._t1: OrderedDict[str, None] = OrderedDict()
+        self._t2: OrderedDict[str, None] = OrderedDict()
+        self._b1: OrderedDict[str, None] = OrderedDict()
+        self._b2: OrderedDict[str, None] = OrderedDict()
+        self._p = 0.0
+
+    def on_get(self, key: str) -> None:
+        if key in self._t1:
+            del self._t1[key]
+            self._t2[key] = None
+        else:
+            self._t2.move_to_end(key)
+
+    def on_set(self, key: str, expires: int, size: int) -> None:
+        if key in self._t1 or key in self._t2:
+            self.on_get(key)
+        elif key in self._b1:
+            # recently evicted after a single use, favour recency
+            self._p = min(
+                self.capacity, self._p + max(len(self._b2) / len(self._b1), 1)
+            )
+            del self._b1[key]
+            self._t2[key] = None
+        elif key in self._b2:
+            # recently evicted after repeated use, favour frequency
+            self._p = max(0, self._p - max(len(self._b1) / len(self._b2), 1))
+            del self._b2[key]
+            self._t2[key] = None
+        else:
+            self._t1[key] = None
+            while len(self._t1) + len(self._b1) > self.capacity and self._b1:
+                self._b1.popitem(last=False)
+        while len(self._b1) + len(self._b2) > self.capacity:
+            (self._b2 or self._b1).popitem(last=False)
+
+    def on_delete(self, key: str) -> None:
+        self._t1.pop(key, None)
+        self._t2.pop(key, None)
+
+    def victim(self) -> str | None:
+        if self._t1 and (len(self._t1) > self._p or not self._t2):
+            key = self._t1.popitem(last=False)[0]
+            self._b1[key] = None
+        elif self._t2:
+            key = self._t2.popitem(last=False)[0]
+            self._b2[key] = None
+        else:
+            return None
+        return key
+
+    def clear(self) -> None:
+        self._t1.clear()
+        self._t2.clear()
+        self._b1.clear()
+        self._b2.clear()
+        self._p = 0.0
+
+
+class GreedyDualSizePolicy(EvictionPolicy):
+    """GreedyDual-Size. Each item gets a priority of ``L + 1 / size``, where
+    ``L`` is the priority of the last evicted item, and the item with the
+    lowest priority is evicted first. Large items are therefore evicted
+    sooner than small ones unless they are accessed again, while items that
+    were not accessed for a long time age out as ``L`` grows.
+    """
+
+    def __init__(self) -> None:
+        self._inflation = 0.0
+        self._sizes: dict[str, int] = {}
+        self._priority: dict[str, float] = {}
+        self._heap: list[tuple[float, int, str]] = []
+        self._counter = count()
+
+    def _touch(self, key: str) -> None:
+        priority = self._inflation + 1 / max(self._sizes[key], 1)
+        self._priority[key] = priority
+        heapq.heappush(self._heap, (priority, next(self._counter), key))
+        # drop stale entries once they outnumber the live ones
+        if len(self._heap) > 2 * len(self._priority) + 64:
+            self._heap = [
+                (p, next(self._counter), k) for k, p in self._priority.items()
+            ]
+            heapq.heapify(self._heap)
+
+    def on_get(self, key: str) -> None:
+        self._touch(key)
+
+    def on_set(self, key: str, expires: int, size: int) -> None:
+        self._sizes[key] = size
+        self._touch(key)
+
+    def on_delete(self, key: str) -> None:
+        self._sizes.pop(key, None)
+        self._priority.pop(key, None)
+
+    def victim(self) -> str | None:
+        while self._heap:
+            priority, _, key = heapq.heappop(self._heap)
+            if self._priority.get(key) == priority:
+                self._inflation = priority
+                del self._sizes[key]
+                del self._priority[key]
+                return key
+        return None
+
+    def clear(self) -> None:
+        self._inflation = 0.0
+        self._sizes.clear()
+        self._priority.clear()
+        self._heap.clear()
+
+
+_policies: dict[str, type[EvictionPolicy]] = {
+    "expires": ExpiresPolicy,
+    "lru": LRUPolicy,
+    "lfu": LFUPolicy,
+    "w-tinylfu": WTinyLFUPolicy,
+    "arc": ARCPolicy,
+    "greedy-dual-size": GreedyDualSizePolicy,
+}
+
+
+#: what the ``eviction_policy`` parameter of the caches accepts: a name, an
+#: instance, or a callable returning an instance such as a subclass
+_PolicySpec = str | EvictionPolicy | _t.Callable[[], EvictionPolicy]
+
+
+def _make_policy(
+    policy: _PolicySpec, capacity: int, copy_instance: bool = False
+) -> EvictionPolicy:
+    """Turn the ``eviction_policy`` parameter of a cache into a policy. A
+    cache using several policies passes ``copy_instance``, so an instance
+    serves as a template instead of being shared.
+    """
+    if isinstance(policy, str):
+        try:
+            policy = _policies[policy]()
+        except KeyError:
+            raise ValueError(
+                f"eviction_policy must be one of {tuple(_policies)}, an"
+                f" EvictionPolicy instance or a callable returning one,"
+                f" received {policy!r}"
+            ) from None
+    elif isinstance(policy, EvictionPolicy):
+        if copy_instance:
+            policy = copy.deepcopy(policy)
+    elif callable(policy):
+        policy = policy()
+    if not isinstance(policy, EvictionPolicy):
+        raise ValueError(
+            f"eviction_policy must be one of {tuple(_policies)}, an"
+            f" EvictionPolicy instance or a callable returning one,"
+            f" received {policy!r}"
+        )
+    policy.resize(capacity)
+    return policy
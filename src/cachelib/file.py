@@ -1,20 +1,111 @@
 import errno
 import hashlib
 import logging
+import mmap
 import os
+import pickle
 import platform
+import random
 import stat
 import struct
+import sys
 import tempfile
+import threading
 import typing as _t
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager
 from contextlib import contextmanager
-from pathlib import Path
+from contextlib import ExitStack
+from contextlib import nullcontext
 from time import sleep
 from time import time
+from time import time_ns
 
+from cachelib._janitor import start_janitor
 from cachelib.base import BaseCache
+from cachelib.serializers import BaseSerializer
 from cachelib.serializers import FileSystemSerializer
 
+if sys.platform == "win32":
+    import msvcrt
+
+    def _lock_file(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, _counter.size)
+
+    def _unlock_file(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, _counter.size)
+
+    def _read_start(fd: int, size: int) -> bytes:
+        os.lseek(fd, 0, os.SEEK_SET)
+        return os.read(fd, size)
+
+    def _write_start(fd: int, data: bytes) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, data)
+
+else:
+    import fcntl
+
+    def _lock_file(fd: int) -> None:
+        fcntl.lockf(fd, fcntl.LOCK_EX, _counter.size)
+
+    def _unlock_file(fd: int) -> None:
+        fcntl.lockf(fd, fcntl.LOCK_UN, _counter.size)
+
+    def _read_start(fd: int, size: int) -> bytes:
+        return os.pread(fd, size, 0)
+
+    def _write_start(fd: int, data: bytes) -> None:
+        os.pwrite(fd, data, 0)
+
+
+class _CounterLock:
+    """Serializes the threads of a process using a counter file. The file
+    lock only keeps other processes out, all caches of a process using the
+    same ``cache_dir`` share one of these.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> None:
+        self._lock.acquire()
+
+    def __exit__(self, *args: _t.Any) -> None:
+        self._lock.release()
+
+
+_counter_locks: "weakref.WeakValueDictionary[str, _CounterLock]" = (
+    weakref.WeakValueDictionary()
+)
+_counter_locks_lock = threading.Lock()
+
+
+def _shared_counter_lock(path: str) -> _CounterLock:
+    path = os.path.realpath(path)
+    with _counter_locks_lock:
+        lock = _counter_locks.get(path)
+        if lock is None:
+            lock = _counter_locks[path] = _CounterLock()
+        return lock
+
+
+def _reset_after_fork() -> None:
+    global _counter_locks_lock
+    _counter_locks_lock = threading.Lock()
+    for lock in _counter_locks.values():
+        lock.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
 
 def _lazy_md5(string: bytes = b"") -> _t.Any:
     """Don't access :func:`~hashlib.md5` until runtime. FIPS builds may not include
@@ -24,6 +115,52 @@ def _lazy_md5(string: bytes = b"") -> _t.Any:
     return hashlib.md5(string)
 
 
+# number of cache files and their total size, updated in place. The size is
+# -1 once a cache without max_bytes changed the files without looking it up.
+_counter = struct.Struct("<qq")
+# offset and length of an out-of-band pickle buffer
+_buffer_entry = struct.Struct("<QQ")
+# end of the pickle stream, number of buffers and marker closing the file.
+# A file without buffers ends with the STOP opcode of the pickle instead.
+_buffers_footer = struct.Struct("<QI8s")
+_BUFFERS_MAGIC = b"cachebuf"
+# align out-of-band buffers for consumers like NumPy
+_BUFFER_ALIGNMENT = 64
+# operation, expiry timestamp, file size, access timestamp and length of
+# the file name
+_index_record = struct.Struct("<BIQIB")
+_INDEX_SET = 0
+_INDEX_DELETE = 1
+_INDEX_CLEAR = 2
+# a read of the file, only its access timestamp is set
+_INDEX_ACCESS = 3
+# seconds before a read updates the access time of a file again
+_TOUCH_INTERVAL = 60
+# best eviction candidates kept between two samples
+_EVICTION_POOL_SIZE = 16
+# reading a file opened with it leaves its access time alone
+_O_NOATIME = getattr(os, "O_NOATIME", 0)
+_O_BINARY = getattr(os, "O_BINARY", 0)
+# Linux can write a file without a name and link it into place once it is
+# complete, the link goes through /proc
+_O_TMPFILE = getattr(os, "O_TMPFILE", 0) if os.path.isdir("/proc/self/fd") else 0
+# fraction of a second in the modification time of files storing their
+# expiry time there, files written without expiry_in_mtime don't have it
+_MTIME_MARK_NS = 1000
+
+
+def _mtime_ns(expires: int) -> int:
+    return expires * 1_000_000_000 + _MTIME_MARK_NS
+
+
+def _mtime_expiry(st: os.stat_result) -> int | None:
+    """The expiry time stored in the modification time of a file, or
+    ``None`` if the file wasn't written with ``expiry_in_mtime``.
+    """
+    expires, fraction = divmod(st.st_mtime_ns, 1_000_000_000)
+    return expires if fraction == _MTIME_MARK_NS else None
+
+
 class FileSystemCache(BaseCache):
     """A cache that stores the items on the file system.  This cache depends
     on being the only user of the ``cache_dir``.  Make absolutely sure that
@@ -42,12 +179,63 @@ class FileSystemCache(BaseCache):
         generate the filename for cached results.
         Default is lazy loaded and can be overridden by
         setting  ``_default_hash_method``
+    :param use_index: keep an append-only journal of the expiry time, size
+        and access time of every file, so counting and pruning don't list
+        the directory and open every file. Processes sharing the
+        ``cache_dir`` replay the journal written by the others. Has no
+        effect with a threshold of 0.
+    :param shard_depth: spread the cache files over this many levels of
+        subdirectories named after the start of their hash, for example
+        ``ab/cd/abcd...`` with a depth of 2, to keep directories small.
+        Files of a flat ``cache_dir`` are moved into the subdirectories
+        when the cache is created.
+    :param expiry_in_mtime: also store the expiry time as the modification
+        time of the files, so :meth:`has` and pruning only need to ``stat``
+        them instead of opening them. Other programs must not touch the
+        cache files. Files that never expire get a modification time of 0.
+        Files written before it was enabled are recognized and read the
+        usual way until they are replaced.
+    :param mmap_threshold: files of at least this many bytes are read through
+        :mod:`mmap` instead of buffered reads, and buffers of at least this
+        size, like the data of NumPy arrays, are pickled out-of-band
+        with protocol 5 so loading them can reference the mapped file
+        instead of copying it. Only used with the default pickle based
+        serializers. 0 disables it. Mapping pays off from about 1 MB, smaller
+        files are faster to read. On Windows, a file can't be replaced
+        while a value loaded from it references its buffers.
+    :param batch_workers: the number of threads :meth:`get_many`,
+        :meth:`set_many`, :meth:`delete_many` and :meth:`has_many` spread the
+        file operations of a batch over. This helps most on network file
+        systems. 0 handles batches in the calling thread.
+    :param max_bytes: the maximum combined size in bytes of the cache files
+        before the cache starts deleting some. Expired files go first, then
+        the files with the largest product of size and time since they were
+        last read, so a large file nobody reads is deleted before many small
+        ones in use. A value of 0 indicates no limit. Values larger than
+        ``max_bytes`` are not stored. See :attr:`total_bytes` for the
+        current usage.
+    :param eviction_samples: instead of listing the whole ``cache_dir`` once
+        over a limit, look at this many random files and delete the best
+        candidates among them and the best ones left from earlier samples.
+        Expired files go first, then the files read the longest time ago,
+        weighted by their size with ``max_bytes``. This keeps the cost of
+        pruning the same however many files there are, it works best with
+        ``shard_depth`` or ``use_index``. 0 lists the whole directory.
+    :param janitor_interval: if greater than 0, expired files are removed and
+        the limits are enforced every ``janitor_interval`` seconds by a
+        background thread instead of during :meth:`set`. The cache may then
+        temporarily grow past its limits between two runs.
+    :param prune_on_set: set to ``False`` when the ``cache_dir`` is pruned
+        by another process, like ``python -m cachelib prune`` run from cron,
+        so :meth:`set` doesn't prune at all.
     """
 
     #: used for temporary files by the FileSystemCache
     _fs_transaction_suffix = ".__wz_cache"
-    #: keep amount of files in a cache element
+    #: keep amount of files in a fixed width counter
     _fs_count_file = "__wz_cache_count"
+    #: journal of the cache files when using an index
+    _fs_index_file = "__wz_cache_index"
     #: default file name hashing method
     _default_hash_method = staticmethod(_lazy_md5)
 
@@ -60,21 +248,73 @@ class FileSystemCache(BaseCache):
         default_timeout: int = 300,
         mode: int | None = None,
         hash_method: _t.Any = None,
+        use_index: bool = False,
+        shard_depth: int = 0,
+        expiry_in_mtime: bool = False,
+        mmap_threshold: int = 0,
+        batch_workers: int = 0,
+        max_bytes: int = 0,
+        eviction_samples: int = 0,
+        janitor_interval: float = 0,
+        prune_on_set: bool = True,
     ):
         BaseCache.__init__(self, default_timeout)
         self._path = cache_dir
         self._threshold = threshold
+        self._max_bytes = max_bytes
+        self._eviction_samples = eviction_samples
+        #: path -> (score, size) of the best eviction candidates seen
+        self._eviction_pool: dict[str, tuple[float, int]] = {}
+        self._eviction_lock = threading.Lock()
+        self._prune_on_set = prune_on_set and janitor_interval <= 0
+        self._counting = threshold != 0 or max_bytes != 0
+        self._use_index = use_index and self._counting
+        if not 0 <= shard_depth <= 8:
+            raise ValueError("shard_depth must be between 0 and 8")
+        self._shard_depth = shard_depth
+        self._expiry_in_mtime = expiry_in_mtime
+        self._mmap_threshold = mmap_threshold
+        self._batch_workers = batch_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_pid = -1
+        self._executor_lock = threading.Lock()
+        #: file name -> (expires, size, accessed) as replayed from the journal
+        self._index: dict[str, tuple[int, int, int]] = {}
+        #: the names of the index in a list and their positions in it, to
+        #: sample random names in constant time
+        self._index_names: list[str] = []
+        self._index_positions: dict[str, int] = {}
+        self._index_bytes = 0
+        self._index_offset = 0
+        self._index_records = 0
+        self._index_inode = -1
+        # the file lock of the counter keeps other processes out of the
+        # journal, this one the threads out of the index in memory
+        self._index_lock = threading.RLock()
+        self._counter_fd = -1
+        self._dir_fd = -1
+        self._use_tmpfile = _O_TMPFILE != 0
+        self._counter_lock = _shared_counter_lock(
+            os.path.join(self._path, self._fs_count_file)
+        )
 
         self._hash_method = self._default_hash_method
         if hash_method is not None:
             self._hash_method = hash_method
+        # the hashed name is where older versions kept the count
+        legacy_count_file = self._hash_method(
+            self._fs_count_file.encode("utf-8")
+        ).hexdigest()
+        self._mgmt_names = frozenset(
+            (legacy_count_file, self._fs_count_file, self._fs_index_file)
+        )
 
         # Mode set by user takes precedence. If no mode has
         # been given, we need to set the correct default based
         # on user platform.
+        if mode is None:
+            mode = self._get_compatible_platform_mode()
         self._mode = mode
-        if self._mode is None:
-            self._mode = self._get_compatible_platform_mode()
 
         try:
             os.makedirs(self._path)
@@ -82,10 +322,67 @@ class FileSystemCache(BaseCache):
             if ex.errno != errno.EEXIST:
                 raise
 
+        if self._shard_depth:
+            self._migrate_flat_files()
+
+        if self._use_index:
+            if not os.path.exists(self._index_path):
+                self._rebuild_index()
         # If there are many files and a zero threshold,
         # the list_dir can slow initialisation massively
-        if self._threshold != 0:
-            self._update_count(value=len(list(self._list_dir())))
+        elif self._counting:
+            self._init_count()
+
+        self._janitor: threading.Thread | None = None
+        if janitor_interval > 0:
+            self._janitor = start_janitor(self, janitor_interval)
+
+    def _map(
+        self, fn: _t.Callable[[str], _t.Any], keys: _t.Sequence[str]
+    ) -> list[_t.Any]:
+        """Call ``fn`` for every key, on the batch threads if there are any
+        and more than one key.
+        """
+        if self._batch_workers < 1 or len(keys) < 2:
+            return [fn(key) for key in keys]
+        return list(self._get_executor().map(fn, keys))
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        executor = self._executor
+        # a forked process doesn't have the threads of its parent
+        if executor is None or self._executor_pid != os.getpid():
+            with self._executor_lock:
+                executor = self._executor
+                if executor is None or self._executor_pid != os.getpid():
+                    executor = ThreadPoolExecutor(
+                        self._batch_workers, thread_name_prefix="cachelib-fs"
+                    )
+                    weakref.finalize(self, executor.shutdown, wait=False)
+                    self._executor = executor
+                    self._executor_pid = os.getpid()
+        return executor
+
+    def get_many(self, *keys: str) -> list[_t.Any]:
+        return self._map(self.get, keys)
+
+    def set_many(
+        self, mapping: dict[str, _t.Any], timeout: int | None = None
+    ) -> list[_t.Any]:
+        if self._batch_workers < 1:
+            return super().set_many(mapping, timeout)
+        written = self._map(
+            lambda key: self._write(key, mapping[key], timeout, False), list(mapping)
+        )
+        # prune once for the whole batch
+        self._prune()
+        return [key for key, ok in zip(mapping, written, strict=True) if ok]
+
+    def delete_many(self, *keys: str) -> list[_t.Any]:
+        deleted = self._map(self.delete, keys)
+        return [key for key, ok in zip(keys, deleted, strict=True) if ok]
+
+    def has_many(self, *keys: str) -> list[bool]:
+        return self._map(self.has, keys)
 
     def _get_compatible_platform_mode(self) -> int:
         mode = 0o600  # nix systems
@@ -95,17 +392,129 @@ class FileSystemCache(BaseCache):
 
     @property
     def _file_count(self) -> int:
-        return self.get(self._fs_count_file) or 0
+        if self._use_index:
+            self._load_index()
+            return len(self._index)
+        if not self._counting:
+            return 0
+        with self._counter_lock:
+            return self._read_counter(self._open_counter())[0]
+
+    @property
+    def total_bytes(self) -> int:
+        """The combined size in bytes of the cache files, only counted with
+        a ``max_bytes`` limit.
+        """
+        if self._use_index:
+            self._load_index()
+            return self._index_bytes
+        if self._max_bytes == 0:
+            return 0
+        with self._counter_lock:
+            size = self._read_counter(self._open_counter())[1]
+        if size < 0:
+            # look the sizes up again
+            self._update_count()
+            with self._counter_lock:
+                size = self._read_counter(self._open_counter())[1]
+        return max(size, 0)
+
+    def _read_counter(self, fd: int) -> tuple[int, int]:
+        data = _read_start(fd, _counter.size)
+        if len(data) != _counter.size:
+            return 0, 0
+        count, size = _counter.unpack(data)
+        return count, size
+
+    def _open_counter(self) -> int:
+        if self._counter_fd < 0:
+            path = os.path.join(self._path, self._fs_count_file)
+            self._counter_fd = os.open(path, os.O_RDWR | os.O_CREAT, self._mode)
+            weakref.finalize(self, os.close, self._counter_fd)
+        return self._counter_fd
 
-    def _update_count(self, delta: int | None = None, value: int | None = None) -> None:
-        # If we have no threshold, don't count files
-        if self._threshold == 0:
+    def _open_dir(self) -> int:
+        if self._dir_fd < 0:
+            self._dir_fd = os.open(self._path, os.O_RDONLY)
+            weakref.finalize(self, os.close, self._dir_fd)
+        return self._dir_fd
+
+    @contextmanager
+    def _locked_counter(self) -> _t.Generator[int, None, None]:
+        with self._counter_lock:
+            fd = self._open_counter()
+            _lock_file(fd)
+            try:
+                yield fd
+            finally:
+                _unlock_file(fd)
+
+    def _init_count(self) -> None:
+        """Count the files when the counter is created, from there on the
+        processes sharing the ``cache_dir`` keep it up to date.
+        """
+        try:
+            with self._locked_counter() as fd:
+                if os.fstat(fd).st_size < _counter.size:
+                    _write_start(fd, _counter.pack(*self._scan_counts()))
+                elif self._max_bytes and self._read_counter(fd)[1] < 0:
+                    count = self._read_counter(fd)[0]
+                    _write_start(fd, _counter.pack(count, self._scan_counts()[1]))
+        except OSError:
+            logging.warning(
+                "Exception raised while handling cache file '%s'",
+                self._fs_count_file,
+                exc_info=True,
+            )
+
+    def _scan_counts(self) -> tuple[int, int]:
+        """Count the files and, with ``max_bytes``, their size."""
+        count = size = 0
+        for entry in self._scan_dir():
+            count += 1
+            try:
+                size += self._entry_size(entry)
+            except OSError:
+                pass
+        return count, size if self._max_bytes else -1
+
+    def _update_count(
+        self,
+        delta: int | None = None,
+        value: int | None = None,
+        size_delta: int = 0,
+        size_value: int | None = None,
+    ) -> None:
+        """Update the file count and their total size in place under a file
+        lock, so processes sharing the ``cache_dir`` don't lose each other's
+        updates.
+        """
+        # If we have no limits, don't count files, the index
+        # counts them itself
+        if not self._counting or self._use_index:
             return
-        if delta:
-            new_count = self._file_count + delta
-        else:
-            new_count = value or 0
-        self.set(self._fs_count_file, new_count, mgmt_element=True)
+        try:
+            with self._locked_counter() as fd:
+                count, size = self._read_counter(fd)
+                if value is not None:
+                    count = value
+                elif delta:
+                    count = max(count + delta, 0)
+                if size_value is not None:
+                    size = size_value
+                elif not self._max_bytes:
+                    size = -1
+                elif size < 0:
+                    size = self._scan_counts()[1]
+                else:
+                    size = max(size + size_delta, 0)
+                _write_start(fd, _counter.pack(count, size))
+        except OSError:
+            logging.warning(
+                "Exception raised while handling cache file '%s'",
+                self._fs_count_file,
+                exc_info=True,
+            )
 
     def _normalize_timeout(self, timeout: int | None) -> int:
         timeout = BaseCache._normalize_timeout(self, timeout)
@@ -114,28 +523,328 @@ class FileSystemCache(BaseCache):
         return int(timeout)
 
     def _is_mgmt(self, name: str) -> bool:
-        fshash = self._get_filename(self._fs_count_file).split(os.sep)[-1]
-        return name == fshash or name.endswith(self._fs_transaction_suffix)
+        return name in self._mgmt_names or name.endswith(self._fs_transaction_suffix)
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self._path, self._fs_index_file)
+
+    def _log_index(
+        self,
+        op: int,
+        name: str = "",
+        expires: int = 0,
+        size: int = 0,
+        accessed: int = 0,
+    ) -> None:
+        """Append a record to the journal. Records are written with a single
+        ``write`` to a file opened for appending, so records of different
+        processes don't interleave, and under the file lock of the counter,
+        so they don't land in a journal that is being compacted.
+        """
+        bname = name.encode()
+        record = _index_record.pack(op, expires, size, accessed, len(bname)) + bname
+        try:
+            # a compaction replaces the journal under the same lock
+            with self._locked_counter():
+                fd = os.open(self._index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+                try:
+                    os.write(fd, record)
+                finally:
+                    os.close(fd)
+        except OSError:
+            logging.warning(
+                "Exception raised while handling cache file '%s'",
+                self._index_path,
+                exc_info=True,
+            )
+
+    def _load_index(self) -> None:
+        """Replay the records written since the last call and compact the
+        journal once it holds many more records than files.
+        """
+        with self._index_lock:
+            if not self._replay_index():
+                self._rebuild_index()
+                return
+            if self._index_records <= 2 * len(self._index) + 1000:
+                return
+            try:
+                with self._locked_counter():
+                    # pick up the records appended since the replay, no
+                    # process can append more until the journal is replaced
+                    if self._replay_index():
+                        self._write_index()
+            except OSError:
+                logging.warning(
+                    "Exception raised while handling cache file '%s'",
+                    self._index_path,
+                    exc_info=True,
+                )
+
+    def _replay_index(self) -> bool:
+        """Replay the records written since the last call. A compacted
+        journal is a new file and is replayed from the start. Returns
+        ``False`` if there is no journal.
+        """
+        try:
+            with open(self._index_path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._index_inode:
+                    self._index_reset()
+                    self._index_inode = inode
+                    self._index_offset = self._index_records = 0
+                f.seek(self._index_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        except OSError:
+            logging.warning(
+                "Exception raised while handling cache file '%s'",
+                self._index_path,
+                exc_info=True,
+            )
+            return True
+
+        pos = 0
+        header = _index_record.size
+        while pos + header <= len(data):
+            op, expires, size, accessed, length = _index_record.unpack_from(data, pos)
+            if pos + header + length > len(data):
+                break
+            name = data[pos + header : pos + header + length].decode()
+            pos += header + length
+            if op == _INDEX_SET:
+                self._index_put(name, expires, size, accessed)
+            elif op == _INDEX_ACCESS:
+                entry = self._index.get(name)
+                if entry is not None:
+                    self._index[name] = (entry[0], entry[1], accessed)
+            elif op == _INDEX_DELETE:
+                self._index_drop(name)
+            else:
+                self._index_reset()
+            self._index_records += 1
+        self._index_offset += pos
+        return True
+
+    def _write_index(self) -> None:
+        """Replace the journal with one record per cache file. The caller
+        holds the file lock of the counter.
+        """
+        records = []
+        for name, (expires, size, accessed) in self._index.items():
+            bname = name.encode()
+            records.append(
+                _index_record.pack(_INDEX_SET, expires, size, accessed, len(bname))
+            )
+            records.append(bname)
+        try:
+            fd, tmp = tempfile.mkstemp(
+                suffix=self._fs_transaction_suffix, dir=self._path
+            )
+            with os.fdopen(fd, "wb") as f:
+                f.write(b"".join(records))
+                size = f.tell()
+            self._run_safely(os.replace, tmp, self._index_path)
+            self._index_inode = os.stat(self._index_path).st_ino
+        except OSError:
+            logging.warning(
+                "Exception raised while handling cache file '%s'",
+                self._index_path,
+                exc_info=True,
+            )
+            return
+        self._index_offset = size
+        self._index_records = len(self._index)
+
+    def _rebuild_index(self) -> None:
+        """Build the journal from the cache files, needed once for a
+        ``cache_dir`` that was used without an index.
+        """
+        try:
+            with self._index_lock, self._locked_counter():
+                self._index_reset()
+                for entry in self._scan_dir():
+                    fname = entry.path
+                    try:
+                        expires = self._read_expiry(entry)
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    except (OSError, EOFError, struct.error):
+                        logging.warning(
+                            "Exception raised while handling cache file '%s'",
+                            fname,
+                            exc_info=True,
+                        )
+                        continue
+                    self._index_put(
+                        self._index_name(fname),
+                        expires,
+                        st.st_size,
+                        int(st.st_atime),
+                    )
+                self._write_index()
+        except OSError:
+            logging.warning(
+                "Exception raised while handling cache file '%s'",
+                self._index_path,
+                exc_info=True,
+            )
+
+    def _index_name(self, filename: str) -> str:
+        return os.path.relpath(filename, self._path)
+
+    def _index_locked(
+        self, mgmt_element: bool = False
+    ) -> AbstractContextManager[_t.Any]:
+        """Held while a cache file changes together with its record in the
+        journal, so the records of threads writing and deleting the same
+        file are in the order of the changes.
+        """
+        if self._use_index and not mgmt_element:
+            return self._index_lock
+        return nullcontext()
+
+    def _index_reset(self) -> None:
+        self._index = {}
+        self._index_names = []
+        self._index_positions = {}
+        self._index_bytes = 0
+
+    def _index_put(self, name: str, expires: int, size: int, accessed: int) -> None:
+        old = self._index.get(name)
+        if old is None:
+            self._index_positions[name] = len(self._index_names)
+            self._index_names.append(name)
+        else:
+            self._index_bytes -= old[1]
+        self._index[name] = (expires, size, accessed)
+        self._index_bytes += size
+
+    def _index_drop(self, name: str) -> None:
+        entry = self._index.pop(name, None)
+        if entry is None:
+            return
+        self._index_bytes -= entry[1]
+        # move the last name into the place of the dropped one
+        pos = self._index_positions.pop(name)
+        last = self._index_names.pop()
+        if last != name:
+            self._index_names[pos] = last
+            self._index_positions[last] = pos
+
+    def _remove_indexed(self, names: _t.Iterable[str]) -> bool:
+        for name in names:
+            fname = os.path.join(self._path, name)
+            with self._index_lock:
+                try:
+                    os.remove(fname)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    logging.warning(
+                        "Exception raised while handling cache file '%s'",
+                        fname,
+                        exc_info=True,
+                    )
+                    return False
+                self._index_drop(name)
+                self._log_index(_INDEX_DELETE, name)
+        return True
 
     def _list_dir(self) -> _t.Generator[str, None, None]:
         """return a list of (fully qualified) cache filenames"""
-        return (
-            os.path.join(self._path, fn)
-            for fn in os.listdir(self._path)
-            if not self._is_mgmt(fn)
-        )
+        return (entry.path for entry in self._scan_dir())
+
+    def _scan_dir(self) -> _t.Generator["os.DirEntry[str]", None, None]:
+        """return the directory entries of the cache files"""
+        return self._walk(self._path, self._shard_depth)
+
+    def _walk(
+        self, path: str, depth: int
+    ) -> _t.Generator["os.DirEntry[str]", None, None]:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if depth:
+                    if entry.is_dir():
+                        yield from self._walk(entry.path, depth - 1)
+                elif path != self._path or not self._is_mgmt(entry.name):
+                    yield entry
+
+    def _read_expiry(self, entry: "os.DirEntry[str]") -> int:
+        if self._expiry_in_mtime:
+            expires = _mtime_expiry(entry.stat())
+            if expires is not None:
+                return expires
+        with self._safe_stream_open(entry.path, "rb") as f:
+            return int(struct.unpack("I", f.read(4))[0])
+
+    def _entry_size(self, entry: "os.DirEntry[str]") -> int:
+        """The size of a file, only looked up when it is counted."""
+        return entry.stat().st_size if self._max_bytes else 0
+
+    def _migrate_flat_files(self) -> None:
+        """Move the files of a ``cache_dir`` used without sharding into
+        their subdirectories.
+        """
+        with os.scandir(self._path) as entries:
+            flat = [
+                entry.name
+                for entry in entries
+                if entry.is_file() and not self._is_mgmt(entry.name)
+            ]
+        for name in flat:
+            try:
+                self._move_into_shard(
+                    os.path.join(self._path, name), self._shard_filename(name)
+                )
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logging.warning(
+                    "Exception raised while handling cache file '%s'",
+                    name,
+                    exc_info=True,
+                )
+        if flat and self._use_index:
+            self._rebuild_index()
+
+    def _move_into_shard(self, src: str, dst: str) -> None:
+        try:
+            self._run_safely(os.replace, src, dst)
+        except FileNotFoundError:
+            if not os.path.exists(src):
+                raise
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            self._run_safely(os.replace, src, dst)
 
     def _over_threshold(self) -> bool:
         return self._threshold != 0 and self._file_count > self._threshold
 
+    def _over_max_bytes(self) -> bool:
+        return self._max_bytes != 0 and self.total_bytes > self._max_bytes
+
     def _remove_expired(self, now: float) -> None:
-        for fname in self._list_dir():
+        if self._use_index:
+            with self._index_lock:
+                self._load_index()
+                expired = [
+                    name
+                    for name, (expires, _, _) in self._index.items()
+                    if expires != 0 and expires < now
+                ]
+            self._remove_indexed(expired)
+            return
+        for entry in self._scan_dir():
+            fname = entry.path
             try:
-                with self._safe_stream_open(fname, "rb") as f:
-                    expires = struct.unpack("I", f.read(4))[0]
+                expires = self._read_expiry(entry)
                 if expires != 0 and expires < now:
+                    size = self._entry_size(entry)
                     os.remove(fname)
-                    self._update_count(delta=-1)
+                    self._update_count(delta=-1, size_delta=-size)
             except FileNotFoundError:
                 pass
             except (OSError, EOFError, struct.error):
@@ -146,12 +855,21 @@ class FileSystemCache(BaseCache):
                 )
 
     def _remove_older(self) -> bool:
+        if self._use_index:
+            with self._index_lock:
+                self._load_index()
+                excess = len(self._index) - self._threshold
+                if excess <= 0:
+                    return True
+                names = sorted(self._index, key=lambda name: self._index[name][0])
+            return self._remove_indexed(names[:excess])
         exp_fname_tuples = []
-        for fname in self._list_dir():
+        for entry in self._scan_dir():
+            fname = entry.path
             try:
-                with self._safe_stream_open(fname, "rb") as f:
-                    timestamp = struct.unpack("I", f.read(4))[0]
-                    exp_fname_tuples.append((timestamp, fname))
+                exp_fname_tuples.append(
+                    (self._read_expiry(entry), fname, self._entry_size(entry))
+                )
             except FileNotFoundError:
                 pass
             except (OSError, EOFError, struct.error):
@@ -160,13 +878,18 @@ class FileSystemCache(BaseCache):
                     fname,
                     exc_info=True,
                 )
-        fname_sorted = (
-            fname for _, fname in sorted(exp_fname_tuples, key=lambda item: item[0])
+        # the directory was listed anyway, correct any drift of the count
+        self._update_count(
+            value=len(exp_fname_tuples),
+            size_value=sum(item[2] for item in exp_fname_tuples)
+            if self._max_bytes
+            else None,
         )
-        for fname in fname_sorted:
+        fname_sorted = sorted(exp_fname_tuples, key=lambda item: item[0])
+        for _, fname, size in fname_sorted:
             try:
                 os.remove(fname)
-                self._update_count(delta=-1)
+                self._update_count(delta=-1, size_delta=-size)
             except FileNotFoundError:
                 pass
             except OSError:
@@ -180,18 +903,43 @@ class FileSystemCache(BaseCache):
                 break
         return True
 
-    def _prune(self) -> None:
-        if self._over_threshold():
-            now = time()
-            self._remove_expired(now)
-        # if still over threshold
-        if self._over_threshold():
-            self._remove_older()
-
-    def clear(self) -> bool:
-        for i, fname in enumerate(self._list_dir()):
+    def _remove_largest_cold(self) -> bool:
+        """Remove the files with the largest product of size and time since
+        they were last read until the cache fits into ``max_bytes``.
+        """
+        now = time()
+        candidates = []
+        if self._use_index:
+            with self._index_lock:
+                self._load_index()
+                total = self._index_bytes
+                for name, (_, size, accessed) in self._index.items():
+                    candidates.append((size * max(now - accessed, 1), name, size))
+        else:
+            for entry in self._scan_dir():
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                candidates.append(
+                    (st.st_size * max(now - st.st_atime, 1), entry.path, st.st_size)
+                )
+            total = sum(item[2] for item in candidates)
+            # the directory was listed anyway, correct any drift of the count
+            self._update_count(value=len(candidates), size_value=total)
+        candidates.sort(reverse=True)
+        victims = []
+        for _, name, size in candidates:
+            if total <= self._max_bytes:
+                break
+            victims.append((name, size))
+            total -= size
+        if self._use_index:
+            return self._remove_indexed(name for name, _ in victims)
+        for fname, size in victims:
             try:
                 os.remove(fname)
+                self._update_count(delta=-1, size_delta=-size)
             except FileNotFoundError:
                 pass
             except OSError:
@@ -200,9 +948,168 @@ class FileSystemCache(BaseCache):
                     fname,
                     exc_info=True,
                 )
-                self._update_count(delta=-i)
                 return False
-        self._update_count(value=0)
+        return True
+
+    def _sample(self) -> _t.Iterator[tuple[str, int, float, int]]:
+        """Yield the path, expiry time, access time and size of random cache
+        files.
+        """
+        k = self._eviction_samples
+        if self._use_index:
+            # the index knows the access times even where the file system
+            # doesn't update them
+            with self._index_lock:
+                self._load_index()
+                names = self._index_names
+                picked = random.sample(range(len(names)), min(k, len(names)))
+                sampled = [(names[i], self._index[names[i]]) for i in picked]
+            for name, (expires, size, accessed) in sampled:
+                yield os.path.join(self._path, name), expires, accessed, size
+            return
+        if self._shard_depth:
+            # the files of random leaf directories, a level has at most 256
+            # subdirectories
+            entries: list[os.DirEntry[str]] = []
+            for _ in range(k):
+                path = self._path
+                for _ in range(self._shard_depth):
+                    with os.scandir(path) as it:
+                        subdirs = [e.path for e in it if e.is_dir()]
+                    if not subdirs:
+                        break
+                    path = random.choice(subdirs)
+                else:
+                    with os.scandir(path) as it:
+                        entries.extend(e for e in it if e.is_file())
+                if len(entries) >= k:
+                    break
+            entries = random.sample(entries, min(k, len(entries)))
+        else:
+            # reservoir sampling, every file of the listing is as likely to
+            # be picked
+            entries = []
+            for i, entry in enumerate(self._scan_dir()):
+                if i < k:
+                    entries.append(entry)
+                else:
+                    j = random.randrange(i + 1)
+                    if j < k:
+                        entries[j] = entry
+        for entry in entries:
+            try:
+                st = entry.stat()
+                expires = self._peek_expiry(entry.path, st)
+            except (OSError, struct.error):
+                continue
+            yield entry.path, expires, st.st_atime, st.st_size
+
+    def _peek_expiry(self, path: str, st: os.stat_result) -> int:
+        """Read the expiry time of a sampled file without updating its
+        access time, which would make it look recently used.
+        """
+        if self._expiry_in_mtime:
+            expires = _mtime_expiry(st)
+            if expires is not None:
+                return expires
+        try:
+            fd = os.open(path, os.O_RDONLY | _O_BINARY | _O_NOATIME)
+        except PermissionError:
+            # only the owner of a file may use O_NOATIME
+            fd = os.open(path, os.O_RDONLY | _O_BINARY)
+        try:
+            return int(struct.unpack("I", os.read(fd, 4))[0])
+        finally:
+            os.close(fd)
+
+    def _remove_sampled(self) -> None:
+        """Approximate the eviction of a full scan by sampling. Every round
+        merges a sample into the pool of the best candidates and deletes
+        the best one.
+        """
+        now = time()
+        pool = self._eviction_pool
+        for _ in range(2 * _EVICTION_POOL_SIZE):
+            if not (self._over_threshold() or self._over_max_bytes()):
+                return
+            with self._eviction_lock:
+                for path, expires, accessed, size in self._sample():
+                    if expires != 0 and expires < now:
+                        score = float("inf")
+                    else:
+                        score = max(now - accessed, 0)
+                        if self._max_bytes:
+                            score *= size
+                    pool[path] = (score, size)
+                best = sorted(pool, key=lambda path: pool[path][0], reverse=True)
+                for path in best[_EVICTION_POOL_SIZE:]:
+                    del pool[path]
+                if not best:
+                    # the sample only found empty shard directories
+                    continue
+                victim = best[0]
+                _, size = pool.pop(victim)
+            if self._use_index:
+                self._remove_indexed([self._index_name(victim)])
+                continue
+            try:
+                os.remove(victim)
+                self._update_count(delta=-1, size_delta=-size)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logging.warning(
+                    "Exception raised while handling cache file '%s'",
+                    victim,
+                    exc_info=True,
+                )
+                return
+
+    def _prune(self) -> None:
+        # left to the janitor or another process
+        if not self._prune_on_set:
+            return
+        if self._eviction_samples:
+            self._remove_sampled()
+            return
+        if self._over_threshold() or self._over_max_bytes():
+            now = time()
+            self._remove_expired(now)
+        # if still over threshold
+        if self._over_threshold():
+            self._remove_older()
+        if self._over_max_bytes():
+            self._remove_largest_cold()
+
+    def _clean_up(self) -> None:
+        """Remove all expired files and enforce the limits of the cache.
+        Called periodically by the janitor thread and by
+        ``python -m cachelib prune``.
+        """
+        self._remove_expired(time())
+        if self._over_threshold():
+            self._remove_older()
+        if self._over_max_bytes():
+            self._remove_largest_cold()
+
+    def clear(self) -> bool:
+        with self._index_locked():
+            for i, fname in enumerate(self._list_dir()):
+                try:
+                    os.remove(fname)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    logging.warning(
+                        "Exception raised while handling cache file '%s'",
+                        fname,
+                        exc_info=True,
+                    )
+                    self._update_count(delta=-i)
+                    return False
+            self._update_count(value=0, size_value=0)
+            if self._use_index:
+                self._log_index(_INDEX_CLEAR)
         return True
 
     def _get_filename(self, key: str | _t.Any) -> str:
@@ -211,12 +1118,95 @@ class FileSystemCache(BaseCache):
             bkey_hash = self._hash_method(bkey).hexdigest()
         else:
             raise TypeError(f"Key must be a string, received type {type(key)}")
-        return os.path.join(self._path, bkey_hash)
+        return self._shard_filename(bkey_hash)
+
+    def _shard_filename(self, name: str) -> str:
+        dirs = [name[2 * i : 2 * i + 2] for i in range(self._shard_depth)]
+        return os.path.join(self._path, *dirs, name)
+
+    def _uses_pickle(self) -> bool:
+        serializer = type(self.serializer)
+        return (
+            self._mmap_threshold > 0
+            and serializer.dump is BaseSerializer.dump
+            and serializer.load is BaseSerializer.load
+        )
+
+    def _dump_buffers(self, value: _t.Any, f: _t.BinaryIO) -> None:
+        """Pickle a value with its large buffers out-of-band, appended to
+        the pickle stream and listed in a footer.
+        """
+        buffers: list[memoryview] = []
+
+        def keep_in_band(buffer: pickle.PickleBuffer) -> bool:
+            try:
+                raw = buffer.raw()
+            except BufferError:
+                return True
+            if raw.nbytes < self._mmap_threshold:
+                return True
+            buffers.append(raw)
+            return False
+
+        try:
+            pickle.dump(value, f, 5, buffer_callback=keep_in_band)
+        except (pickle.PickleError, pickle.PicklingError) as e:
+            self.serializer._warn(e)
+            return
+        if not buffers:
+            return
+        end = f.tell()
+        entries = []
+        for raw in buffers:
+            f.write(bytes(-f.tell() % _BUFFER_ALIGNMENT))
+            entries.append(_buffer_entry.pack(f.tell(), raw.nbytes))
+            f.write(raw)
+        f.write(b"".join(entries))
+        f.write(_buffers_footer.pack(end, len(buffers), _BUFFERS_MAGIC))
+
+    def _load_mapped(self, f: _t.BinaryIO, size: int) -> _t.Any:
+        """Load a value from a memory map of its file. Out-of-band buffers
+        are handed to pickle as views of the map, which stays open for as
+        long as the value references them.
+        """
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        expires = struct.unpack_from("I", view)[0]
+        if expires != 0 and expires < time():
+            view.release()
+            return None
+        end = size
+        buffers = []
+        if view[-len(_BUFFERS_MAGIC) :] == _BUFFERS_MAGIC:
+            end, count, _ = _buffers_footer.unpack_from(
+                view, size - _buffers_footer.size
+            )
+            table = size - _buffers_footer.size - count * _buffer_entry.size
+            for i in range(count):
+                offset, length = _buffer_entry.unpack_from(
+                    view, table + i * _buffer_entry.size
+                )
+                buffers.append(view[offset : offset + length])
+        data = view[4:end]
+        try:
+            return pickle.loads(data, buffers=buffers)
+        except pickle.PickleError as e:
+            self.serializer._warn(e)
+            return None
+        finally:
+            data.release()
+            if not buffers:
+                view.release()
 
     def get(self, key: str) -> _t.Any:
         filename = self._get_filename(key)
         try:
             with self._safe_stream_open(filename, "rb") as f:
+                if self._max_bytes or self._eviction_samples:
+                    self._touch(filename, f)
+                if self._uses_pickle():
+                    size = os.fstat(f.fileno()).st_size
+                    if size >= self._mmap_threshold:
+                        return self._load_mapped(f, size)
                 pickle_time = struct.unpack("I", f.read(4))[0]
                 if pickle_time == 0 or pickle_time >= time():
                     return self.serializer.load(f)
@@ -230,6 +1220,26 @@ class FileSystemCache(BaseCache):
             )
         return None
 
+    def _touch(self, filename: str, f: _t.BinaryIO) -> None:
+        """Update the access time eviction goes by. File systems mounted
+        with ``noatime`` or ``relatime`` don't do it on every read.
+        """
+        now = time()
+        st = os.fstat(f.fileno())
+        if st.st_atime < now - _TOUCH_INTERVAL:
+            os.utime(filename, ns=(time_ns(), st.st_mtime_ns))
+        if self._use_index:
+            # pruning goes by the access time in the index, which a process
+            # that hasn't loaded the index knows from the file only
+            name = self._index_name(filename)
+            with self._index_lock:
+                entry = self._index.get(name)
+                accessed = st.st_atime if entry is None else entry[2]
+                if accessed < now - _TOUCH_INTERVAL:
+                    self._log_index(_INDEX_ACCESS, name, accessed=int(now))
+                    if entry is not None:
+                        self._index[name] = (entry[0], entry[1], int(now))
+
     def add(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
         filename = self._get_filename(key)
         if not os.path.exists(filename):
@@ -249,52 +1259,178 @@ class FileSystemCache(BaseCache):
         # Don't prune on management element update, to avoid loop
         else:
             self._prune()
+        written = self._write(key, value, timeout, mgmt_element)
+        # a large value can exceed the budget on its own
+        if written and not mgmt_element and self._over_max_bytes():
+            self._prune()
+        return written
 
+    def _write(
+        self, key: str, value: _t.Any, timeout: int | None, mgmt_element: bool
+    ) -> bool:
         timeout = self._normalize_timeout(timeout)
         filename = self._get_filename(key)
-        overwrite = os.path.isfile(filename)
-
-        try:
-            fd, tmp = tempfile.mkstemp(
-                suffix=self._fs_transaction_suffix, dir=self._path
-            )
-            with os.fdopen(fd, "wb") as f:
-                f.write(struct.pack("I", timeout))
-                self.serializer.dump(value, f)
+        counted = self._counting and not self._use_index and not mgmt_element
+        # Linking the new file into place fails if it replaces one, which
+        # tells without looking the file up first. The size of a replaced
+        # file has to be looked up though.
+        link = counted and not self._max_bytes and sys.platform != "win32"
+        old_size = None
+        if counted and not link:
+            try:
+                old_size = os.stat(filename).st_size
+            except OSError:
+                pass
+        replaced = old_size is not None
 
-            self._run_safely(os.replace, tmp, filename)
-            self._run_safely(os.chmod, filename, self._mode)
+        # the file is put in place and its record appended under one lock
+        with ExitStack() as placing:
+            try:
+                fd, tmp = self._open_temp(link)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(struct.pack("I", timeout))
+                    if self._uses_pickle():
+                        self._dump_buffers(value, f)
+                    else:
+                        self.serializer.dump(value, f)
+                    fsize = f.tell()
+                    too_large = self._max_bytes != 0 and fsize > self._max_bytes
+                    if not too_large and sys.platform != "win32":
+                        f.flush()
+                        os.fchmod(fd, self._mode)
+                        if self._expiry_in_mtime:
+                            mtime = _mtime_ns(timeout)
+                            os.utime(fd, ns=(mtime, mtime))
+                        if tmp is None:
+                            placing.enter_context(self._index_locked(mgmt_element))
+                            replaced = self._link_into_place(
+                                f"/proc/self/fd/{fd}", filename, unnamed=True
+                            )
+                if too_large:
+                    if tmp is not None:
+                        os.remove(tmp)
+                    # like a value that was never set, the old one must not be
+                    # served instead
+                    self.delete(key, mgmt_element)
+                    return False
+                if tmp is not None:
+                    if sys.platform == "win32" and self._expiry_in_mtime:
+                        mtime = _mtime_ns(timeout)
+                        os.utime(tmp, ns=(mtime, mtime))
+                    placing.enter_context(self._index_locked(mgmt_element))
+                    if link:
+                        replaced = self._link_into_place(tmp, filename, unnamed=False)
+                    else:
+                        self._move_into_shard(tmp, filename)
+                if sys.platform == "win32":
+                    self._run_safely(os.chmod, filename, self._mode)
+            except OSError:
+                logging.warning(
+                    "Exception raised while handling cache file '%s'",
+                    filename,
+                    exc_info=True,
+                )
+                return False
+            else:
+                # Management elements should not count towards threshold
+                if counted and (not replaced or self._max_bytes):
+                    self._update_count(
+                        delta=0 if replaced else 1,
+                        size_delta=fsize - (old_size or 0) if self._max_bytes else 0,
+                    )
+                if self._use_index and not mgmt_element:
+                    self._log_index(
+                        _INDEX_SET,
+                        self._index_name(filename),
+                        timeout,
+                        fsize,
+                        int(time()),
+                    )
+                return fsize > 0  # function should fail if file is empty
 
-            fsize = Path(filename).stat().st_size
-        except OSError:
-            logging.warning(
-                "Exception raised while handling cache file '%s'",
-                filename,
-                exc_info=True,
-            )
-            return False
-        else:
-            # Management elements should not count towards threshold
-            if not overwrite and not mgmt_element:
-                self._update_count(delta=1)
-            return fsize > 0  # function should fail if file is empty
+    def _open_temp(self, unnamed: bool) -> tuple[int, str | None]:
+        """Open the file a value is written to before it gets its name. It
+        has no name at all if it is going to be linked into place and the
+        file system supports it.
+        """
+        if unnamed and self._use_tmpfile:
+            try:
+                fd = os.open(self._path, _O_TMPFILE | os.O_WRONLY, self._mode)
+                return fd, None
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.EISDIR, errno.EINVAL):
+                    raise
+                self._use_tmpfile = False
+        return tempfile.mkstemp(suffix=self._fs_transaction_suffix, dir=self._path)
 
-    def delete(self, key: str, mgmt_element: bool = False) -> bool:
+    def _link_into_place(self, src: str, filename: str, unnamed: bool) -> bool:
+        """Link a complete temporary file to ``filename`` and return whether
+        it replaced a file. A file without a name is only linked through the
+        cache directory, which makes the link follow the /proc entry.
+        """
+        dir_fd = None
+        target = filename
+        if unnamed:
+            # paths given with the directory are relative to it, and a
+            # relative cache directory must not be joined twice
+            dir_fd = self._open_dir()
+            target = os.path.relpath(filename, self._path)
         try:
-            os.remove(self._get_filename(key))
-        except FileNotFoundError:  # if file doesn't exist we consider it deleted
-            return True
-        except OSError:
-            logging.warning("Exception raised while handling cache file", exc_info=True)
-            return False
-        else:
-            # Management elements should not count towards threshold
-            if not mgmt_element:
-                self._update_count(delta=-1)
+            try:
+                os.link(src, target, dst_dir_fd=dir_fd)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(filename), exist_ok=True)
+                os.link(src, target, dst_dir_fd=dir_fd)
+        except FileExistsError:
+            if unnamed:
+                tmp = f"tmp{os.urandom(8).hex()}{self._fs_transaction_suffix}"
+                os.link(src, tmp, dst_dir_fd=dir_fd)
+                src = os.path.join(self._path, tmp)
+            self._run_safely(os.replace, src, filename)
             return True
+        if not unnamed:
+            os.remove(src)
+        return False
+
+    def delete(self, key: str, mgmt_element: bool = False) -> bool:
+        filename = self._get_filename(key)
+        size = 0
+        with self._index_locked(mgmt_element):
+            try:
+                if self._max_bytes and not mgmt_element:
+                    size = os.stat(filename).st_size
+                os.remove(filename)
+            except FileNotFoundError:  # if file doesn't exist we consider it deleted
+                return True
+            except OSError:
+                logging.warning(
+                    "Exception raised while handling cache file", exc_info=True
+                )
+                return False
+            else:
+                # Management elements should not count towards threshold
+                if not mgmt_element:
+                    self._update_count(delta=-1, size_delta=-size)
+                    if self._use_index:
+                        self._log_index(_INDEX_DELETE, self._index_name(filename))
+                return True
 
     def has(self, key: str) -> bool:
         filename = self._get_filename(key)
+        if self._expiry_in_mtime:
+            try:
+                expires = _mtime_expiry(os.stat(filename))
+            except FileNotFoundError:
+                return False
+            except OSError:
+                logging.warning(
+                    "Exception raised while handling cache file '%s'",
+                    filename,
+                    exc_info=True,
+                )
+                return False
+            if expires is not None:
+                return expires == 0 or expires >= time()
         try:
             with self._safe_stream_open(filename, "rb") as f:
                 pickle_time = struct.unpack("I", f.read(4))[0]
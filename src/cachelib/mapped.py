@@ -0,0 +1,520 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import typing as _t
+import weakref
+from contextlib import contextmanager
+from time import time
+
+from cachelib.base import BaseCache
+from cachelib.serializers import MappedFileSerializer
+
+_MAGIC = b"cachemap"
+_VERSION = 1
+# magic, version, slots, arena size
+_HEADER = struct.Struct("<8sIIQ")
+# write and read position of the arena, ever increasing
+_HEAD_OFFSET = 24
+_TAIL_OFFSET = 32
+_POSITION = struct.Struct("<Q")
+# number of stored items
+_COUNT_OFFSET = 40
+_COUNT = struct.Struct("<I")
+_HEADER_SIZE = 4096
+# sequence number, state, reference bit, expires, key hash, arena position,
+# key length, value length. The sequence number is odd while a writer
+# changes the slot.
+_SLOT = struct.Struct("<IBBxxIQQII4x")
+_SEQ = struct.Struct("<I")
+_REF_OFFSET = 5
+_EMPTY, _USED, _DELETED = 0, 1, 2
+# slot and length of an arena record, followed by the key and the value
+_RECORD = struct.Struct("<II")
+# slot of a record marking the unused end of the arena
+_WRAP = 0xFFFFFFFF
+# attempts of a lock-free read before it takes the writer lock
+_READ_RETRIES = 8
+# byte of the file locked by writers
+_WRITER_LOCK = 0
+
+
+def _close(mm: mmap.mmap, fd: int) -> None:
+    mm.close()
+    os.close(fd)
+
+
+class _MappedFile:
+    """A memory mapped cache file and its writer lock. Every process maps
+    a file once, instances created for the same path share it.
+    """
+
+    def __init__(self, path: str, layout: tuple[int, int], mode: int):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.layout = layout
+        slots, arena = layout
+        data = -(-(_HEADER_SIZE + slots * _SLOT.size) // mmap.PAGESIZE)
+        self.data_offset = data * mmap.PAGESIZE
+        size = self.data_offset + arena
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, mode)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, _WRITER_LOCK)
+            try:
+                if os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, size)
+                self.map = mmap.mmap(fd, 0)
+                self._init_header(path, size)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, _WRITER_LOCK)
+        except BaseException:
+            if hasattr(self, "map"):
+                self.map.close()
+            os.close(fd)
+            raise
+        self.fd = fd
+        self.reset_lock()
+        weakref.finalize(self, _close, self.map, fd)
+
+    def _init_header(self, path: str, size: int) -> None:
+        if len(self.map) < _HEADER_SIZE:
+            raise ValueError(f"{path!r} is not a cache file")
+        magic, version, *layout = _HEADER.unpack_from(self.map)
+        if magic == bytes(len(_MAGIC)) and len(self.map) == size:
+            _HEADER.pack_into(self.map, 0, _MAGIC, _VERSION, *self.layout)
+        elif magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path!r} is not a cache file")
+        elif tuple(layout) != self.layout:
+            raise ValueError(
+                f"{path!r} was created with a different threshold or max_bytes"
+            )
+
+    def reset_lock(self) -> None:
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def writing(self) -> _t.Iterator[None]:
+        with self.lock:
+            self._fcntl.lockf(self.fd, self._fcntl.LOCK_EX, 1, _WRITER_LOCK)
+            try:
+                yield
+            finally:
+                self._fcntl.lockf(self.fd, self._fcntl.LOCK_UN, 1, _WRITER_LOCK)
+
+
+_files: "weakref.WeakValueDictionary[str, _MappedFile]" = weakref.WeakValueDictionary()
+_files_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    global _files_lock
+    _files_lock = threading.Lock()
+    for mapped in _files.values():
+        mapped.reset_lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class MappedFileCache(BaseCache):
+    """A cache in a single memory mapped file for read-mostly workloads
+    shared by many processes, such as configuration or lookup tables.
+
+    The file holds a fixed size open addressing hash table and an arena
+    the keys and values are appended to. Reads take no lock and make no
+    system call: a slot is read together with its value and read again if
+    a writer changed it meanwhile, guarded by a sequence number. Writers
+    take an ``fcntl`` lock on the file, so one process writes at a time.
+
+    When the arena or the table is full, the oldest records are removed
+    with the CLOCK algorithm: an item read since its record was written
+    gets a second chance and is moved to the front of the arena, the others
+    are evicted. Expired items are evicted on the way.
+
+    Only POSIX systems are supported. The file persists, create the cache
+    with the same parameters in every process.
+
+    :param path: the path of the cache file.
+    :param threshold: the maximum number of items the cache stores. The
+        table has twice as many slots.
+    :param default_timeout: the default timeout that is used if no timeout is
+        specified on :meth:`~BaseCache.set`. A timeout of
+        0 indicates that the cache never expires.
+    :param max_bytes: the size of the arena for keys and values.
+    :param mode: the file mode wanted for the cache file, default 0600
+    """
+
+    serializer = MappedFileSerializer()
+
+    def __init__(
+        self,
+        path: str,
+        threshold: int = 500,
+        default_timeout: int = 300,
+        max_bytes: int = 16 * 1024 * 1024,
+        mode: int = 0o600,
+    ):
+        BaseCache.__init__(self, default_timeout)
+        try:
+            import fcntl  # noqa: F401
+        except ImportError as err:
+            raise RuntimeError("no fcntl module found") from err
+        if threshold < 1:
+            raise ValueError("threshold must be at least 1")
+        self._threshold = threshold
+        layout = (2 * threshold, max_bytes - max_bytes % 8)
+        self.path = os.path.realpath(path)
+        with _files_lock:
+            mapped = _files.get(self.path)
+            if mapped is None:
+                mapped = _MappedFile(self.path, layout, mode)
+                _files[self.path] = mapped
+            elif mapped.layout != layout:
+                raise ValueError(
+                    f"{self.path!r} is already open with a different threshold"
+                    " or max_bytes"
+                )
+        self._file = mapped
+        self._map = mapped.map
+        self._slots, self._arena = layout
+        self._data_offset = mapped.data_offset
+
+    def _normalize_timeout(self, timeout: int | None) -> int:
+        timeout = BaseCache._normalize_timeout(self, timeout)
+        if timeout > 0:
+            timeout = int(time()) + timeout
+        elif timeout < 0:
+            # already expired
+            timeout = 1
+        return timeout
+
+    def _locate(self, key: str) -> tuple[bytes, int]:
+        bkey = key.encode()
+        h = int.from_bytes(hashlib.blake2b(bkey, digest_size=8).digest(), "little")
+        return bkey, h
+
+    @staticmethod
+    def _slot_pos(slot: int) -> int:
+        return _HEADER_SIZE + slot * _SLOT.size
+
+    def _record_pos(self, position: int) -> int:
+        return self._data_offset + position % self._arena
+
+    # lock-free reads
+
+    def _snapshot(
+        self, bkey: bytes, h: int
+    ) -> tuple[int, int, int, bytes | None] | None:
+        """Find a key without locking. Returns the slot, its state, its
+        expiry time and the value, or ``None`` if a writer kept changing
+        the slots on the way.
+        """
+        mm = self._map
+        for i in range(self._slots):
+            slot = (h + i) % self._slots
+            pos = self._slot_pos(slot)
+            for _ in range(_READ_RETRIES):
+                seq, state, _, expires, slot_hash, position, klen, vlen = (
+                    _SLOT.unpack_from(mm, pos)
+                )
+                if seq & 1:
+                    continue
+                value = None
+                if state == _USED and slot_hash == h and klen == len(bkey):
+                    start = self._record_pos(position) + _RECORD.size
+                    data = mm[start : start + klen + vlen]
+                    if data[:klen] == bkey:
+                        value = data[klen:]
+                if _SEQ.unpack_from(mm, pos)[0] == seq:
+                    break
+            else:
+                return None
+            if state == _EMPTY:
+                return slot, state, 0, None
+            if value is not None:
+                return slot, state, expires, value
+        return -1, _EMPTY, 0, None
+
+    def _lookup(self, key: str) -> bytes | None:
+        bkey, h = self._locate(key)
+        found = self._snapshot(bkey, h)
+        if found is None:
+            # a writer is busy or died while changing a slot
+            with self._file.writing():
+                slot = self._probe(bkey, h)[0]
+                if slot < 0:
+                    return None
+                found = slot, _USED, *self._read(slot)
+        slot, _, expires, value = found
+        if value is None or (expires and expires <= time()):
+            return None
+        ref = self._slot_pos(slot) + _REF_OFFSET
+        if not self._map[ref]:
+            self._map[ref] = 1
+        return value
+
+    def get(self, key: str) -> _t.Any:
+        value = self._lookup(key)
+        if value is None:
+            return None
+        return self.serializer.loads(value)
+
+    def has(self, key: str) -> bool:
+        return self._lookup(key) is not None
+
+    # writes, with the writer lock held
+
+    def _probe(self, bkey: bytes, h: int) -> tuple[int, int]:
+        """Returns the slot holding the key and the first free slot on its
+        probe sequence, or -1.
+        """
+        mm = self._map
+        free = -1
+        for i in range(self._slots):
+            slot = (h + i) % self._slots
+            pos = self._slot_pos(slot)
+            seq, state, _, _, slot_hash, position, klen, _ = _SLOT.unpack_from(mm, pos)
+            if seq & 1:
+                # left behind by a writer that died
+                self._write_slot(slot, _DELETED, 0, 0, 0, 0, 0)
+                state = _DELETED
+            if state == _EMPTY:
+                return -1, slot if free < 0 else free
+            if state == _DELETED:
+                if free < 0:
+                    free = slot
+            elif slot_hash == h and klen == len(bkey):
+                start = self._record_pos(position) + _RECORD.size
+                if mm[start : start + klen] == bkey:
+                    return slot, free
+        return -1, free
+
+    def _read(self, slot: int) -> tuple[int, bytes]:
+        _, _, _, expires, _, position, klen, vlen = _SLOT.unpack_from(
+            self._map, self._slot_pos(slot)
+        )
+        start = self._record_pos(position) + _RECORD.size + klen
+        return expires, self._map[start : start + vlen]
+
+    def _write_slot(
+        self,
+        slot: int,
+        state: int,
+        expires: int,
+        h: int,
+        position: int,
+        klen: int,
+        vlen: int,
+    ) -> None:
+        mm = self._map
+        pos = self._slot_pos(slot)
+        seq = _SEQ.unpack_from(mm, pos)[0] | 1
+        _SEQ.pack_into(mm, pos, seq)
+        _SLOT.pack_into(mm, pos, seq, state, 0, expires, h, position, klen, vlen)
+        _SEQ.pack_into(mm, pos, (seq + 1) & 0xFFFFFFFF)
+
+    def _remove(self, slot: int) -> None:
+        """Free a slot, as empty if that ends a probe sequence."""
+        mm = self._map
+        following = (slot + 1) % self._slots
+        state = _SLOT.unpack_from(mm, self._slot_pos(following))[1]
+        if state != _EMPTY:
+            self._write_slot(slot, _DELETED, 0, 0, 0, 0, 0)
+        else:
+            while True:
+                self._write_slot(slot, _EMPTY, 0, 0, 0, 0, 0)
+                slot = (slot - 1) % self._slots
+                if _SLOT.unpack_from(mm, self._slot_pos(slot))[1] != _DELETED:
+                    break
+        count = _COUNT.unpack_from(mm, _COUNT_OFFSET)[0]
+        _COUNT.pack_into(mm, _COUNT_OFFSET, max(count - 1, 0))
+
+    def _advance_tail(self) -> None:
+        """Move the CLOCK hand over the oldest record of the arena. A live
+        record that was read since it was written is moved to the front,
+        other records are evicted.
+        """
+        mm = self._map
+        head = _POSITION.unpack_from(mm, _HEAD_OFFSET)[0]
+        tail = _POSITION.unpack_from(mm, _TAIL_OFFSET)[0]
+        room = self._arena - tail % self._arena
+        if tail >= head:
+            # the arena is empty, the next record starts at its beginning
+            start = head + -head % self._arena
+            _POSITION.pack_into(mm, _HEAD_OFFSET, start)
+            _POSITION.pack_into(mm, _TAIL_OFFSET, start)
+            return
+        if room < _RECORD.size:
+            _POSITION.pack_into(mm, _TAIL_OFFSET, tail + room)
+            return
+        start = self._record_pos(tail)
+        slot, length = _RECORD.unpack_from(mm, start)
+        if slot == _WRAP or not _RECORD.size <= length <= room:
+            # a wrap marker, or a record a writer that died didn't finish
+            _POSITION.pack_into(mm, _TAIL_OFFSET, tail + room)
+            return
+        _POSITION.pack_into(mm, _TAIL_OFFSET, tail + length)
+        seq, state, ref, expires, h, position, klen, vlen = _SLOT.unpack_from(
+            mm, self._slot_pos(slot)
+        )
+        if state != _USED or position != tail:
+            # overwritten or deleted
+            return
+        if not ref or (expires and expires <= time()):
+            self._remove(slot)
+            return
+        record = mm[start : start + length]
+        position = self._reserve(length)
+        begin = self._record_pos(position)
+        mm[begin : begin + length] = record
+        self._write_slot(slot, _USED, expires, h, position, klen, vlen)
+
+    def _make_room(self) -> bool:
+        """Evict records until the table has room for another item. A pass
+        over the whole arena that frees nothing means the count may be off,
+        left so by a writer that died, so it is counted again from the
+        slots. Returns ``False`` if that doesn't help either.
+        """
+        mm = self._map
+        recounted = False
+        while True:
+            count = _COUNT.unpack_from(mm, _COUNT_OFFSET)[0]
+            if count < self._threshold:
+                return True
+            # one pass over the records there are now, not the ones it
+            # moves to the front
+            end = _POSITION.unpack_from(mm, _HEAD_OFFSET)[0]
+            while _COUNT.unpack_from(mm, _COUNT_OFFSET)[0] >= self._threshold:
+                if _POSITION.unpack_from(mm, _TAIL_OFFSET)[0] >= end:
+                    break
+                self._advance_tail()
+            if _COUNT.unpack_from(mm, _COUNT_OFFSET)[0] < count:
+                continue
+            if recounted:
+                return False
+            self._recount()
+            recounted = True
+
+    def _recount(self) -> None:
+        mm = self._map
+        count = 0
+        for slot in range(self._slots):
+            seq, state = _SLOT.unpack_from(mm, self._slot_pos(slot))[:2]
+            if seq & 1:
+                # left behind by a writer that died
+                self._write_slot(slot, _DELETED, 0, 0, 0, 0, 0)
+            elif state == _USED:
+                count += 1
+        _COUNT.pack_into(mm, _COUNT_OFFSET, count)
+
+    def _reserve(self, length: int) -> int:
+        """Make room for a record at the front of the arena and return its
+        position.
+        """
+        mm = self._map
+        while True:
+            head: int = _POSITION.unpack_from(mm, _HEAD_OFFSET)[0]
+            tail: int = _POSITION.unpack_from(mm, _TAIL_OFFSET)[0]
+            room = self._arena - head % self._arena
+            gap = room if room < length else 0
+            if head + gap + length - tail <= self._arena:
+                break
+            self._advance_tail()
+        if gap >= _RECORD.size:
+            _RECORD.pack_into(mm, self._record_pos(head), _WRAP, gap)
+        _POSITION.pack_into(mm, _HEAD_OFFSET, head + gap + length)
+        return head + gap
+
+    def _store(self, bkey: bytes, h: int, payload: bytes, expires: int) -> bool:
+        mm = self._map
+        length = _RECORD.size + len(bkey) + len(payload)
+        length += -length % 8
+        if length > self._arena:
+            return False
+        slot = self._probe(bkey, h)[0]
+        if slot < 0 and not self._make_room():
+            return False
+        position = self._reserve(length)
+        # the reservation may have evicted the key
+        slot, free = self._probe(bkey, h)
+        if slot < 0:
+            slot = free
+            count = _COUNT.unpack_from(mm, _COUNT_OFFSET)[0]
+            _COUNT.pack_into(mm, _COUNT_OFFSET, count + 1)
+        start = self._record_pos(position)
+        _RECORD.pack_into(mm, start, slot, length)
+        begin = start + _RECORD.size
+        mm[begin : begin + len(bkey) + len(payload)] = bkey + payload
+        self._write_slot(slot, _USED, expires, h, position, len(bkey), len(payload))
+        return True
+
+    def set(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
+        payload = self.serializer.dumps(value)
+        if payload is None:
+            return False
+        expires = self._normalize_timeout(timeout)
+        bkey, h = self._locate(key)
+        with self._file.writing():
+            return self._store(bkey, h, payload, expires)
+
+    def add(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
+        payload = self.serializer.dumps(value)
+        if payload is None:
+            return False
+        expires = self._normalize_timeout(timeout)
+        bkey, h = self._locate(key)
+        with self._file.writing():
+            slot = self._probe(bkey, h)[0]
+            if slot >= 0:
+                current = self._read(slot)[0]
+                if not current or current > time():
+                    return False
+            return self._store(bkey, h, payload, expires)
+
+    def delete(self, key: str) -> bool:
+        bkey, h = self._locate(key)
+        with self._file.writing():
+            slot = self._probe(bkey, h)[0]
+            if slot < 0:
+                return False
+            self._remove(slot)
+            return True
+
+    def clear(self) -> bool:
+        mm = self._map
+        with self._file.writing():
+            for slot in range(self._slots):
+                if _SLOT.unpack_from(mm, self._slot_pos(slot))[1] != _EMPTY:
+                    self._write_slot(slot, _EMPTY, 0, 0, 0, 0, 0)
+            _POSITION.pack_into(mm, _HEAD_OFFSET, 0)
+            _POSITION.pack_into(mm, _TAIL_OFFSET, 0)
+            _COUNT.pack_into(mm, _COUNT_OFFSET, 0)
+        return True
+
+    def _add_delta(self, key: str, delta: int) -> int | None:
+        bkey, h = self._locate(key)
+        with self._file.writing():
+            slot = self._probe(bkey, h)[0]
+            value = 0
+            if slot >= 0:
+                expires, current = self._read(slot)
+                if not expires or expires > time():
+                    value = self.serializer.loads(current) or 0
+            value += delta
+            payload = self.serializer.dumps(value)
+            if payload is None:
+                return None
+            expires = self._normalize_timeout(None)
+            if not self._store(bkey, h, payload, expires):
+                return None
+            return value
+
+    def inc(self, key: str, delta: int = 1) -> int | None:
+        return self._add_delta(key, delta)
+
+    def dec(self, key: str, delta: int = 1) -> int | None:
+        return self._add_delta(key, -delta)
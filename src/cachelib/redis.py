@@ -1,5 +1,6 @@
 import typing as _t
 
+from cachelib.redis_base import AsyncBaseRedisCache
 from cachelib.redis_base import BaseRedisCache
 from cachelib.serializers import RedisSerializer
 
@@ -53,3 +54,56 @@ class RedisCache(BaseRedisCache):
         else:
             client = host
         super().__init__(client, default_timeout, key_prefix)
+
+
+class AsyncRedisCache(AsyncBaseRedisCache):
+    """Uses the Redis key-value store as a cache backend from asyncio code.
+
+    Works like :class:`RedisCache` with coroutines instead of methods. The
+    first argument can be either a string denoting address of the Redis
+    server or an object resembling an instance of a
+    ``redis.asyncio.Redis`` class.
+
+    :param host: address of the Redis server or an object which API is
+        compatible with the asyncio client of ``redis-py``.
+    :param port: port number on which Redis server listens for connections.
+    :param password: password authentication for the Redis server.
+    :param db: db (zero-based numeric index) on Redis Server to connect.
+    :param default_timeout: the default timeout that is used if no timeout is
+        specified on :meth:`~.AsyncBaseRedisCache.set`. A timeout of
+        0 indicates that the cache never expires.
+    :param key_prefix: A prefix that should be added to all keys.
+
+    Any additional keyword arguments will be passed to
+    ``redis.asyncio.Redis``.
+    """
+
+    serializer = RedisSerializer()
+
+    def __init__(
+        self,
+        host: _t.Any = "localhost",
+        port: int = 6379,
+        password: str | None = None,
+        db: int = 0,
+        default_timeout: int = 300,
+        key_prefix: str | _t.Callable[[], str] | None = None,
+        **kwargs: _t.Any,
+    ):
+        if host is None:
+            raise ValueError("AsyncRedisCache host parameter may not be None")
+        if isinstance(host, str):
+            try:
+                import redis.asyncio
+            except ImportError as err:
+                raise RuntimeError("no redis module found") from err
+            if kwargs.get("decode_responses", None):
+                raise ValueError(
+                    "decode_responses is not supported by AsyncRedisCache."
+                )
+            client = redis.asyncio.Redis(
+                host=host, port=port, password=password, db=db, **kwargs
+            )
+        else:
+            client = host
+        super().__init__(client, default_timeout, key_prefix)
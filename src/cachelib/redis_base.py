@@ -131,3 +131,160 @@ class BaseRedisCache(BaseCache):
 
     def dec(self, key: str, delta: int = 1) -> _t.Any:
         return self._write_client.incr(name=f"{self._get_prefix()}{key}", amount=-delta)
+
+
+class AsyncBaseRedisCache:
+    """Base class for Redis compatible cache backends with an asyncio client.
+
+    It has the API of :class:`~.BaseCache` with coroutines instead of
+    methods, and stores items the same way as :class:`BaseRedisCache`, so
+    the synchronous and the asynchronous caches can share a database.
+
+    Sub classes are responsible for constructing the client and passing it
+    to this base via ``super().__init__``.
+
+    :param client: a client instance compatible with the asyncio Redis API.
+    :param default_timeout: the default timeout that is used if no timeout is
+        specified on :meth:`set`. A timeout of
+        0 indicates that the cache never expires.
+    :param key_prefix: A prefix that should be added to all keys.
+    """
+
+    _read_client: _t.Any = None
+    _write_client: _t.Any = None
+    serializer = BaseRedisSerializer()
+
+    def __init__(
+        self,
+        client: _t.Any,
+        default_timeout: int = 300,
+        key_prefix: str | _t.Callable[[], str] | None = None,
+    ):
+        self.default_timeout = default_timeout
+        self._read_client = self._write_client = client
+        self.key_prefix = key_prefix or ""
+
+    def _get_prefix(self) -> str:
+        return (
+            self.key_prefix if isinstance(self.key_prefix, str) else self.key_prefix()
+        )
+
+    def _normalize_timeout(self, timeout: int | None) -> int:
+        """Normalize timeout by setting it to the default timeout if
+        not defined (None) or -1 if explicitly set to zero.
+
+        :param timeout: timeout to normalize.
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+        if timeout == 0:
+            timeout = -1
+        return timeout
+
+    def _prefixed(self, keys: _t.Iterable[str]) -> list[str]:
+        if self.key_prefix:
+            prefix = self._get_prefix()
+            return [f"{prefix}{key}" for key in keys]
+        return list(keys)
+
+    async def get(self, key: str) -> _t.Any:
+        return self.serializer.loads(
+            await self._read_client.get(f"{self._get_prefix()}{key}")
+        )
+
+    async def get_many(self, *keys: str) -> list[_t.Any]:
+        if not keys:
+            return []
+        values = await self._read_client.mget(self._prefixed(keys))
+        return [self.serializer.loads(x) for x in values]
+
+    async def get_dict(self, *keys: str) -> dict[str, _t.Any]:
+        return dict(zip(keys, await self.get_many(*keys), strict=True))
+
+    async def set(self, key: str, value: _t.Any, timeout: int | None = None) -> _t.Any:
+        timeout = self._normalize_timeout(timeout)
+        dump = self.serializer.dumps(value)
+        return await self._write_client.set(
+            name=f"{self._get_prefix()}{key}",
+            value=dump,
+            ex=timeout if timeout != -1 else None,
+        )
+
+    async def add(self, key: str, value: _t.Any, timeout: int | None = None) -> _t.Any:
+        timeout = self._normalize_timeout(timeout)
+        dump = self.serializer.dumps(value)
+        # set with nx and ex in one command, so the key can't be left
+        # without its expiry
+        created = await self._write_client.set(
+            name=f"{self._get_prefix()}{key}",
+            value=dump,
+            ex=timeout if timeout != -1 else None,
+            nx=True,
+        )
+        return bool(created)
+
+    async def set_many(
+        self, mapping: dict[str, _t.Any], timeout: int | None = None
+    ) -> list[_t.Any]:
+        timeout = self._normalize_timeout(timeout)
+        # Use transaction=False to batch without calling MULTI
+        # which is not supported by twemproxy
+        pipe = self._write_client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            dump = self.serializer.dumps(value)
+            pipe.set(
+                name=f"{self._get_prefix()}{key}",
+                value=dump,
+                ex=timeout if timeout != -1 else None,
+            )
+        results = await pipe.execute()
+        return [
+            k for k, was_set in zip(mapping.keys(), results, strict=True) if was_set
+        ]
+
+    async def delete(self, key: str) -> bool:
+        return bool(await self._write_client.delete(f"{self._get_prefix()}{key}"))
+
+    async def delete_many(self, *keys: str) -> list[_t.Any]:
+        if not keys:
+            return []
+        await self._write_client.delete(*self._prefixed(keys))
+        exists = await self.has_many(*keys)
+        return [k for k, found in zip(keys, exists, strict=True) if not found]
+
+    async def has(self, key: str) -> bool:
+        return bool(await self._read_client.exists(f"{self._get_prefix()}{key}"))
+
+    async def has_many(self, *keys: str) -> list[bool]:
+        if not keys:
+            return []
+        pipe = self._read_client.pipeline(transaction=False)
+        for key in self._prefixed(keys):
+            pipe.exists(key)
+        return [bool(found) for found in await pipe.execute()]
+
+    async def clear(self) -> bool:
+        status = 0
+        if self.key_prefix:
+            keys = await self._read_client.keys(self._get_prefix() + "*")
+            if keys:
+                status = await self._write_client.delete(*keys)
+        else:
+            status = await self._write_client.flushdb()
+        return bool(status)
+
+    async def inc(self, key: str, delta: int = 1) -> _t.Any:
+        return await self._write_client.incr(
+            name=f"{self._get_prefix()}{key}", amount=delta
+        )
+
+    async def dec(self, key: str, delta: int = 1) -> _t.Any:
+        return await self._write_client.incr(
+            name=f"{self._get_prefix()}{key}", amount=-delta
+        )
+
+    async def aclose(self) -> None:
+        """Close the connections of the client."""
+        await self._write_client.aclose()
+        if self._read_client is not self._write_client:
+            await self._read_client.aclose()
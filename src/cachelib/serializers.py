@@ -1,7 +1,11 @@
+import copy as _copy
+import datetime
 import json
 import logging
 import pickle
 import typing as _t
+from decimal import Decimal
+from fractions import Fraction
 
 
 class BaseSerializer:
@@ -135,6 +139,74 @@ class JSONSerializer(BaseSerializer):
             return data
 
 
+_immutable_types = (
+    type(None),
+    bool,
+    int,
+    float,
+    complex,
+    str,
+    bytes,
+    range,
+    Decimal,
+    Fraction,
+    datetime.date,
+    datetime.time,
+    datetime.timedelta,
+    datetime.tzinfo,
+)
+
+
+def _is_immutable(value: _t.Any) -> bool:
+    if isinstance(value, _immutable_types):
+        return True
+    if isinstance(value, tuple | frozenset):
+        return all(_is_immutable(item) for item in value)
+    return False
+
+
+class ReferenceSerializer(BaseSerializer):
+    """Stores values by reference instead of serializing them. A cache hit
+    then costs a dictionary lookup instead of unpickling the value. This
+    only works with in-process caches like :class:`~cachelib.SimpleCache`::
+
+        cache = SimpleCache()
+        cache.serializer = ReferenceSerializer(copy="shallow")
+
+    :param copy: ``"none"`` (the default) stores and returns the given object
+        itself, so later changes to it are visible through the cache.
+        ``"shallow"`` stores and returns shallow copies. ``"on-read"`` stores
+        the given object and returns a deep copy of it on every read.
+    :param immutable_only: raise :exc:`TypeError` when storing a value that is
+        not made of immutable built-in types only, which makes ``"none"``
+        safe to use.
+    """
+
+    _copy_modes = ("none", "shallow", "on-read")
+
+    def __init__(self, copy: str = "none", immutable_only: bool = False):
+        if copy not in self._copy_modes:
+            raise ValueError(
+                f"copy must be one of {self._copy_modes}, received {copy!r}"
+            )
+        self.copy = copy
+        self.immutable_only = immutable_only
+
+    def dumps(self, value: _t.Any, *args: _t.Any, **kwargs: _t.Any) -> _t.Any:
+        if self.immutable_only and not _is_immutable(value):
+            raise TypeError(f"{type(value).__name__} values are not immutable")
+        if self.copy == "shallow":
+            return _copy.copy(value)
+        return value
+
+    def loads(self, bvalue: _t.Any, *args: _t.Any, **kwargs: _t.Any) -> _t.Any:
+        if self.copy == "shallow":
+            return _copy.copy(bvalue)
+        if self.copy == "on-read":
+            return _copy.deepcopy(bvalue)
+        return bvalue
+
+
 """Default serializers for each cache type.
 
 The following classes can be used to further customize
@@ -152,6 +224,22 @@ class SimpleSerializer(BaseSerializer):
     """Default serializer for SimpleCache."""
 
 
+class SharedMemorySerializer(BaseSerializer):
+    """Default serializer for SharedMemoryCache."""
+
+
+class SqliteSerializer(BaseSerializer):
+    """Default serializer for SqliteCache."""
+
+
+class BitcaskSerializer(BaseSerializer):
+    """Default serializer for BitcaskCache."""
+
+
+class MappedFileSerializer(BaseSerializer):
+    """Default serializer for MappedFileCache."""
+
+
 class FileSystemSerializer(BaseSerializer):
     """Default serializer for FileSystemCache."""
 
@@ -0,0 +1,718 @@
+import hashlib
+import mmap
+import os
+import random
+import struct
+import tempfile
+import threading
+import typing as _t
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import time
+
+from cachelib.base import BaseCache
+from cachelib.serializers import SharedMemorySerializer
+
+_MAGIC = b"cachelib"
+_VERSION = 2
+# magic, version, slots, items, stripes, page size, pages, next unused page
+_HEADER = struct.Struct("<8sIIIIIII")
+_NEXT_PAGE = struct.Struct("<I")
+_NEXT_PAGE_OFFSET = 32
+# free list head, bump pointer and page end of every size class
+_CLASS = struct.Struct("<QQQ")
+_CLASS_OFFSET = 64
+_HEADER_SIZE = 4096
+_MAX_CLASSES = (_HEADER_SIZE - _CLASS_OFFSET) // _CLASS.size
+# free chunks start with the offset of the next free chunk
+_NEXT = struct.Struct("<Q")
+# state, expires, key hash, chunk offset, size class, key length,
+# value length, last access in microseconds
+_SLOT = struct.Struct("<B3xIQQIII4xQ")
+_SLOT_HEAD = struct.Struct("<B3xIQ")
+_ACCESS = struct.Struct("<Q")
+_ACCESS_OFFSET = 40
+_EMPTY, _USED, _DELETED = 0, 1, 2
+# number of items in a table region, the table follows
+_COUNT = struct.Struct("<I")
+# size class plus one, used chunks and last access in microseconds of a
+# page, the counts follow
+_PAGE = struct.Struct("<IIQ")
+_PAGE_ACCESS_OFFSET = 8
+# chunks start with the slot of their item, so the items of a page can be
+# found without going through the table
+_OWNER = struct.Struct("<I")
+# slots looked at from the first slot of a key
+_MAX_PROBE = 32
+# items compared to pick the one to evict
+_VICTIM_SAMPLES = 16
+_MIN_CHUNK = 64
+_CHUNK_GROWTH = 1.25
+# bytes of the file used as fcntl record locks
+_INIT_LOCK = 0
+_ALLOC_LOCK = 1
+_STRIPE_LOCK = 2
+
+
+def _default_directory() -> str:
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def _size_classes(page_size: int) -> list[int]:
+    sizes = []
+    size = _MIN_CHUNK
+    while size < page_size:
+        sizes.append(size)
+        size = max(size + 8, (int(size * _CHUNK_GROWTH) + 7) & ~7)
+    sizes.append(page_size)
+    return sizes
+
+
+def _close(mm: mmap.mmap, fd: int) -> None:
+    mm.close()
+    os.close(fd)
+
+
+class _Segment:
+    """A memory mapped cache file and the locks guarding it. Every process
+    maps a file once, instances created for the same path share it.
+    """
+
+    def __init__(self, path: str, layout: tuple[int, ...], mode: int):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.layout = layout
+        slots, _, stripes, page_size, pages = layout
+        self.counts_offset = _HEADER_SIZE + slots * _SLOT.size
+        self.pages_offset = self.counts_offset + stripes * _COUNT.size
+        end = self.pages_offset + pages * _PAGE.size
+        self.data_offset = -(-end // mmap.PAGESIZE) * mmap.PAGESIZE
+        size = self.data_offset + pages * page_size
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, mode)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, _INIT_LOCK)
+            try:
+                if os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, size)
+                self.map = mmap.mmap(fd, 0)
+                self._init_header(path, size)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, _INIT_LOCK)
+        except BaseException:
+            if hasattr(self, "map"):
+                self.map.close()
+            os.close(fd)
+            raise
+        self.fd = fd
+        self.reset_locks()
+        weakref.finalize(self, _close, self.map, fd)
+
+    def _init_header(self, path: str, size: int) -> None:
+        if len(self.map) < _HEADER_SIZE:
+            raise ValueError(f"{path!r} is not a cache file")
+        magic, version, *layout = _HEADER.unpack_from(self.map)
+        if magic == bytes(len(_MAGIC)) and len(self.map) == size:
+            _HEADER.pack_into(self.map, 0, _MAGIC, _VERSION, *self.layout, 0)
+        elif magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path!r} is not a cache file")
+        elif tuple(layout[:-1]) != self.layout:
+            raise ValueError(
+                f"{path!r} was created with a different threshold, stripes,"
+                " page_size or max_bytes"
+            )
+
+    def reset_locks(self) -> None:
+        stripes = self.layout[2]
+        self.locks = [threading.Lock() for _ in range(_STRIPE_LOCK + stripes)]
+
+    def lock(self, index: int) -> None:
+        self.locks[index].acquire()
+        try:
+            self._fcntl.lockf(self.fd, self._fcntl.LOCK_EX, 1, index)
+        except BaseException:
+            self.locks[index].release()
+            raise
+
+    def try_lock(self, index: int) -> bool:
+        if not self.locks[index].acquire(blocking=False):
+            return False
+        try:
+            self._fcntl.lockf(
+                self.fd, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB, 1, index
+            )
+        except OSError:
+            self.locks[index].release()
+            return False
+        return True
+
+    def unlock(self, index: int) -> None:
+        try:
+            self._fcntl.lockf(self.fd, self._fcntl.LOCK_UN, 1, index)
+        finally:
+            self.locks[index].release()
+
+
+_segments: "weakref.WeakValueDictionary[str, _Segment]" = weakref.WeakValueDictionary()
+_segments_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    global _segments_lock
+    _segments_lock = threading.Lock()
+    for segment in _segments.values():
+        segment.reset_locks()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class SharedMemoryCache(BaseCache):
+    """A cache shared by all processes on the same host, such as the workers
+    of a prefork server. Items live in a memory mapped file, in ``/dev/shm``
+    when available, so every process reads and writes the same table
+    without a network round trip.
+
+    The file holds a fixed size open addressing hash table split into
+    ``stripes`` regions with a lock each, and a data area divided into pages
+    that a slab allocator hands out to size classes. The table has a third
+    more slots than items and a key is looked up in at most 32 slots, so
+    lookups take the same time however large the cache is. When a region
+    of the table holds its share of the items or a size class runs out of
+    memory, an expired item is removed, or else the least recently used one
+    of a random sample.
+
+    Only POSIX systems are supported, the locks are ``fcntl`` record locks.
+    The file stays around until it is removed, create the cache with the
+    same parameters in every process.
+
+    :param name: the name of the file in ``/dev/shm``, or in the temporary
+                 directory if there is no ``/dev/shm``. An absolute path is
+                 used as is.
+    :param threshold: the maximum number of items the cache stores. It is
+                      rounded up to a multiple of ``stripes``, every region
+                      of the table holds an equal share.
+    :param default_timeout: the default timeout that is used if no timeout is
+                            specified on :meth:`~BaseCache.set`. A timeout of
+                            0 indicates that the cache never expires.
+    :param max_bytes: the size of the data area for keys and values.
+    :param page_size: the largest key plus serialized value that can be
+                      stored. Memory is assigned to size classes one page
+                      at a time and stays there until :meth:`clear`.
+    :param stripes: the number of independently locked table regions.
+    :param mode: the file mode wanted for the cache file, default 0600
+    """
+
+    serializer = SharedMemorySerializer()
+
+    def __init__(
+        self,
+        name: str = "cachelib",
+        threshold: int = 500,
+        default_timeout: int = 300,
+        max_bytes: int = 16 * 1024 * 1024,
+        page_size: int = 1024 * 1024,
+        stripes: int = 16,
+        mode: int = 0o600,
+    ):
+        BaseCache.__init__(self, default_timeout)
+        try:
+            import fcntl  # noqa: F401
+        except ImportError as err:
+            raise RuntimeError("no fcntl module found") from err
+        if stripes < 1:
+            raise ValueError("stripes must be at least 1")
+        self._classes = _size_classes(page_size)
+        if page_size < _MIN_CHUNK or len(self._classes) > _MAX_CLASSES:
+            raise ValueError(f"unsupported page_size {page_size}")
+        self._stripes = stripes
+        self._stripe_items = max(1, -(-threshold // stripes))
+        self._stripe_slots = self._stripe_items + -(-self._stripe_items // 3)
+        self._page_size = page_size
+        layout = (
+            self._stripe_slots * stripes,
+            self._stripe_items * stripes,
+            stripes,
+            page_size,
+            max(1, max_bytes // page_size),
+        )
+        if os.path.isabs(name):
+            path = name
+        else:
+            path = os.path.join(_default_directory(), name)
+        self.path = os.path.realpath(path)
+        with _segments_lock:
+            segment = _segments.get(self.path)
+            if segment is None:
+                segment = _Segment(self.path, layout, mode)
+                _segments[self.path] = segment
+            elif segment.layout != layout:
+                raise ValueError(
+                    f"{self.path!r} is already open with a different threshold,"
+                    " stripes, page_size or max_bytes"
+                )
+        self._segment = segment
+        self._map = segment.map
+        self._pages = layout[4]
+        self._counts_offset = segment.counts_offset
+        self._pages_offset = segment.pages_offset
+        self._data_offset = segment.data_offset
+
+    def _normalize_timeout(self, timeout: int | None) -> int:
+        timeout = BaseCache._normalize_timeout(self, timeout)
+        if timeout > 0:
+            timeout = int(time()) + timeout
+        elif timeout < 0:
+            # already expired
+            timeout = 1
+        return timeout
+
+    def _locate(self, key: str) -> tuple[bytes, int, int, int]:
+        bkey = key.encode()
+        h = int.from_bytes(hashlib.blake2b(bkey, digest_size=8).digest(), "little")
+        stripe = h % self._stripes
+        return bkey, h, stripe, (h // self._stripes) % self._stripe_slots
+
+    @staticmethod
+    def _slot_pos(slot: int) -> int:
+        return _HEADER_SIZE + slot * _SLOT.size
+
+    def _page_pos(self, offset: int) -> int:
+        """The position of the entry of the page holding a chunk."""
+        page = (offset - self._data_offset) // self._page_size
+        return self._pages_offset + page * _PAGE.size
+
+    def _add_count(self, stripe: int, delta: int) -> int:
+        pos = self._counts_offset + stripe * _COUNT.size
+        count: int = _COUNT.unpack_from(self._map, pos)[0] + delta
+        _COUNT.pack_into(self._map, pos, count)
+        return count
+
+    def _probe(self, bkey: bytes, h: int, stripe: int, start: int) -> tuple[int, int]:
+        """Look a key up in its table region, returns the slot holding the
+        key and the first free slot on its probe sequence, or -1.
+        """
+        mm = self._map
+        n = self._stripe_slots
+        base = stripe * n
+        free = -1
+        for i in range(min(n, _MAX_PROBE)):
+            slot = base + (start + i) % n
+            pos = self._slot_pos(slot)
+            state, _, slot_hash = _SLOT_HEAD.unpack_from(mm, pos)
+            if state == _EMPTY:
+                return -1, slot if free < 0 else free
+            if state == _DELETED:
+                if free < 0:
+                    free = slot
+            elif slot_hash == h:
+                offset, klen = _SLOT.unpack_from(mm, pos)[3:6:2]
+                offset += _OWNER.size
+                if klen == len(bkey) and mm[offset : offset + klen] == bkey:
+                    return slot, free
+        return -1, free
+
+    def _read(self, slot: int, now: float) -> bytes | None:
+        mm = self._map
+        pos = self._slot_pos(slot)
+        _, expires, _, offset, _, klen, vlen, _ = _SLOT.unpack_from(mm, pos)
+        if expires and expires <= now:
+            self._remove(slot)
+            return None
+        access = int(now * 1_000_000)
+        _ACCESS.pack_into(mm, pos + _ACCESS_OFFSET, access)
+        _ACCESS.pack_into(mm, self._page_pos(offset) + _PAGE_ACCESS_OFFSET, access)
+        start = offset + _OWNER.size + klen
+        return mm[start : start + vlen]
+
+    def _alloc(self, cls: int) -> int:
+        mm = self._map
+        pos = _CLASS_OFFSET + cls * _CLASS.size
+        self._segment.lock(_ALLOC_LOCK)
+        try:
+            head: int
+            bump: int
+            end: int
+            head, bump, end = _CLASS.unpack_from(mm, pos)
+            if head:
+                _CLASS.pack_into(mm, pos, _NEXT.unpack_from(mm, head)[0], bump, end)
+                offset = head
+            else:
+                size = self._classes[cls]
+                if bump + size > end:
+                    (page,) = _NEXT_PAGE.unpack_from(mm, _NEXT_PAGE_OFFSET)
+                    if page >= self._pages:
+                        return 0
+                    _NEXT_PAGE.pack_into(mm, _NEXT_PAGE_OFFSET, page + 1)
+                    bump = self._data_offset + page * self._page_size
+                    end = bump + self._page_size
+                    _PAGE.pack_into(mm, self._page_pos(bump), cls + 1, 0, 0)
+                _CLASS.pack_into(mm, pos, 0, bump + size, end)
+                offset = bump
+            page_pos = self._page_pos(offset)
+            page_cls, used, access = _PAGE.unpack_from(mm, page_pos)
+            _PAGE.pack_into(mm, page_pos, page_cls, used + 1, access)
+            return offset
+        finally:
+            self._segment.unlock(_ALLOC_LOCK)
+
+    def _free(self, offset: int, cls: int) -> None:
+        mm = self._map
+        pos = _CLASS_OFFSET + cls * _CLASS.size
+        self._segment.lock(_ALLOC_LOCK)
+        try:
+            head, bump, end = _CLASS.unpack_from(mm, pos)
+            _NEXT.pack_into(mm, offset, head)
+            _CLASS.pack_into(mm, pos, offset, bump, end)
+            page_pos = self._page_pos(offset)
+            page_cls, used, access = _PAGE.unpack_from(mm, page_pos)
+            _PAGE.pack_into(mm, page_pos, page_cls, max(used - 1, 0), access)
+        finally:
+            self._segment.unlock(_ALLOC_LOCK)
+
+    def _remove(self, slot: int) -> None:
+        offset, cls = _SLOT.unpack_from(self._map, self._slot_pos(slot))[3:5]
+        self._free(offset, cls)
+        self._clear_slot(slot)
+
+    def _clear_slot(self, slot: int) -> None:
+        mm = self._map
+        n = self._stripe_slots
+        base = slot - slot % n
+        local = slot - base
+        self._add_count(slot // n, -1)
+        if mm[self._slot_pos(base + (local + 1) % n)] != _EMPTY:
+            mm[self._slot_pos(slot)] = _DELETED
+            return
+        # nothing probes past an empty slot, so the tombstones leading up
+        # to it can become empty as well
+        for _ in range(n):
+            mm[self._slot_pos(base + local)] = _EMPTY
+            local = (local - 1) % n
+            if mm[self._slot_pos(base + local)] != _DELETED:
+                break
+
+    def _oldest(self, slots: _t.Iterable[int], cls: int, samples: int) -> int:
+        """Pick the item to evict among the first ``samples`` items of the
+        given slots, of a size class if ``cls`` isn't -1. An expired item
+        goes first, otherwise the least recently used one.
+        """
+        mm = self._map
+        now = time()
+        victim = -1
+        oldest = 0
+        for slot in slots:
+            state, expires, _, _, slot_cls, _, _, access = _SLOT.unpack_from(
+                mm, self._slot_pos(slot)
+            )
+            if state != _USED or (cls >= 0 and slot_cls != cls):
+                continue
+            if expires and expires <= now:
+                return slot
+            if victim < 0 or access < oldest:
+                victim, oldest = slot, access
+            samples -= 1
+            if not samples:
+                break
+        return victim
+
+    def _victim(self, stripe: int, cls: int = -1) -> int:
+        """Pick an item of a table region to evict from a sample that
+        starts at a random slot.
+        """
+        n = self._stripe_slots
+        base = stripe * n
+        start = random.randrange(n)
+        slots = (base + (start + i) % n for i in range(n))
+        return self._oldest(slots, cls, _VICTIM_SAMPLES)
+
+    def _alloc_evicting(self, cls: int, stripe: int) -> int:
+        offset = self._alloc(cls)
+        while not offset:
+            victim = self._victim(stripe, cls)
+            if victim < 0:
+                break
+            self._remove(victim)
+            offset = self._alloc(cls)
+        # the other regions are only tried when their locks are free to
+        # not deadlock with processes doing the same
+        for i in range(1, self._stripes):
+            if offset:
+                break
+            other = (stripe + i) % self._stripes
+            if not self._segment.try_lock(_STRIPE_LOCK + other):
+                continue
+            try:
+                victim = self._victim(other, cls)
+                if victim >= 0:
+                    self._remove(victim)
+                    offset = self._alloc(cls)
+            finally:
+                self._segment.unlock(_STRIPE_LOCK + other)
+        if not offset and self._reassign_page(cls, stripe):
+            offset = self._alloc(cls)
+        return offset
+
+    def _reassign_page(self, cls: int, stripe: int) -> bool:
+        """Evict the page holding the least recently used item and hand it
+        to a size class that has no memory left. This needs every region
+        of the table, so it gives up if any of them is busy.
+        """
+        locked = []
+        try:
+            for other in range(self._stripes):
+                if other == stripe:
+                    continue
+                if not self._segment.try_lock(_STRIPE_LOCK + other):
+                    return False
+                locked.append(other)
+            return self._reassign_page_locked(cls)
+        finally:
+            for other in locked:
+                self._segment.unlock(_STRIPE_LOCK + other)
+
+    def _reassign_page_locked(self, cls: int) -> bool:
+        mm = self._map
+        (pages,) = _NEXT_PAGE.unpack_from(mm, _NEXT_PAGE_OFFSET)
+        victim = -1
+        oldest = 0
+        for page in range(pages):
+            pos = self._pages_offset + page * _PAGE.size
+            page_cls, used, access = _PAGE.unpack_from(mm, pos)
+            if page_cls - 1 == cls:
+                continue
+            if not used:
+                # nothing to evict
+                victim = page
+                break
+            if victim < 0 or access < oldest:
+                victim, oldest = page, access
+        if victim < 0:
+            return False
+        page_pos = self._pages_offset + victim * _PAGE.size
+        victim_cls = _PAGE.unpack_from(mm, page_pos)[0] - 1
+        start = self._data_offset + victim * self._page_size
+        end = start + self._page_size
+        size = self._classes[victim_cls]
+        slots = self._stripes * self._stripe_slots
+        for chunk in range(start, end - size + 1, size):
+            (slot,) = _OWNER.unpack_from(mm, chunk)
+            # free chunks and the end of the page hold no valid owner
+            if slot < slots:
+                state, _, _, offset = _SLOT.unpack_from(mm, self._slot_pos(slot))[:4]
+                if state == _USED and offset == chunk:
+                    self._clear_slot(slot)
+
+        self._segment.lock(_ALLOC_LOCK)
+        try:
+            pos = _CLASS_OFFSET + victim_cls * _CLASS.size
+            head, bump, page_end = _CLASS.unpack_from(mm, pos)
+            # unlink the free chunks of the page
+            prev, chunk = 0, head
+            while chunk:
+                (following,) = _NEXT.unpack_from(mm, chunk)
+                if not start <= chunk < end:
+                    prev = chunk
+                elif prev:
+                    _NEXT.pack_into(mm, prev, following)
+                else:
+                    head = following
+                chunk = following
+            if page_end == end:
+                bump = page_end = 0
+            _CLASS.pack_into(mm, pos, head, bump, page_end)
+            pos = _CLASS_OFFSET + cls * _CLASS.size
+            head = _CLASS.unpack_from(mm, pos)[0]
+            _CLASS.pack_into(mm, pos, head, start, end)
+            _PAGE.pack_into(mm, page_pos, cls + 1, 0, 0)
+        finally:
+            self._segment.unlock(_ALLOC_LOCK)
+        return True
+
+    def _store(
+        self,
+        bkey: bytes,
+        h: int,
+        stripe: int,
+        start: int,
+        found: int,
+        payload: bytes,
+        expires: int,
+    ) -> bool:
+        mm = self._map
+        klen = len(bkey)
+        cls = bisect_left(self._classes, _OWNER.size + klen + len(payload))
+        if found >= 0:
+            offset, old_cls = _SLOT.unpack_from(mm, self._slot_pos(found))[3:5]
+            if old_cls != cls:
+                self._remove(found)
+                found = -1
+        if found < 0:
+            if cls == len(self._classes):
+                return False
+            count = _COUNT.unpack_from(mm, self._counts_offset + stripe * _COUNT.size)[
+                0
+            ]
+            if count >= self._stripe_items:
+                victim = self._victim(stripe)
+                if victim >= 0:
+                    self._remove(victim)
+            offset = self._alloc_evicting(cls, stripe)
+            if not offset:
+                return False
+            # allocating may have evicted items, look for a free slot after
+            found, free = self._probe(bkey, h, stripe, start)
+            if free < 0:
+                # every slot the key may use is taken
+                n = self._stripe_slots
+                base = stripe * n
+                window = (base + (start + i) % n for i in range(min(n, _MAX_PROBE)))
+                self._remove(self._oldest(window, -1, _MAX_PROBE))
+                found, free = self._probe(bkey, h, stripe, start)
+            found = free
+            self._add_count(stripe, 1)
+        now = int(time() * 1_000_000)
+        _OWNER.pack_into(mm, offset, found)
+        data = offset + _OWNER.size
+        mm[data : data + klen] = bkey
+        mm[data + klen : data + klen + len(payload)] = payload
+        _ACCESS.pack_into(mm, self._page_pos(offset) + _PAGE_ACCESS_OFFSET, now)
+        _SLOT.pack_into(
+            mm,
+            self._slot_pos(found),
+            _USED,
+            expires,
+            h,
+            offset,
+            cls,
+            klen,
+            len(payload),
+            now,
+        )
+        return True
+
+    def get(self, key: str) -> _t.Any:
+        bkey, h, stripe, start = self._locate(key)
+        self._segment.lock(_STRIPE_LOCK + stripe)
+        try:
+            found = self._probe(bkey, h, stripe, start)[0]
+            if found < 0:
+                return None
+            payload = self._read(found, time())
+        finally:
+            self._segment.unlock(_STRIPE_LOCK + stripe)
+        if payload is None:
+            return None
+        return self.serializer.loads(payload)
+
+    def set(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
+        payload = self.serializer.dumps(value)
+        if payload is None:
+            return False
+        expires = self._normalize_timeout(timeout)
+        bkey, h, stripe, start = self._locate(key)
+        self._segment.lock(_STRIPE_LOCK + stripe)
+        try:
+            found = self._probe(bkey, h, stripe, start)[0]
+            stored = self._store(bkey, h, stripe, start, found, payload, expires)
+        finally:
+            self._segment.unlock(_STRIPE_LOCK + stripe)
+        return stored
+
+    def add(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
+        payload = self.serializer.dumps(value)
+        if payload is None:
+            return False
+        expires = self._normalize_timeout(timeout)
+        bkey, h, stripe, start = self._locate(key)
+        self._segment.lock(_STRIPE_LOCK + stripe)
+        try:
+            found = self._probe(bkey, h, stripe, start)[0]
+            if found >= 0 and self._read(found, time()) is not None:
+                return False
+            found = self._probe(bkey, h, stripe, start)[0]
+            return self._store(bkey, h, stripe, start, found, payload, expires)
+        finally:
+            self._segment.unlock(_STRIPE_LOCK + stripe)
+
+    def delete(self, key: str) -> bool:
+        bkey, h, stripe, start = self._locate(key)
+        self._segment.lock(_STRIPE_LOCK + stripe)
+        try:
+            found = self._probe(bkey, h, stripe, start)[0]
+            if found < 0:
+                return False
+            self._remove(found)
+            return True
+        finally:
+            self._segment.unlock(_STRIPE_LOCK + stripe)
+
+    def has(self, key: str) -> bool:
+        bkey, h, stripe, start = self._locate(key)
+        self._segment.lock(_STRIPE_LOCK + stripe)
+        try:
+            found = self._probe(bkey, h, stripe, start)[0]
+            if found < 0:
+                return False
+            _, expires = _SLOT_HEAD.unpack_from(self._map, self._slot_pos(found))[:2]
+            if expires and expires <= time():
+                self._remove(found)
+                return False
+            return True
+        finally:
+            self._segment.unlock(_STRIPE_LOCK + stripe)
+
+    @contextmanager
+    def _all_locked(self) -> _t.Iterator[None]:
+        locked = []
+        try:
+            for stripe in range(self._stripes):
+                self._segment.lock(_STRIPE_LOCK + stripe)
+                locked.append(_STRIPE_LOCK + stripe)
+            self._segment.lock(_ALLOC_LOCK)
+            locked.append(_ALLOC_LOCK)
+            yield
+        finally:
+            for index in reversed(locked):
+                self._segment.unlock(index)
+
+    def clear(self) -> bool:
+        mm = self._map
+        with self._all_locked():
+            mm[_CLASS_OFFSET:_HEADER_SIZE] = bytes(_HEADER_SIZE - _CLASS_OFFSET)
+            # the table, the counts and the pages
+            mm[_HEADER_SIZE : self._data_offset] = bytes(
+                self._data_offset - _HEADER_SIZE
+            )
+            _NEXT_PAGE.pack_into(mm, _NEXT_PAGE_OFFSET, 0)
+        return True
+
+    def _add_delta(self, key: str, delta: int) -> int | None:
+        bkey, h, stripe, start = self._locate(key)
+        self._segment.lock(_STRIPE_LOCK + stripe)
+        try:
+            found = self._probe(bkey, h, stripe, start)[0]
+            payload = None if found < 0 else self._read(found, time())
+            value = (self.serializer.loads(payload) if payload is not None else 0) or 0
+            value += delta
+            payload = self.serializer.dumps(value)
+            if payload is None:
+                return None
+            found = self._probe(bkey, h, stripe, start)[0]
+            expires = self._normalize_timeout(None)
+            if not self._store(bkey, h, stripe, start, found, payload, expires):
+                return None
+            return value
+        finally:
+            self._segment.unlock(_STRIPE_LOCK + stripe)
+
+    def inc(self, key: str, delta: int = 1) -> int | None:
+        return self._add_delta(key, delta)
+
+    def dec(self, key: str, delta: int = 1) -> int | None:
+        return self._add_delta(key, -delta)
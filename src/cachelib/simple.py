@@ -1,10 +1,30 @@
+import heapq
+import sys
 import threading
 import typing as _t
 from time import time
 
+from cachelib._janitor import start_janitor
 from cachelib.base import BaseCache
+from cachelib.eviction import _make_policy
+from cachelib.eviction import _PolicySpec
 from cachelib.serializers import SimpleSerializer
 
+#: marks keys that were not found by batch lookups
+_missing = object()
+
+
+def _payload_size(value: _t.Any) -> int:
+    if isinstance(value, bytes | bytearray):
+        return len(value)
+    if isinstance(value, str):
+        # a string stored by reference is counted in bytes like the others
+        if value.isascii():
+            return len(value)
+        return len(value.encode("utf-8", "surrogatepass"))
+    # values stored by reference, only the outermost object is counted
+    return sys.getsizeof(value)
+
 
 class SimpleCache(BaseCache):
     """Simple memory cache for single process environments. All operations
@@ -16,44 +36,157 @@ class SimpleCache(BaseCache):
     :param default_timeout: the default timeout that is used if no timeout is
         specified on :meth:`~.BaseCache.set`. A timeout of
         0 indicates that the cache never expires.
+    :param eviction_policy: decides which items are deleted once the cache
+        goes over ``threshold``. One of ``"expires"`` (the default, items
+        closest to expiring first), ``"lru"``, ``"lfu"``, ``"w-tinylfu"``,
+        ``"arc"`` and ``"greedy-dual-size"``, an
+        :class:`~cachelib.eviction.EvictionPolicy` instance, or a callable
+        returning one such as a subclass. :class:`ShardedSimpleCache`
+        accepts the same. See :mod:`cachelib.eviction`.
+    :param max_bytes: the maximum combined size in bytes of the serialized
+        values before the cache starts deleting some. A value of 0 (the
+        default) indicates no limit. Values larger than ``max_bytes`` are
+        not stored. See :attr:`total_bytes` for the current usage.
+    :param janitor_interval: if greater than 0, expired items are removed and
+        the limits are enforced every ``janitor_interval`` seconds by a
+        background thread instead of during :meth:`set`. The cache may then
+        temporarily grow past its limits between two runs.
     """
 
     serializer = SimpleSerializer()
 
+    #: the number of items the janitor handles per lock acquisition
+    _janitor_slice = 256
+
     def __init__(
         self,
         threshold: int = 500,
         default_timeout: int = 300,
+        eviction_policy: _PolicySpec = "expires",
+        max_bytes: int = 0,
+        janitor_interval: float = 0,
     ):
         BaseCache.__init__(self, default_timeout)
-        self._cache: dict[str, _t.Any] = {}
+        # key -> (expires, payload, payload size)
+        self._cache: dict[str, tuple[int, _t.Any, int]] = {}
         self._threshold = threshold or 500  # threshold = 0
+        self._max_bytes = max_bytes
+        self._size = 0
+        self._policy = _make_policy(eviction_policy, self._threshold)
+        # min-heap of (expires, key) for policies that don't find the
+        # expired items themselves, entries are invalidated lazily
+        self._expiry_heap: list[tuple[int, str]] = []
         self._lock = threading.RLock()
+        self._janitor: threading.Thread | None = None
+        if janitor_interval > 0:
+            self._janitor = start_janitor(self, janitor_interval)
 
-    def _over_threshold(self) -> bool:
-        return len(self._cache) > self._threshold
-
-    def _remove_expired(self, now: float) -> None:
-        toremove = [k for k, (expires, _) in self._cache.items() if expires < now]
-        for k in toremove:
-            self._cache.pop(k, None)
+    @property
+    def total_bytes(self) -> int:
+        """The combined size in bytes of all stored values."""
+        return self._size
 
-    def _remove_older(self) -> None:
-        k_ordered = (
-            k for k, v in sorted(self._cache.items(), key=lambda item: item[1][0])
+    def _over_threshold(self, incoming: int = 0) -> bool:
+        return len(self._cache) > self._threshold or (
+            self._max_bytes > 0 and self._size + incoming > self._max_bytes
         )
-        for k in k_ordered:
-            self._cache.pop(k, None)
-            if not self._over_threshold():
+
+    def _discard(self, key: str) -> bool:
+        item = self._cache.pop(key, None)
+        if item is None:
+            return False
+        self._size -= item[2]
+        return True
+
+    def _remove_expired(self, now: float, limit: int = 0) -> bool:
+        """Remove expired items, at most ``limit`` heap entries if given.
+        Returns whether all expired items have been removed.
+        """
+        if self._policy.tracks_expiry:
+            for _ in range(limit or len(self._cache)):
+                k = self._policy.expired(now)
+                if k is None:
+                    return True
+                self._discard(k)
+            return not limit
+        heap = self._expiry_heap
+        removed = 0
+        while heap and heap[0][0] < now:
+            if limit and removed == limit:
+                return False
+            removed += 1
+            expires, k = heapq.heappop(heap)
+            item = self._cache.get(k)
+            # skip entries for keys that were deleted or set again since
+            if item is not None and item[0] == expires:
+                self._discard(k)
+                self._policy.on_delete(k)
+        return True
+
+    def _store(self, key: str, expires: int, value: _t.Any, size: int) -> None:
+        self._discard(key)
+        self._cache[key] = (expires, value, size)
+        self._size += size
+        self._policy.on_set(key, expires, size)
+        if expires == 0 or self._policy.tracks_expiry:
+            return
+        heap = self._expiry_heap
+        heapq.heappush(heap, (expires, key))
+        # drop stale entries once they outnumber the live ones
+        if len(heap) > 2 * len(self._cache) + 64:
+            self._expiry_heap = [(e, k) for k, (e, _, _) in self._cache.items() if e]
+            heapq.heapify(self._expiry_heap)
+
+    def _remove_older(self, incoming: int = 0, limit: int = 0) -> bool:
+        """Evict items until the cache is under its limits, at most ``limit``
+        items if given. Returns whether the cache is under its limits.
+        """
+        removed = 0
+        while self._over_threshold(incoming):
+            if limit and removed == limit:
+                return False
+            removed += 1
+            k = self._policy.victim()
+            if k is None:
                 break
+            self._discard(k)
+        return True
 
-    def _prune(self) -> None:
-        if self._over_threshold():
+    def _prune(self, incoming: int = 0) -> None:
+        if self._over_threshold(incoming):
             now = time()
             self._remove_expired(now)
         # remove older items if still over threshold
-        if self._over_threshold():
-            self._remove_older()
+        if self._over_threshold(incoming):
+            self._remove_older(incoming)
+
+    def _make_room(self, key: str, size: int) -> bool:
+        """Prune the cache so that it can store ``size`` more bytes under
+        ``key``. Values that can never fit into ``max_bytes`` are refused.
+        """
+        if self._max_bytes > 0 and size > self._max_bytes:
+            # don't keep serving the previous value for the key
+            if self._discard(key):
+                self._policy.on_delete(key)
+            return False
+        if self._janitor is None:
+            item = self._cache.get(key)
+            self._prune(size - item[2] if item is not None else size)
+        return True
+
+    def _clean_up(self) -> None:
+        """Remove expired items and enforce the limits of the cache in small
+        slices, so that other threads are not blocked for long. Called
+        periodically by the janitor thread.
+        """
+        done = False
+        while not done:
+            with self._lock:
+                done = self._remove_expired(time(), self._janitor_slice)
+        done = False
+        while not done:
+            with self._lock:
+                done = self._remove_older(limit=self._janitor_slice)
 
     def _normalize_timeout(self, timeout: int | None) -> int:
         timeout = BaseCache._normalize_timeout(self, timeout)
@@ -64,39 +197,99 @@ class SimpleCache(BaseCache):
     def get(self, key: str) -> _t.Any:
         with self._lock:
             try:
-                expires, value = self._cache[key]
-                if expires == 0 or expires > time():
-                    return self.serializer.loads(value)
+                expires, value, _ = self._cache[key]
             except KeyError:
                 return None
+            if expires != 0 and expires <= time():
+                return None
+            self._policy.on_get(key)
+        # stored payloads are immutable, no need to hold the lock while loading
+        return self.serializer.loads(value)
 
     def set(self, key: str, value: _t.Any, timeout: int | None = None) -> bool | None:
+        dump = self.serializer.dumps(value)
+        size = _payload_size(dump)
         with self._lock:
             expires = self._normalize_timeout(timeout)
-            self._prune()
-            self._cache[key] = (expires, self.serializer.dumps(value))
+            if not self._make_room(key, size):
+                return False
+            self._store(key, expires, dump, size)
             return True
 
     def add(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
+        dump = self.serializer.dumps(value)
+        size = _payload_size(dump)
         with self._lock:
-            expires = self._normalize_timeout(timeout)
-            self._prune()
-            item = (expires, self.serializer.dumps(value))
             # key exists and is not expired, do not add
             if self.has(key):
                 return False
+            expires = self._normalize_timeout(timeout)
+            if not self._make_room(key, size):
+                return False
             # key does not exist or is expired, add it
-            self._cache[key] = item
+            self._store(key, expires, dump, size)
             return True
 
     def delete(self, key: str) -> bool:
         with self._lock:
-            return self._cache.pop(key, None) is not None
+            if not self._discard(key):
+                return False
+            self._policy.on_delete(key)
+            return True
+
+    def get_many(self, *keys: str) -> list[_t.Any]:
+        payloads: list[_t.Any] = []
+        with self._lock:
+            now = time()
+            for key in keys:
+                item = self._cache.get(key)
+                if item is None or (item[0] != 0 and item[0] <= now):
+                    payloads.append(_missing)
+                else:
+                    self._policy.on_get(key)
+                    payloads.append(item[1])
+        loads = self.serializer.loads
+        return [None if p is _missing else loads(p) for p in payloads]
+
+    def set_many(
+        self, mapping: dict[str, _t.Any], timeout: int | None = None
+    ) -> list[_t.Any]:
+        dumps = [(k, self.serializer.dumps(v)) for k, v in mapping.items()]
+        set_keys = []
+        with self._lock:
+            expires = self._normalize_timeout(timeout)
+            for key, dump in dumps:
+                size = _payload_size(dump)
+                if self._max_bytes > 0 and size > self._max_bytes:
+                    if self._discard(key):
+                        self._policy.on_delete(key)
+                    continue
+                self._store(key, expires, dump, size)
+                set_keys.append(key)
+            # prune once for the whole batch
+            if self._janitor is None:
+                self._prune()
+        return set_keys
+
+    def delete_many(self, *keys: str) -> list[_t.Any]:
+        deleted_keys = []
+        with self._lock:
+            for key in keys:
+                if self._discard(key):
+                    self._policy.on_delete(key)
+                    deleted_keys.append(key)
+        return deleted_keys
+
+    def has_many(self, *keys: str) -> list[bool]:
+        with self._lock:
+            now = time()
+            items = [self._cache.get(key) for key in keys]
+        return [item is not None and (item[0] == 0 or item[0] > now) for item in items]
 
     def has(self, key: str) -> bool:
         with self._lock:
             try:
-                expires, value = self._cache[key]
+                expires, _, _ = self._cache[key]
                 return bool(expires == 0 or expires > time())
             except KeyError:
                 return False
@@ -104,6 +297,9 @@ class SimpleCache(BaseCache):
     def clear(self) -> bool:
         with self._lock:
             self._cache.clear()
+            self._size = 0
+            self._expiry_heap.clear()
+            self._policy.clear()
             return not bool(self._cache)
 
     def inc(self, key: str, delta: int = 1) -> int | None:
@@ -113,3 +309,159 @@ class SimpleCache(BaseCache):
     def dec(self, key: str, delta: int = 1) -> int | None:
         with self._lock:
             return super().dec(key, delta)
+
+
+class _SimpleCacheShard(SimpleCache):
+    """A segment of a :class:`ShardedSimpleCache`, always serializing with
+    the serializer of the cache it belongs to.
+    """
+
+    def __init__(
+        self,
+        owner: "ShardedSimpleCache",
+        threshold: int,
+        default_timeout: int,
+        eviction_policy: _PolicySpec,
+        max_bytes: int,
+    ):
+        self._owner = owner
+        super().__init__(
+            threshold,
+            default_timeout,
+            _make_policy(eviction_policy, threshold, copy_instance=True),
+            max_bytes,
+        )
+
+    @property
+    def serializer(self) -> _t.Any:  # type: ignore[override]
+        return self._owner.serializer
+
+
+class ShardedSimpleCache(BaseCache):
+    """A :class:`SimpleCache` split into independent shards, each with its
+    own lock, items and share of the threshold. Keys are assigned to a shard
+    by their hash, so threads working on unrelated keys rarely wait for each
+    other. Use it instead of :class:`SimpleCache` in multi-threaded servers.
+
+    :param threshold: the maximum number of items the cache stores before
+        it starts deleting some. It is split evenly between the shards.
+    :param default_timeout: the default timeout that is used if no timeout is
+        specified on :meth:`~.BaseCache.set`. A timeout of
+        0 indicates that the cache never expires.
+    :param shards: the number of shards.
+    :param eviction_policy: the eviction policy of the shards, in the same
+        forms as for :class:`SimpleCache`. Every shard gets a policy of its
+        own: a name or a callable is used once per shard, and an
+        :class:`~cachelib.eviction.EvictionPolicy` instance is copied.
+    :param max_bytes: the maximum combined size in bytes of the serialized
+        values. It is split evenly between the shards, so a value larger than
+        the budget of a single shard is not stored. A value of 0 (the default)
+        indicates no limit.
+    :param janitor_interval: if greater than 0, a single background thread
+        cleans up all shards every ``janitor_interval`` seconds, see
+        :class:`SimpleCache`.
+    """
+
+    serializer = SimpleSerializer()
+
+    def __init__(
+        self,
+        threshold: int = 500,
+        default_timeout: int = 300,
+        shards: int = 16,
+        eviction_policy: _PolicySpec = "expires",
+        max_bytes: int = 0,
+        janitor_interval: float = 0,
+    ):
+        BaseCache.__init__(self, default_timeout)
+        if shards < 1:
+            raise ValueError("ShardedSimpleCache needs at least one shard.")
+        threshold = threshold or 500  # threshold = 0
+        shard_threshold = -(-threshold // shards)
+        shard_max_bytes = -(-max_bytes // shards)
+        self._shards = [
+            _SimpleCacheShard(
+                self,
+                shard_threshold,
+                default_timeout,
+                eviction_policy,
+                shard_max_bytes,
+            )
+            for _ in range(shards)
+        ]
+        if janitor_interval > 0:
+            janitor = start_janitor(self, janitor_interval)
+            for shard in self._shards:
+                shard._janitor = janitor
+
+    def _clean_up(self) -> None:
+        for shard in self._shards:
+            shard._clean_up()
+
+    @property
+    def total_bytes(self) -> int:
+        """The combined size in bytes of all stored values."""
+        return sum(shard.total_bytes for shard in self._shards)
+
+    def _shard_index(self, key: str) -> int:
+        return hash(key) % len(self._shards)
+
+    def _get_shard(self, key: str) -> SimpleCache:
+        return self._shards[self._shard_index(key)]
+
+    def _group_by_shard(self, keys: _t.Iterable[str]) -> dict[int, list[str]]:
+        groups: dict[int, list[str]] = {}
+        for key in keys:
+            groups.setdefault(self._shard_index(key), []).append(key)
+        return groups
+
+    def get(self, key: str) -> _t.Any:
+        return self._get_shard(key).get(key)
+
+    def get_many(self, *keys: str) -> list[_t.Any]:
+        values: dict[str, _t.Any] = {}
+        for i, group in self._group_by_shard(keys).items():
+            values.update(zip(group, self._shards[i].get_many(*group), strict=True))
+        return [values[key] for key in keys]
+
+    def set_many(
+        self, mapping: dict[str, _t.Any], timeout: int | None = None
+    ) -> list[_t.Any]:
+        set_keys = set()
+        for i, group in self._group_by_shard(mapping).items():
+            shard_mapping = {key: mapping[key] for key in group}
+            set_keys.update(self._shards[i].set_many(shard_mapping, timeout))
+        return [key for key in mapping if key in set_keys]
+
+    def delete_many(self, *keys: str) -> list[_t.Any]:
+        deleted_keys = set()
+        for i, group in self._group_by_shard(keys).items():
+            deleted_keys.update(self._shards[i].delete_many(*group))
+        return [key for key in keys if key in deleted_keys]
+
+    def has_many(self, *keys: str) -> list[bool]:
+        found: dict[str, bool] = {}
+        for i, group in self._group_by_shard(keys).items():
+            found.update(zip(group, self._shards[i].has_many(*group), strict=True))
+        return [found[key] for key in keys]
+
+    def set(self, key: str, value: _t.Any, timeout: int | None = None) -> bool | None:
+        return self._get_shard(key).set(key, value, timeout)
+
+    def add(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
+        return self._get_shard(key).add(key, value, timeout)
+
+    def delete(self, key: str) -> bool:
+        return self._get_shard(key).delete(key)
+
+    def has(self, key: str) -> bool:
+        return self._get_shard(key).has(key)
+
+    def clear(self) -> bool:
+        return all([shard.clear() for shard in self._shards])
+
+    def inc(self, key: str, delta: int = 1) -> int | None:
+        return self._get_shard(key).inc(key, delta)
+
+    def dec(self, key: str, delta: int = 1) -> int | None:
+        return self._get_shard(key).dec(key, delta)
@@ -0,0 +1,287 @@
+import os
+import sqlite3
+import threading
+import typing as _t
+import weakref
+from contextlib import contextmanager
+from time import time
+
+from cachelib.base import BaseCache
+from cachelib.serializers import SqliteSerializer
+
+# keep statements below SQLite's default limit of host parameters
+_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires INTEGER NOT NULL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires) WHERE expires > 0;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_count (n INTEGER NOT NULL);
+INSERT INTO cache_count SELECT count(*) FROM cache
+    WHERE NOT EXISTS (SELECT 1 FROM cache_count);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache
+    BEGIN UPDATE cache_count SET n = n + 1; END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache
+    BEGIN UPDATE cache_count SET n = n - 1; END;
+"""
+
+_UPSERT = (
+    "INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)"
+    " ON CONFLICT (key) DO UPDATE SET value = excluded.value,"
+    " expires = excluded.expires, accessed = excluded.accessed"
+)
+
+
+def _close(connection: sqlite3.Connection, pid: int) -> None:
+    # a forked process must not close the connections of its parent
+    if os.getpid() == pid:
+        connection.close()
+
+
+class _Connection:
+    """Holds the connection of one thread. The thread local storage drops
+    it when the thread ends or the cache is collected, which closes the
+    connection.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self.pid = os.getpid()
+        weakref.finalize(self, _close, connection, self.pid)
+
+
+class SqliteCache(BaseCache):
+    """A cache that stores the items in a SQLite database. The database is
+    opened in WAL mode, so any number of threads and processes on the host
+    can read it while one of them writes.
+
+    Expired items are removed through an index on the expiry time and
+    items over the threshold are removed least recently used first, so
+    pruning does not scan the whole table. Batch operations run in a single
+    transaction.
+
+    :param path: the path of the database file, its directory is created
+                 if needed.
+    :param threshold: the maximum number of items the cache stores before
+                      it starts deleting some. A threshold value of 0
+                      indicates no threshold.
+    :param default_timeout: the default timeout that is used if no timeout is
+                            specified on :meth:`~BaseCache.set`. A timeout of
+                            0 indicates that the cache never expires.
+    :param busy_timeout: how many seconds to wait for another connection
+                         to finish writing before giving up.
+    :param touch_interval: reads update the access time of an item at most
+                           once in this many seconds, and never wait for
+                           another connection to do so.
+    """
+
+    serializer = SqliteSerializer()
+
+    def __init__(
+        self,
+        path: str,
+        threshold: int = 500,
+        default_timeout: int = 300,
+        busy_timeout: float = 5.0,
+        touch_interval: float = 60,
+    ):
+        BaseCache.__init__(self, default_timeout)
+        self._path = path
+        self._threshold = threshold
+        self._busy_timeout = busy_timeout
+        self._touch_interval = touch_interval
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._local = threading.local()
+        self._connection().executescript(f"BEGIN IMMEDIATE; {_SCHEMA} COMMIT;")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Every thread uses its own connection, which is closed when the
+        thread ends. A process started with fork opens new ones.
+        """
+        holder = getattr(self._local, "holder", None)
+        if holder is None or holder.pid != os.getpid():
+            connection = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            holder = self._local.holder = _Connection(connection)
+        return holder.connection
+
+    @contextmanager
+    def _transaction(self) -> _t.Iterator[sqlite3.Connection]:
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _normalize_timeout(self, timeout: int | None) -> int:
+        timeout = BaseCache._normalize_timeout(self, timeout)
+        if timeout != 0:
+            timeout = int(time()) + timeout
+        return int(timeout)
+
+    def _prune(self, db: sqlite3.Connection) -> None:
+        if self._threshold == 0:
+            return
+        (count,) = db.execute("SELECT n FROM cache_count").fetchone()
+        if count <= self._threshold:
+            return
+        db.execute(
+            "DELETE FROM cache WHERE expires > 0 AND expires <= ?", (int(time()),)
+        )
+        (count,) = db.execute("SELECT n FROM cache_count").fetchone()
+        if count > self._threshold:
+            db.execute(
+                "DELETE FROM cache WHERE key IN"
+                " (SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                (count - self._threshold,),
+            )
+
+    def _touch(self, keys: list[str], now: float) -> None:
+        if not keys:
+            return
+        db = self._connection()
+        # the access time only orders evictions, a busy database is no
+        # reason to make the read wait or fail
+        db.execute("PRAGMA busy_timeout = 0")
+        try:
+            with self._transaction() as db:
+                db.executemany(
+                    "UPDATE cache SET accessed = ? WHERE key = ? AND accessed < ?",
+                    ((now, k, now - self._touch_interval) for k in keys),
+                )
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            db.execute(f"PRAGMA busy_timeout = {int(self._busy_timeout * 1000)}")
+
+    def get(self, key: str) -> _t.Any:
+        return self.get_many(key)[0]
+
+    def get_many(self, *keys: str) -> list[_t.Any]:
+        db = self._connection()
+        now = time()
+        found: dict[str, bytes] = {}
+        stale = []
+        for i in range(0, len(keys), _BATCH_SIZE):
+            batch = keys[i : i + _BATCH_SIZE]
+            rows = db.execute(
+                "SELECT key, value, accessed FROM cache WHERE key IN"
+                f" ({', '.join('?' * len(batch))})"
+                " AND (expires = 0 OR expires > ?)",
+                (*batch, int(now)),
+            )
+            for key, value, accessed in rows:
+                found[key] = value
+                if accessed < now - self._touch_interval:
+                    stale.append(key)
+        self._touch(stale, now)
+        return [self.serializer.loads(found[k]) if k in found else None for k in keys]
+
+    def set(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
+        return bool(self.set_many({key: value}, timeout))
+
+    def set_many(
+        self, mapping: dict[str, _t.Any], timeout: int | None = None
+    ) -> list[_t.Any]:
+        expires = self._normalize_timeout(timeout)
+        now = time()
+        rows = []
+        for key, value in mapping.items():
+            payload = self.serializer.dumps(value)
+            if payload is not None:
+                rows.append((key, payload, expires, now))
+        if not rows:
+            return []
+        with self._transaction() as db:
+            db.executemany(_UPSERT, rows)
+            self._prune(db)
+        return [row[0] for row in rows]
+
+    def add(self, key: str, value: _t.Any, timeout: int | None = None) -> bool:
+        payload = self.serializer.dumps(value)
+        if payload is None:
+            return False
+        expires = self._normalize_timeout(timeout)
+        now = time()
+        with self._transaction() as db:
+            # an expired item can be replaced
+            cursor = db.execute(
+                f"{_UPSERT} WHERE cache.expires > 0 AND cache.expires <= ?",
+                (key, payload, expires, now, int(now)),
+            )
+            if not cursor.rowcount:
+                return False
+            self._prune(db)
+        return True
+
+    def delete(self, key: str) -> bool:
+        return bool(self.delete_many(key))
+
+    def delete_many(self, *keys: str) -> list[_t.Any]:
+        deleted = []
+        with self._transaction() as db:
+            for key in keys:
+                if db.execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount:
+                    deleted.append(key)
+        return deleted
+
+    def has(self, key: str) -> bool:
+        return self.has_many(key)[0]
+
+    def has_many(self, *keys: str) -> list[bool]:
+        db = self._connection()
+        found: set[str] = set()
+        for i in range(0, len(keys), _BATCH_SIZE):
+            batch = keys[i : i + _BATCH_SIZE]
+            rows = db.execute(
+                "SELECT key FROM cache WHERE key IN"
+                f" ({', '.join('?' * len(batch))})"
+                " AND (expires = 0 OR expires > ?)",
+                (*batch, int(time())),
+            )
+            found.update(row[0] for row in rows)
+        return [k in found for k in keys]
+
+    def clear(self) -> bool:
+        with self._transaction() as db:
+            db.execute("DELETE FROM cache")
+        return True
+
+    def _add_delta(self, key: str, delta: int) -> int | None:
+        now = time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT value FROM cache WHERE key = ?"
+                " AND (expires = 0 OR expires > ?)",
+                (key, int(now)),
+            ).fetchone()
+            value = (self.serializer.loads(row[0]) if row else 0) or 0
+            value += delta
+            payload = self.serializer.dumps(value)
+            if payload is None:
+                return None
+            db.execute(_UPSERT, (key, payload, self._normalize_timeout(None), now))
+            self._prune(db)
+        return value
+
+    def inc(self, key: str, delta: int = 1) -> int | None:
+        return self._add_delta(key, delta)
+
+    def dec(self, key: str, delta: int = 1) -> int | None:
+        return self._add_delta(key, -delta)
@@ -10,3 +10,9 @@ class HasTests(TestData):
         for k in self.sample_pairs:
             assert cache.has(k)
         assert not cache.has("unknown")
+
+    def test_has_many(self):
+        cache = self.cache_factory()
+        assert cache.set_many(self.sample_pairs)
+        keys = [*self.sample_pairs, "unknown"]
+        assert cache.has_many(*keys) == [True] * len(self.sample_pairs) + [False]
@@ -0,0 +1,30 @@
+import asyncio
+import inspect
+
+
+class SyncAdapter:
+    """Runs the coroutines of an asynchronous cache on an event loop of its
+    own, so the tests for synchronous caches can be reused for it.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.runner = asyncio.Runner()
+
+    def run(self, awaitable):
+        return self.runner.run(awaitable)
+
+    def __getattr__(self, name):
+        attr = getattr(self.cache, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self.runner.run(attr(*args, **kwargs))
+
+        return call
+
+    def close(self):
+        if hasattr(self.cache, "aclose"):
+            self.runner.run(self.cache.aclose())
+        self.runner.close()
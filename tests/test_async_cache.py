@@ -0,0 +1,145 @@
+import asyncio
+import threading
+
+import pytest
+from clear import ClearTests
+from common import CommonTests
+from has import HasTests
+from sync_adapter import SyncAdapter
+
+from cachelib import AsyncCache
+from cachelib import FileSystemCache
+from cachelib import SimpleCache
+
+
+class SlowCache(SimpleCache):
+    """A cache that blocks reads until it is released"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+        self.reads = 0
+        self.threads = set()
+
+    def get(self, key):
+        self.reads += 1
+        self.threads.add(threading.current_thread().name)
+        self.release.wait(5)
+        return super().get(key)
+
+
+@pytest.fixture(autouse=True, params=["simple", "file"])
+def cache_factory(request, tmp_path):
+    adapters = []
+
+    def _factory(self, *args, **kwargs):
+        if request.param == "simple":
+            cache = SimpleCache(*args, **kwargs)
+        else:
+            cache = FileSystemCache(str(tmp_path), *args, **kwargs)
+        adapter = SyncAdapter(AsyncCache(cache))
+        adapters.append(adapter)
+        return adapter
+
+    request.cls.cache_factory = _factory
+    yield
+    for adapter in adapters:
+        adapter.close()
+
+
+class TestAsyncCache(CommonTests, ClearTests, HasTests):
+    def test_inline(self):
+        cache = self.cache_factory()
+        assert cache._inline == isinstance(cache.cache.cache, SimpleCache)
+
+    def test_runs_blocking_calls_on_its_threads(self):
+        wrapped = SlowCache()
+        wrapped.release.set()
+        cache = AsyncCache(wrapped, inline=False)
+        assert asyncio.run(cache.get("foo")) is None
+        assert wrapped.threads and all(
+            name.startswith("cachelib-async") for name in wrapped.threads
+        )
+
+    def test_coalesces_reads(self):
+        wrapped = SlowCache()
+        wrapped.set("foo", [1])
+        cache = AsyncCache(wrapped, inline=False)
+
+        async def run():
+            reads = [asyncio.ensure_future(cache.get("foo")) for _ in range(10)]
+            await asyncio.sleep(0.1)
+            wrapped.release.set()
+            return await asyncio.gather(*reads)
+
+        assert asyncio.run(run()) == [[1]] * 10
+        assert wrapped.reads == 1
+
+    def test_write_ends_coalescing(self):
+        wrapped = SlowCache()
+        cache = AsyncCache(wrapped, inline=False)
+
+        async def run():
+            first = asyncio.ensure_future(cache.get("foo"))
+            await asyncio.sleep(0.1)
+            wrapped.release.set()
+            assert await cache.set("foo", "bar")
+            second = await cache.get("foo")
+            return await first, second
+
+        assert asyncio.run(run())[1] == "bar"
+        assert wrapped.reads == 2
+
+    def test_cancelled_reader(self):
+        wrapped = SlowCache()
+        wrapped.set("foo", "bar")
+        cache = AsyncCache(wrapped, inline=False)
+
+        async def run():
+            first = asyncio.ensure_future(cache.get("foo"))
+            second = asyncio.ensure_future(cache.get("foo"))
+            await asyncio.sleep(0.1)
+            first.cancel()
+            wrapped.release.set()
+            return await second
+
+        assert asyncio.run(run()) == "bar"
+
+    def test_no_coalescing(self):
+        wrapped = SlowCache()
+        wrapped.release.set()
+        cache = AsyncCache(wrapped, inline=False, coalesce_reads=False)
+
+        async def run():
+            await asyncio.gather(*(cache.get("foo") for _ in range(4)))
+
+        asyncio.run(run())
+        assert wrapped.reads == 4
+
+    def test_batches_call_the_cache_once(self):
+        wrapped = SlowCache()
+        wrapped.release.set()
+        cache = AsyncCache(wrapped, inline=False)
+        asyncio.run(cache.set_many({"a": 1, "b": 2}))
+        wrapped.reads = 0
+        assert asyncio.run(cache.get_many("a", "b")) == [1, 2]
+        assert wrapped.reads == 0
+
+    def test_bounded_threads(self):
+        wrapped = SlowCache()
+        cache = AsyncCache(wrapped, max_workers=2, inline=False, coalesce_reads=False)
+
+        async def run():
+            reads = [asyncio.ensure_future(cache.get(f"key-{i}")) for i in range(8)]
+            await asyncio.sleep(0.1)
+            started = wrapped.reads
+            wrapped.release.set()
+            await asyncio.gather(*reads)
+            await cache.aclose()
+            return started
+
+        assert asyncio.run(run()) == 2
+
+    def test_invalid_max_workers(self):
+        with pytest.raises(ValueError):
+            AsyncCache(SimpleCache(), max_workers=0)
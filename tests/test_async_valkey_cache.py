@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from clear import ClearTests
+from common import CommonTests
+from delete_many_with_prefix import DeleteManyWithPrefixTests
+from has import HasTests
+from serializer import SerializerTests
+from sync_adapter import SyncAdapter
+
+from cachelib import AsyncValkeyCache
+from cachelib import ValkeyCache
+from cachelib.serializers import BaseRedisSerializer
+
+
+class SillySerializer(BaseRedisSerializer):
+    """A pointless serializer only for testing"""
+
+    def dumps(self, value):
+        return repr(value).encode()
+
+    def loads(self, bvalue):
+        if bvalue is None:
+            return None
+        return eval(bvalue.decode())
+
+
+class CustomCache(AsyncValkeyCache):
+    """Our custom cache client with non-default serializer"""
+
+    # overwrite serializer
+    serializer = SillySerializer()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+@pytest.fixture(autouse=True, params=[AsyncValkeyCache, CustomCache])
+def cache_factory(request, key_prefix):
+    adapters = []
+
+    def _factory(self, *args, **kwargs):
+        kwargs.setdefault("key_prefix", key_prefix)
+        rc = SyncAdapter(request.param(*args, port=6370, **kwargs))
+        adapters.append(rc)
+        rc.run(rc._write_client.flushdb())
+        return rc
+
+    request.cls.cache_factory = _factory
+    yield
+    for rc in adapters:
+        rc.close()
+
+
+def my_callable_key() -> str:
+    return "bacon"
+
+
+@pytest.mark.network
+@pytest.mark.usefixtures("valkey_server")
+class TestAsyncValkeyCache(
+    CommonTests, ClearTests, HasTests, DeleteManyWithPrefixTests, SerializerTests
+):
+    def test_callable_key(self):
+        cache = self.cache_factory()
+        assert cache.set(my_callable_key, "sausages")
+        assert cache.get(my_callable_key) == "sausages"
+
+    def test_shares_items_with_valkey_cache(self):
+        cache = self.cache_factory()
+        sync = ValkeyCache(port=6370, key_prefix=cache.key_prefix)
+        assert cache.set_many({"foo": 1, "bar": [2]})
+        assert sync.get_many("foo", "bar") == [1, [2]]
+        assert sync.set("baz", {"spam": "eggs"})
+        assert cache.get("baz") == {"spam": "eggs"}
+        assert cache.inc("foo") == 2
+        assert sync.get("foo") == 2
+
+    def test_add_sets_timeout(self):
+        cache = self.cache_factory()
+        assert cache.add("foo", "bar", timeout=100)
+        key = f"{cache._get_prefix()}foo"
+        assert 0 < cache.run(cache._read_client.ttl(key)) <= 100
+
+    def test_concurrent_calls(self):
+        cache = self.cache_factory()
+
+        async def run():
+            await asyncio.gather(*(cache.cache.set(f"key-{i}", i) for i in range(50)))
+            return await asyncio.gather(
+                *(cache.cache.get(f"key-{i}") for i in range(50))
+            )
+
+        assert cache.run(run()) == list(range(50))
@@ -56,6 +56,11 @@ class TestBaseCache:
         with pytest.raises(NotImplementedError):
             cache.has("lobster")
 
+    def test_has_many(self):
+        cache = self.cache_factory()
+        with pytest.raises(NotImplementedError):
+            cache.has_many("lobster", "spam")
+
     def test_clear(self):
         cache = self.cache_factory()
         assert cache.clear()
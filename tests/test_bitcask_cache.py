@@ -0,0 +1,251 @@
+import os
+import sys
+import threading
+from time import sleep
+from unittest.mock import patch
+
+import pytest
+from clear import ClearTests
+from common import CommonTests
+from has import HasTests
+from serializer import SerializerTests
+
+from cachelib import BitcaskCache
+from cachelib.serializers import BaseSerializer
+
+
+class SillySerializer(BaseSerializer):
+    """A pointless serializer only for testing"""
+
+    def dumps(self, value):
+        return repr(value).encode()
+
+    def loads(self, bvalue):
+        return eval(bvalue.decode())
+
+
+class CustomCache(BitcaskCache):
+    """Our custom cache client with non-default serializer"""
+
+    # overwrite serializer
+    serializer = SillySerializer()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+@pytest.fixture(autouse=True, params=[BitcaskCache, CustomCache])
+def cache_factory(request, tmp_path):
+    def _factory(self, *args, **kwargs):
+        return request.param(str(tmp_path / "cache"), *args, **kwargs)
+
+    request.cls.cache_factory = _factory
+
+
+def wait_for_compaction(cache):
+    compactor = cache._compactor
+    if compactor is not None:
+        compactor.join()
+
+
+def segments(cache):
+    return sorted(name for name in os.listdir(cache._path) if name.endswith(".data"))
+
+
+class TestBitcaskCache(CommonTests, ClearTests, HasTests, SerializerTests):
+    def test_threshold(self):
+        cache = self.cache_factory(threshold=5)
+        for i in range(20):
+            assert cache.set(f"key-{i}", i)
+        assert sum(cache.has_many(*(f"key-{i}" for i in range(20)))) == 5
+        assert cache.get("key-19") == 19
+        assert not cache.has("key-0")
+
+    def test_threshold_removes_expired_first(self):
+        cache = self.cache_factory(threshold=3)
+        assert cache.set("key-0", 0, timeout=0)
+        assert cache.set("key-1", 1, timeout=1)
+        assert cache.set("key-2", 2, timeout=0)
+        sleep(2)
+        assert cache.set("key-3", 3)
+        assert cache.get_many("key-0", "key-1", "key-2", "key-3") == [0, None, 2, 3]
+
+    def test_set_fails_if_value_is_not_serialized(self):
+        cache = self.cache_factory()
+        with patch.object(cache.serializer, "dumps", return_value=None):
+            assert cache.set("foo", "bar") is False
+            assert cache.add("foo", "bar") is False
+        assert not cache.has("foo")
+
+    def test_set_fails_for_long_keys(self):
+        cache = self.cache_factory()
+        key = "k" * 0x10000
+        assert cache.set(key, 1) is False
+        assert cache.add(key, 1) is False
+        assert not cache.has(key)
+        assert cache.set("k" * 0xFFFF, 1)
+        cache = self.cache_factory()
+        assert cache.get("k" * 0xFFFF) == 1
+
+    def test_no_threshold(self):
+        cache = self.cache_factory(threshold=0)
+        assert cache.set_many({f"key-{i}": i for i in range(1000)})
+        assert all(cache.has_many(*(f"key-{i}" for i in range(1000))))
+
+    def test_reopen(self):
+        cache = self.cache_factory()
+        assert cache.set_many({"a": 1, "b": 2, "c": 3})
+        assert cache.set("a", 10)
+        assert cache.delete("b")
+        assert cache.set("expiring", 1, timeout=1)
+        del cache
+        sleep(2)
+        cache = self.cache_factory()
+        assert cache.get_many("a", "b", "c", "expiring") == [10, None, 3, None]
+
+    def test_reopen_from_hints(self):
+        cache = self.cache_factory(segment_bytes=200, compaction_ratio=1)
+        for i in range(50):
+            assert cache.set(f"key-{i}", i)
+        assert cache.delete("key-0")
+        assert any(name.endswith(".hint") for name in os.listdir(cache._path))
+        del cache
+        cache = self.cache_factory(segment_bytes=200, compaction_ratio=1)
+        assert cache.get("key-0") is None
+        assert cache.get_many(*(f"key-{i}" for i in range(1, 50))) == list(range(1, 50))
+
+    def test_reopen_truncated(self):
+        cache = self.cache_factory()
+        assert cache.set("complete", 1)
+        assert cache.set("torn", "x" * 100)
+        path = cache._segment_path(cache._active)
+        del cache
+        os.truncate(path, os.path.getsize(path) - 10)
+        cache = self.cache_factory()
+        assert cache.get("complete") == 1
+        assert cache.get("torn") is None
+        assert cache.set("after", 2)
+        del cache
+        cache = self.cache_factory()
+        assert cache.get_many("complete", "after") == [1, 2]
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="needs fork")
+    def test_directory_is_locked(self):
+        cache = self.cache_factory()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.cache_factory()
+            except RuntimeError:
+                os._exit(0)
+            os._exit(1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert cache.set("key", "value")
+
+    def test_compaction(self):
+        cache = self.cache_factory(threshold=0, segment_bytes=1000)
+        for _ in range(20):
+            for i in range(10):
+                assert cache.set(f"key-{i}", "x" * 50)
+        wait_for_compaction(cache)
+        size = sum(
+            os.path.getsize(os.path.join(cache._path, s)) for s in segments(cache)
+        )
+        # 10 live records of about 80 bytes, plus the segments being filled
+        assert size < 3000
+        assert cache.get_many(*(f"key-{i}" for i in range(10))) == ["x" * 50] * 10
+        del cache
+        cache = self.cache_factory(threshold=0, segment_bytes=1000)
+        assert cache.get_many(*(f"key-{i}" for i in range(10))) == ["x" * 50] * 10
+
+    def test_compaction_keeps_deletes(self):
+        cache = self.cache_factory(threshold=0, segment_bytes=500)
+        assert cache.set("deleted", "x" * 100)
+        assert cache.delete("deleted")
+        for i in range(50):
+            assert cache.set("other", i)
+        wait_for_compaction(cache)
+        del cache
+        cache = self.cache_factory(threshold=0, segment_bytes=500)
+        assert cache.get("deleted") is None
+        assert cache.get("other") == 49
+
+    def test_compaction_runs_in_background(self):
+        cache = self.cache_factory(threshold=0, segment_bytes=500)
+        move_items = cache._move_items
+        moving = threading.Event()
+        resume = threading.Event()
+
+        def slow_move_items(*args):
+            moving.set()
+            resume.wait(5)
+            move_items(*args)
+
+        cache._move_items = slow_move_items
+        for _ in range(20):
+            assert cache.set("key", "x" * 100)
+        assert moving.wait(5)
+        # writes go on while the compaction waits
+        assert cache.set("other", 1)
+        resume.set()
+        wait_for_compaction(cache)
+        assert cache.get_many("key", "other") == ["x" * 100, 1]
+
+    def test_compaction_keeps_eviction_order(self):
+        cache = self.cache_factory(threshold=3, segment_bytes=300, janitor_interval=60)
+        assert cache.set("first", 1)
+        assert cache.set("second", 2)
+        for i in range(20):
+            assert cache.set(f"temp-{i}", i)
+            assert cache.delete(f"temp-{i}")
+        segment = cache._keydir["first"][0]
+        cache._compact()
+        assert cache._keydir["first"][0] > segment
+        assert list(cache._keydir) == ["first", "second"]
+        assert cache.set("third", 3)
+        assert cache.set("fourth", 4)
+        assert cache.get_many("first", "second", "third", "fourth") == [None, 2, 3, 4]
+
+    def test_clear_during_compaction(self):
+        cache = self.cache_factory(threshold=0, segment_bytes=300, janitor_interval=60)
+        for i in range(20):
+            assert cache.set(f"key-{i}", i)
+        for i in range(15):
+            assert cache.delete(f"key-{i}")
+        move_items = cache._move_items
+
+        def move_items_and_clear(keys, last, generation):
+            move_items(keys[:1], last, generation)
+            cache.clear()
+            move_items(keys[1:], last, generation)
+
+        cache._move_items = move_items_and_clear
+        cache._compact()
+        assert not cache.has("key-19")
+        assert cache.set("key", "value")
+        assert cache.get("key") == "value"
+
+    def test_janitor(self):
+        cache = self.cache_factory(threshold=0, segment_bytes=500, janitor_interval=0.1)
+        for i in range(100):
+            assert cache.set(f"key-{i}", i, timeout=1)
+        assert cache.set("forever", 1, timeout=0)
+        sleep(2)
+        assert list(cache._keydir) == ["forever"]
+        assert len(segments(cache)) <= 2
+
+    def test_threads(self):
+        cache = self.cache_factory(threshold=0, segment_bytes=4096)
+
+        def write(n):
+            for i in range(200):
+                assert cache.set(f"{n}-{i}", i)
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for n in range(4):
+            assert cache.get(f"{n}-199") == 199
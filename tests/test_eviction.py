@@ -0,0 +1,163 @@
+import pytest
+
+from cachelib.eviction import _make_policy
+from cachelib.eviction import ARCPolicy
+from cachelib.eviction import EvictionPolicy
+from cachelib.eviction import ExpiresPolicy
+from cachelib.eviction import GreedyDualSizePolicy
+from cachelib.eviction import LFUPolicy
+from cachelib.eviction import LRUPolicy
+from cachelib.eviction import WTinyLFUPolicy
+
+ALL_POLICIES = [
+    ExpiresPolicy,
+    LRUPolicy,
+    LFUPolicy,
+    WTinyLFUPolicy,
+    ARCPolicy,
+    GreedyDualSizePolicy,
+]
+
+
+def drain(policy):
+    victims = []
+    while (key := policy.victim()) is not None:
+        victims.append(key)
+    return victims
+
+
+@pytest.mark.parametrize("policy_cls", ALL_POLICIES)
+class TestEvictionPolicyContract:
+    def test_victims_are_tracked_keys(self, policy_cls):
+        policy = _make_policy(policy_cls(), 10)
+        keys = [f"key-{i}" for i in range(10)]
+        for i, k in enumerate(keys):
+            policy.on_set(k, i + 1, 10)
+        for k in keys[::2]:
+            policy.on_get(k)
+        assert sorted(drain(policy)) == sorted(keys)
+        assert policy.victim() is None
+
+    def test_deleted_keys_are_not_returned(self, policy_cls):
+        policy = _make_policy(policy_cls(), 10)
+        for i in range(5):
+            policy.on_set(f"key-{i}", i + 1, 10)
+        policy.on_delete("key-1")
+        policy.on_delete("key-3")
+        policy.on_delete("unknown")
+        assert sorted(drain(policy)) == ["key-0", "key-2", "key-4"]
+
+    def test_overwrite_tracks_key_once(self, policy_cls):
+        policy = _make_policy(policy_cls(), 10)
+        for i in range(5):
+            policy.on_set("key", i + 1, 10)
+        assert drain(policy) == ["key"]
+
+    def test_clear(self, policy_cls):
+        policy = _make_policy(policy_cls(), 10)
+        for i in range(5):
+            policy.on_set(f"key-{i}", i + 1, 10)
+        policy.clear()
+        assert policy.victim() is None
+
+
+def test_expires_evicts_soonest_expiring_first():
+    policy = _make_policy("expires", 10)
+    policy.on_set("late", 300, 1)
+    policy.on_set("early", 100, 1)
+    policy.on_set("middle", 200, 1)
+    assert drain(policy) == ["early", "middle", "late"]
+
+
+def test_expires_evicts_items_that_never_expire_first():
+    policy = _make_policy("expires", 10)
+    policy.on_set("early", 100, 1)
+    policy.on_set("forever", 0, 1)
+    policy.on_set("late", 300, 1)
+    assert drain(policy) == ["forever", "early", "late"]
+
+
+def test_expires_finds_expired_items():
+    policy = _make_policy("expires", 10)
+    policy.on_set("forever", 0, 1)
+    policy.on_set("late", 300, 1)
+    policy.on_set("early", 100, 1)
+    policy.on_set("overwritten", 50, 1)
+    policy.on_set("overwritten", 400, 1)
+    assert policy.expired(200) == "early"
+    assert policy.expired(200) is None
+    assert drain(policy) == ["forever", "late", "overwritten"]
+
+
+def test_lru_evicts_least_recently_used_first():
+    policy = _make_policy("lru", 10)
+    for k in ("a", "b", "c"):
+        policy.on_set(k, 0, 1)
+    policy.on_get("a")
+    assert drain(policy) == ["b", "c", "a"]
+
+
+def test_lfu_evicts_least_frequently_used_first():
+    policy = _make_policy("lfu", 10)
+    for k in ("a", "b", "c"):
+        policy.on_set(k, 0, 1)
+    for _ in range(3):
+        policy.on_get("a")
+    policy.on_get("c")
+    assert drain(policy) == ["b", "c", "a"]
+
+
+def test_greedy_dual_size_evicts_large_items_first():
+    policy = _make_policy("greedy-dual-size", 10)
+    policy.on_set("small", 0, 10)
+    policy.on_set("large", 0, 10_000)
+    policy.on_set("medium", 0, 1_000)
+    assert drain(policy) == ["large", "medium", "small"]
+
+
+def access(policy, resident, key):
+    """Simulate a cache lookup that stores ``key`` on a miss."""
+    if key in resident:
+        policy.on_get(key)
+        return
+    resident.add(key)
+    policy.on_set(key, 0, 1)
+    while len(resident) > policy.capacity:
+        resident.remove(policy.victim())
+
+
+@pytest.mark.parametrize("name", ["w-tinylfu", "arc", "lfu"])
+def test_scan_resistance(name):
+    policy = _make_policy(name, 100)
+    resident = set()
+    for i in range(100):
+        access(policy, resident, f"warm-{i}")
+    hot = [f"hot-{i}" for i in range(50)]
+    for _ in range(5):
+        for k in hot:
+            access(policy, resident, k)
+    # a scan of one-hit wonders must not push the popular keys out
+    for i in range(1000):
+        access(policy, resident, f"cold-{i}")
+    assert len(resident.intersection(hot)) >= 0.9 * len(hot)
+
+
+def test_lru_is_not_scan_resistant():
+    policy = _make_policy("lru", 100)
+    resident = set()
+    for k in ("a", "b"):
+        access(policy, resident, k)
+        access(policy, resident, k)
+    for i in range(1000):
+        access(policy, resident, f"cold-{i}")
+    assert not {"a", "b"} & resident
+
+
+def test_unknown_policy_name():
+    with pytest.raises(ValueError):
+        _make_policy("random", 10)
+
+
+def test_base_policy_has_no_victim():
+    with pytest.raises(NotImplementedError):
+        EvictionPolicy().victim()
@@ -1,6 +1,15 @@
+import gc
 import hashlib
+import mmap
+import multiprocessing
 import os
+import pickle
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
+from time import time
 from unittest.mock import Mock
 from unittest.mock import patch
 
@@ -11,6 +20,9 @@ from has import HasTests
 from serializer import SerializerTests
 
 from cachelib import FileSystemCache
+from cachelib.__main__ import main
+from cachelib.file import _INDEX_ACCESS
+from cachelib.file import _INDEX_SET
 from cachelib.serializers import BaseSerializer
 
 
@@ -53,6 +65,34 @@ class CustomDefaultHashingMethodCache(FileSystemCache):
         super().__init__(*args, **kwargs)
 
 
+class ShardedCache(FileSystemCache):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("shard_depth", 2)
+        super().__init__(*args, **kwargs)
+
+
+class MmapCache(FileSystemCache):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("mmap_threshold", 1)
+        super().__init__(*args, **kwargs)
+
+
+class Blob:
+    """Holds a buffer that pickle protocol 5 can send out-of-band"""
+
+    def __init__(self, data):
+        self.data = memoryview(data)
+
+    def __reduce_ex__(self, protocol):
+        return Blob, (pickle.PickleBuffer(self.data),)
+
+
+def set_keys(path, prefix, n):
+    cache = FileSystemCache(path, threshold=10 * n)
+    for i in range(n):
+        cache.set(f"{prefix}-{i}", i)
+
+
 @pytest.fixture(
     autouse=True,
     params=[
@@ -60,6 +100,8 @@ class CustomDefaultHashingMethodCache(FileSystemCache):
         CustomSerializerCache,
         CustomHashingMethodCache,
         CustomDefaultHashingMethodCache,
+        ShardedCache,
+        MmapCache,
     ],
 )
 def cache_factory(request, tmpdir):
@@ -118,6 +160,28 @@ class TestFileSystemCache(CommonTests, ClearTests, HasTests, SerializerTests):
         # count should remain the same
         assert cache._file_count == len(self.sample_pairs)
 
+    def test_file_counting_is_shared(self, tmpdir):
+        first = FileSystemCache(tmpdir)
+        second = FileSystemCache(tmpdir)
+        for k, v in self.sample_pairs.items():
+            assert first.set(k, v)
+            assert second.set(f"{k}-2", v)
+        assert second.delete("bacon")
+        assert first._file_count == 2 * len(self.sample_pairs) - 1
+
+    def test_file_counting_across_processes(self, tmpdir):
+        cache = FileSystemCache(str(tmpdir), threshold=1000)
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=set_keys, args=(str(tmpdir), f"p{i}", 50))
+            for i in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert cache._file_count == 200
+
     def test_prune_old_entries(self):
         threshold = 2 * len(self.sample_pairs) - 1
         cache = self.cache_factory(threshold=threshold)
@@ -220,3 +284,559 @@ class TestFileSystemCache(CommonTests, ClearTests, HasTests, SerializerTests):
         cache.set("expiring", "value", timeout=1)
         sleep(2)
         assert cache.has("expiring") is False
+
+    def test_index_counts_files(self, tmpdir):
+        cache = FileSystemCache(tmpdir, use_index=True)
+        assert cache.set_many(self.sample_pairs)
+        assert cache.set_many(self.sample_pairs)
+        assert cache._file_count == len(self.sample_pairs)
+        assert cache.delete("bacon")
+        assert cache._file_count == len(self.sample_pairs) - 1
+        assert cache.clear()
+        assert cache._file_count == 0
+
+    def test_index_prunes_without_opening_files(self, tmpdir):
+        threshold = len(self.sample_pairs) - 1
+        cache = FileSystemCache(tmpdir, threshold=threshold, use_index=True)
+        for k, v in self.sample_pairs.items():
+            assert cache.set(f"{k}-t1", v, timeout=1)
+        sleep(2)
+        with patch.object(cache, "_safe_stream_open", side_effect=AssertionError):
+            assert cache.set("new", "value")
+        assert cache._file_count == 1
+        assert len(list(cache._list_dir())) == 1
+
+    def test_index_prunes_oldest(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=3, use_index=True)
+        for i in range(10):
+            assert cache.set(f"key-{i}", i, timeout=10 + i)
+        assert cache._file_count <= 4
+        assert cache.get("key-9") == 9
+        assert not cache.has("key-0")
+
+    def test_index_is_shared(self, tmpdir):
+        first = FileSystemCache(tmpdir, use_index=True)
+        second = FileSystemCache(tmpdir, use_index=True)
+        assert first.set_many(self.sample_pairs)
+        assert second._file_count == len(self.sample_pairs)
+        assert second.delete("bacon")
+        assert first._file_count == len(self.sample_pairs) - 1
+
+    def test_index_is_built_from_existing_files(self, tmpdir):
+        cache = FileSystemCache(tmpdir)
+        assert cache.set_many(self.sample_pairs)
+        cache = FileSystemCache(tmpdir, use_index=True)
+        assert cache._file_count == len(self.sample_pairs)
+
+    def test_index_is_compacted(self, tmpdir):
+        cache = FileSystemCache(tmpdir, use_index=True)
+        for i in range(3000):
+            assert cache.set("key", i)
+        cache._load_index()
+        assert cache._index_records < 1100
+        assert cache._file_count == 1
+        other = FileSystemCache(tmpdir, use_index=True)
+        assert other._file_count == 1
+
+    def test_index_compaction_keeps_concurrent_records(self, tmpdir):
+        cache = FileSystemCache(tmpdir, use_index=True)
+        other = FileSystemCache(tmpdir, use_index=True)
+        assert cache.set("key", 0)
+        for _ in range(1500):
+            cache._log_index(_INDEX_SET, cache._index_name(cache._get_filename("key")))
+        replay = cache._replay_index
+
+        def replay_then_set():
+            found = replay()
+            if not other.has("other"):
+                # another process writes between the replay and the compaction
+                assert other.set("other", 1)
+            return found
+
+        cache._replay_index = replay_then_set
+        cache._load_index()
+        assert cache._index_records < 1000
+        fresh = FileSystemCache(tmpdir, use_index=True)
+        assert fresh._file_count == 2
+
+    def test_index_is_shared_between_threads(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=100, use_index=True)
+
+        def work(n):
+            for i in range(400):
+                assert cache.set(f"key-{(i * n) % 150}", i)
+                if i % 3 == 0:
+                    cache.delete(f"key-{(i + n) % 150}")
+
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(work, range(1, 9)))
+        files = len(list(cache._list_dir()))
+        assert cache._file_count == files
+        assert files <= 101
+        fresh = FileSystemCache(tmpdir, use_index=True)
+        assert fresh._file_count == files
+
+    def test_shard_layout(self, tmpdir):
+        cache = FileSystemCache(tmpdir, shard_depth=2)
+        assert cache.set("foo", "bar")
+        filename = cache._get_filename("foo")
+        name = os.path.basename(filename)
+        assert filename == os.path.join(tmpdir, name[:2], name[2:4], name)
+        assert os.path.isfile(filename)
+        assert list(cache._list_dir()) == [filename]
+
+    def test_shards_are_pruned_and_cleared(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=4, shard_depth=1)
+        for i in range(10):
+            assert cache.set(f"key-{i}", i)
+        assert len(list(cache._list_dir())) <= 5
+        assert cache.get("key-9") == 9
+        assert cache.clear()
+        assert not list(cache._list_dir())
+
+    @pytest.mark.parametrize("use_index", [False, True])
+    def test_flat_files_are_migrated(self, tmpdir, use_index):
+        flat = FileSystemCache(tmpdir, use_index=use_index)
+        assert flat.set_many(self.sample_pairs)
+        cache = FileSystemCache(tmpdir, shard_depth=2, use_index=use_index)
+        assert cache.get_many(*self.sample_pairs) == list(self.sample_pairs.values())
+        assert cache._file_count == len(self.sample_pairs)
+        files = [fn for fn in os.listdir(tmpdir) if not cache._is_mgmt(fn)]
+        assert all(os.path.isdir(os.path.join(tmpdir, fn)) for fn in files)
+
+    def test_invalid_shard_depth(self, tmpdir):
+        with pytest.raises(ValueError):
+            FileSystemCache(tmpdir, shard_depth=-1)
+
+    def test_expiry_in_mtime(self, tmpdir):
+        cache = FileSystemCache(tmpdir, expiry_in_mtime=True)
+        assert cache.set("forever", "value", timeout=0)
+        assert cache.set("expiring", "value", timeout=100)
+        assert int(os.stat(cache._get_filename("forever")).st_mtime) == 0
+        expires = os.stat(cache._get_filename("expiring")).st_mtime
+        assert time() + 98 < expires <= time() + 100
+        assert cache.get("expiring") == "value"
+
+    def test_expiry_in_mtime_has_only_stats(self, tmpdir):
+        cache = FileSystemCache(tmpdir, expiry_in_mtime=True)
+        assert cache.set("forever", "value", timeout=0)
+        assert cache.set("expiring", "value", timeout=1)
+        sleep(2)
+        with patch.object(cache, "_safe_stream_open", side_effect=AssertionError):
+            assert cache.has("forever")
+            assert not cache.has("expiring")
+            assert not cache.has("missing")
+
+    def test_expiry_in_mtime_reads_older_files(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=3)
+        assert cache.set("forever", "value", timeout=0)
+        assert cache.set("expiring", "value", timeout=100)
+        assert cache.set("expired", "value", timeout=1)
+        sleep(2)
+        cache = FileSystemCache(tmpdir, threshold=3, expiry_in_mtime=True)
+        assert cache.has("forever")
+        assert cache.has("expiring")
+        assert not cache.has("expired")
+        # pruning removes the expired file only
+        assert cache.set("new", "value")
+        assert cache.set("other", "value")
+        assert cache.get_many("forever", "expiring", "expired") == [
+            "value",
+            "value",
+            None,
+        ]
+        assert not os.path.exists(cache._get_filename("expired"))
+
+    def test_expiry_in_mtime_prunes_without_opening_files(self, tmpdir):
+        threshold = len(self.sample_pairs)
+        cache = FileSystemCache(tmpdir, threshold=threshold, expiry_in_mtime=True)
+        for k, v in self.sample_pairs.items():
+            assert cache.set(f"{k}-t1", v, timeout=1)
+            assert cache.set(f"{k}-t10", v, timeout=10)
+        sleep(2)
+        with patch.object(cache, "_safe_stream_open", side_effect=AssertionError):
+            assert cache.set("new", "value")
+        for k in self.sample_pairs:
+            assert cache.has(f"{k}-t10")
+            assert not cache.has(f"{k}-t1")
+
+    def test_mmap_large_values(self, tmpdir):
+        cache = FileSystemCache(tmpdir, mmap_threshold=1024)
+        values = {
+            "small": b"x" * 10,
+            "bytes": b"x" * 100_000,
+            "bytearray": bytearray(b"y" * 100_000),
+            "nested": {"a": [bytearray(2048), bytearray(10)], "b": "text"},
+        }
+        assert cache.set_many(values)
+        assert cache.get_many(*values) == list(values.values())
+        blobs = [Blob(b"a" * 2048), Blob(b"b" * 10), Blob(b"c" * 4096)]
+        assert cache.set("blobs", blobs)
+        with open(cache._get_filename("blobs"), "rb") as f:
+            assert f.read().endswith(b"cachebuf")
+        loaded = cache.get("blobs")
+        assert [bytes(b.data) for b in loaded] == [bytes(b.data) for b in blobs]
+
+    def test_mmap_out_of_band_buffers_are_not_copied(self, tmpdir):
+        cache = FileSystemCache(tmpdir, mmap_threshold=1024)
+        assert cache.set("blob", Blob(b"z" * 10_000))
+        blob = cache.get("blob")
+        assert isinstance(blob.data.obj, mmap.mmap)
+        assert bytes(blob.data) == b"z" * 10_000
+        # replacing the file keeps the mapped value intact
+        assert cache.set("blob", Blob(b"a" * 10_000))
+        assert bytes(blob.data) == b"z" * 10_000
+        assert bytes(cache.get("blob").data) == b"a" * 10_000
+
+    def test_mmap_expired(self, tmpdir):
+        cache = FileSystemCache(tmpdir, mmap_threshold=1)
+        assert cache.set("foo", bytearray(100), timeout=1)
+        sleep(2)
+        assert cache.get("foo") is None
+
+    def test_mmap_not_used_with_custom_serializer(self, tmpdir):
+        cache = CustomSerializerCache(tmpdir, mmap_threshold=1)
+        assert not cache._uses_pickle()
+        assert cache.set("foo", "bar")
+        assert cache.get("foo") == "bar"
+
+    def test_batch_workers(self, tmpdir):
+        cache = FileSystemCache(tmpdir, batch_workers=4)
+        assert cache.set_many(self.sample_pairs) == list(self.sample_pairs)
+        keys = [*self.sample_pairs, "missing"]
+        assert cache.get_many(*keys) == [*self.sample_pairs.values(), None]
+        assert cache.has_many(*keys) == [True] * len(self.sample_pairs) + [False]
+        assert cache.delete_many("bacon", "sausage") == ["bacon", "sausage"]
+        assert cache.get_many("bacon", "brandy") == [None, "lobster"]
+        assert cache._file_count == len(self.sample_pairs) - 2
+
+    def test_batch_workers_run_concurrently(self, tmpdir):
+        cache = FileSystemCache(tmpdir, batch_workers=4)
+        cache.set_many(self.sample_pairs)
+        barrier = threading.Barrier(4, timeout=5)
+        get = cache.get
+
+        def slow_get(key):
+            barrier.wait()
+            return get(key)
+
+        cache.get = slow_get
+        keys = list(self.sample_pairs)[:4]
+        assert cache.get_many(*keys) == [self.sample_pairs[k] for k in keys]
+
+    def test_batch_workers_start_one_executor(self, tmpdir):
+        cache = FileSystemCache(tmpdir, batch_workers=2)
+        executors = []
+
+        def slow_executor(*args, **kwargs):
+            sleep(0.05)
+            executor = ThreadPoolExecutor(*args, **kwargs)
+            executors.append(executor)
+            return executor
+
+        with patch("cachelib.file.ThreadPoolExecutor", slow_executor):
+            threads = [
+                threading.Thread(target=cache.get_many, args=("a", "b"))
+                for _ in range(8)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        assert len(executors) == 1
+
+    def test_batch_workers_prune_once(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=4, batch_workers=4)
+        assert len(cache.set_many({f"key-{i}": i for i in range(10)})) == 10
+        assert cache._file_count <= 4
+
+    @pytest.mark.parametrize("use_index", [False, True])
+    def test_max_bytes(self, tmpdir, use_index):
+        cache = FileSystemCache(
+            tmpdir, threshold=0, max_bytes=20_000, use_index=use_index
+        )
+        for i in range(50):
+            assert cache.set(f"key-{i}", b"x" * 1000)
+        sizes = [os.path.getsize(fname) for fname in cache._list_dir()]
+        assert sum(sizes) <= 20_000
+        assert cache.total_bytes == sum(sizes)
+        assert cache.get("key-49") == b"x" * 1000
+
+    @pytest.mark.parametrize("use_index", [False, True])
+    def test_max_bytes_removes_large_cold_file_first(self, tmpdir, use_index):
+        cache = FileSystemCache(
+            tmpdir, threshold=0, max_bytes=50_000, use_index=use_index
+        )
+        cold = time() - 3600
+        # the index has the access time of the write
+        with patch("cachelib.file.time", return_value=cold):
+            assert cache.set("large", b"x" * 40_000, timeout=0)
+        os.utime(cache._get_filename("large"), (cold, cold))
+        for i in range(100):
+            assert cache.set(f"small-{i}", b"x" * 100)
+        assert cache.set("new", b"x" * 1000)
+        assert not cache.has("large")
+        assert all(cache.has(f"small-{i}") for i in range(100))
+
+    def test_max_bytes_index_has_access_times(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=0, max_bytes=50_000, use_index=True)
+        cold = time() - 3600
+        with patch("cachelib.file.time", return_value=cold):
+            assert cache.set("read", b"x" * 20_000, timeout=0)
+            assert cache.set("unread", b"x" * 20_000, timeout=0)
+        assert cache.get("read") == b"x" * 20_000
+        with patch("os.stat", side_effect=AssertionError):
+            assert cache.set("new", b"x" * 20_000)
+        assert cache.has("read")
+        assert not cache.has("unread")
+
+    def test_max_bytes_counts_overwrites_and_deletes(self, tmpdir):
+        cache = FileSystemCache(tmpdir, max_bytes=1_000_000)
+        assert cache.set("key", b"x" * 1000)
+        assert cache.set("key", b"x" * 5000)
+        assert cache.total_bytes == os.path.getsize(cache._get_filename("key"))
+        assert cache.delete("key")
+        assert cache.total_bytes == 0
+
+    def test_counter_is_locked_between_instances(self, tmpdir):
+        first = FileSystemCache(tmpdir, threshold=10_000)
+        second = FileSystemCache(tmpdir, threshold=10_000)
+        assert first._counter_lock is second._counter_lock
+
+        def write(cache, name):
+            for i in range(200):
+                assert cache.set(f"{name}-{i}", i)
+
+        threads = [
+            threading.Thread(target=write, args=(cache, name))
+            for cache, name in ((first, "first"), (second, "second"))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert first._file_count == 400
+
+    def test_max_bytes_counts_files_written_without_it(self, tmpdir):
+        other = FileSystemCache(tmpdir, threshold=100)
+        assert other.set("before", b"x" * 1000)
+        cache = FileSystemCache(tmpdir, max_bytes=1_000_000)
+        assert other.set("after", b"x" * 2000)
+        sizes = [os.path.getsize(fname) for fname in cache._list_dir()]
+        assert cache.total_bytes == sum(sizes)
+        assert cache.set("own", b"x" * 500)
+        sizes = [os.path.getsize(fname) for fname in cache._list_dir()]
+        assert cache.total_bytes == sum(sizes)
+
+    def test_max_bytes_is_shared(self, tmpdir):
+        first = FileSystemCache(tmpdir, max_bytes=1_000_000)
+        second = FileSystemCache(tmpdir, max_bytes=1_000_000)
+        assert first.set("first", b"x" * 1000)
+        assert second.set("second", b"x" * 1000)
+        sizes = [os.path.getsize(fname) for fname in first._list_dir()]
+        assert first.total_bytes == sum(sizes)
+
+    def test_max_bytes_rejects_larger_value(self, tmpdir):
+        cache = FileSystemCache(tmpdir, max_bytes=1000)
+        assert not cache.set("key", b"x" * 2000)
+        assert not cache.has("key")
+        assert cache.total_bytes == 0
+        assert not list(cache._list_dir())
+
+    @pytest.mark.parametrize("use_index", [False, True])
+    def test_max_bytes_larger_value_removes_old_value(self, tmpdir, use_index):
+        cache = FileSystemCache(tmpdir, max_bytes=1000, use_index=use_index)
+        assert cache.set("key", b"x" * 100)
+        assert not cache.set("key", b"x" * 2000)
+        assert cache.get("key") is None
+        assert cache.total_bytes == 0
+        assert not list(cache._list_dir())
+
+    def test_read_updates_access_time(self, tmpdir):
+        cache = FileSystemCache(tmpdir, max_bytes=1_000_000, expiry_in_mtime=True)
+        assert cache.set("key", "value", timeout=100)
+        filename = cache._get_filename("key")
+        mtime = os.stat(filename).st_mtime
+        cold = time() - 3600
+        os.utime(filename, (cold, mtime))
+        assert cache.get("key") == "value"
+        assert os.stat(filename).st_atime > cold + 3000
+        assert os.stat(filename).st_mtime == mtime
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="looks up replaced files")
+    @pytest.mark.parametrize("use_tmpfile", [False, True])
+    def test_set_detects_replaced_files(self, tmpdir, use_tmpfile):
+        cache = FileSystemCache(tmpdir)
+        cache._use_tmpfile = use_tmpfile
+        assert cache.set("key", 1)
+        with patch("os.stat", side_effect=AssertionError):
+            with patch("os.chmod", side_effect=AssertionError):
+                assert cache.set("key", 2)
+                assert cache.set("other", 3)
+        assert cache._file_count == 2
+        assert cache.get("key") == 2
+        assert sorted(os.listdir(tmpdir)) == sorted(
+            [cache._fs_count_file, *(os.path.basename(f) for f in cache._list_dir())]
+        )
+        assert os.stat(cache._get_filename("key")).st_mode & 0o777 == 0o600
+
+    @pytest.mark.parametrize("use_tmpfile", [False, True])
+    @pytest.mark.parametrize("shard_depth", [0, 1])
+    def test_relative_cache_dir(self, tmpdir, monkeypatch, use_tmpfile, shard_depth):
+        monkeypatch.chdir(tmpdir)
+        cache = FileSystemCache("relcache", shard_depth=shard_depth)
+        cache._use_tmpfile = use_tmpfile
+        assert cache.set("key", 1)
+        assert cache.set("key", 2)
+        assert cache.set("other", 3)
+        assert cache.get("key") == 2
+        assert cache._file_count == 2
+        assert cache.delete("key")
+        assert not cache.has("key")
+        assert cache.get("other") == 3
+        assert [f for f in os.listdir("relcache") if f.startswith("tmp")] == []
+
+    @pytest.mark.parametrize(
+        "options", [{}, {"shard_depth": 1}, {"use_index": True}], ids=str
+    )
+    def test_eviction_samples(self, tmpdir, options):
+        cache = FileSystemCache(tmpdir, threshold=10, eviction_samples=5, **options)
+        with patch.object(cache, "_remove_older", side_effect=AssertionError):
+            with patch.object(cache, "_remove_expired", side_effect=AssertionError):
+                for i in range(50):
+                    assert cache.set(f"key-{i}", i)
+        assert cache._file_count <= 11
+        assert len(list(cache._list_dir())) == cache._file_count
+        assert cache.get("key-49") == 49
+
+    def test_eviction_samples_index_positions(self, tmpdir):
+        cache = FileSystemCache(
+            tmpdir, threshold=20, eviction_samples=5, use_index=True
+        )
+        for i in range(100):
+            assert cache.set(f"key-{i % 30}", i)
+            if i % 7 == 0:
+                cache.delete(f"key-{i % 11}")
+        cache._load_index()
+        assert sorted(cache._index_names) == sorted(cache._index)
+        assert all(
+            cache._index_names[pos] == name
+            for name, pos in cache._index_positions.items()
+        )
+
+    def test_eviction_samples_without_listing_shards(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=10, eviction_samples=5, shard_depth=1)
+        with patch.object(cache, "_scan_dir", side_effect=AssertionError):
+            for i in range(50):
+                assert cache.set(f"key-{i}", i)
+        assert cache._file_count <= 11
+
+    def test_eviction_samples_prefer_expired_and_cold(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=4, eviction_samples=10)
+        assert cache.set("expired", 0, timeout=1)
+        assert cache.set("cold", 0)
+        assert cache.set("hot-1", 1)
+        assert cache.set("hot-2", 2)
+        cold = time() - 3600
+        os.utime(cache._get_filename("cold"), (cold, cold))
+        sleep(2)
+        assert cache.set("new-1", 1)
+        assert cache.set("new-2", 2)
+        assert not cache.has("expired")
+        assert cache.set("new-3", 3)
+        assert not cache.has("cold")
+        assert all(cache.has(k) for k in ("hot-1", "hot-2", "new-1", "new-2"))
+
+    def test_eviction_samples_cover_whole_directory(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=0, eviction_samples=5)
+        for i in range(1500):
+            assert cache.set(f"key-{i}", i)
+        positions = {path: i for i, path in enumerate(cache._list_dir())}
+        picked = [positions[path] for _ in range(200) for path, *_ in cache._sample()]
+        assert max(picked) > 1100
+
+    def test_eviction_samples_use_index_access_times(self, tmpdir):
+        cache = FileSystemCache(
+            tmpdir, threshold=2, eviction_samples=10, use_index=True
+        )
+        assert cache.set("cold", 0)
+        assert cache.set("hot", 1)
+        cold = time() - 3600
+        # the file system didn't update the access time of the hot file
+        os.utime(cache._get_filename("hot"), (cold, cold))
+        name = cache._index_name(cache._get_filename("cold"))
+        cache._log_index(_INDEX_ACCESS, name, accessed=int(cold))
+        assert cache.set("new", 2)
+        assert cache.set("newer", 3)
+        assert not cache.has("cold")
+        assert all(cache.has(k) for k in ("hot", "new", "newer"))
+
+    def test_eviction_samples_with_max_bytes(self, tmpdir):
+        cache = FileSystemCache(
+            tmpdir, threshold=0, max_bytes=20_000, eviction_samples=5
+        )
+        for i in range(50):
+            assert cache.set(f"key-{i}", b"x" * 1000)
+        assert cache.total_bytes <= 21_100
+        sizes = [os.path.getsize(fname) for fname in cache._list_dir()]
+        assert cache.total_bytes == sum(sizes)
+
+    def test_janitor_prunes(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=10, janitor_interval=0.1)
+        assert cache.set("expiring", 0, timeout=1)
+        for i in range(30):
+            assert cache.set(f"key-{i}", i)
+        # the write path doesn't prune while the janitor is enabled
+        assert cache._file_count == 31
+        sleep(2)
+        assert cache._file_count <= 10
+        assert not cache.has("expiring")
+
+    def test_janitor_stops_with_cache(self, tmpdir):
+        cache = FileSystemCache(tmpdir, janitor_interval=0.1)
+        janitor = cache._janitor
+        assert janitor.is_alive()
+        del cache
+        gc.collect()
+        janitor.join(timeout=2)
+        assert not janitor.is_alive()
+
+    def test_prune_on_set_disabled(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=5, prune_on_set=False)
+        with patch.object(cache, "_over_threshold", side_effect=AssertionError):
+            for i in range(20):
+                assert cache.set(f"key-{i}", i)
+        assert len(list(cache._list_dir())) == 20
+
+    def test_prune_command(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=5, shard_depth=1, prune_on_set=False)
+        assert cache.set("expiring", 0, timeout=1)
+        for i in range(20):
+            assert cache.set(f"key-{i}", i)
+        sleep(2)
+        main(["prune", str(tmpdir), "--threshold", "5", "--shard-depth", "1"])
+        assert len(list(cache._list_dir())) == 5
+        assert cache._file_count == 5
+        assert not cache.has("expiring")
+
+    def test_prune_command_runs_as_module(self, tmpdir):
+        cache = FileSystemCache(tmpdir, threshold=0)
+        assert cache.set("expiring", 0, timeout=1)
+        assert cache.set("forever", 0, timeout=0)
+        sleep(2)
+        subprocess.run(
+            [sys.executable, "-m", "cachelib", "prune", str(tmpdir)], check=True
+        )
+        assert [os.path.basename(f) for f in cache._list_dir()] == [
+            os.path.basename(cache._get_filename("forever"))
+        ]
+
+    def test_listing_skips_mgmt_files_without_hashing(self, tmpdir):
+        cache = self.cache_factory()
+        assert cache.set_many(self.sample_pairs)
+        legacy = cache._hash_method(cache._fs_count_file.encode()).hexdigest()
+        open(os.path.join(tmpdir, legacy), "wb").close()
+        with patch.object(cache, "_hash_method", side_effect=AssertionError):
+            files = list(cache._list_dir())
+        assert len(files) == len(self.sample_pairs)
+        assert all(os.path.basename(f) != legacy for f in files)
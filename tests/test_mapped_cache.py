@@ -0,0 +1,207 @@
+import multiprocessing
+import threading
+from time import sleep
+from unittest.mock import patch
+
+import pytest
+from clear import ClearTests
+from common import CommonTests
+from has import HasTests
+from serializer import SerializerTests
+
+from cachelib import MappedFileCache
+from cachelib.mapped import _COUNT
+from cachelib.mapped import _COUNT_OFFSET
+from cachelib.serializers import BaseSerializer
+
+
+class SillySerializer(BaseSerializer):
+    """A pointless serializer only for testing"""
+
+    def dumps(self, value):
+        return repr(value).encode()
+
+    def loads(self, bvalue):
+        return eval(bvalue.decode())
+
+
+class CustomCache(MappedFileCache):
+    """Our custom cache client with non-default serializer"""
+
+    # overwrite serializer
+    serializer = SillySerializer()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+@pytest.fixture(autouse=True, params=[MappedFileCache, CustomCache])
+def cache_factory(request, tmp_path):
+    def _factory(self, *args, **kwargs):
+        kwargs.setdefault("path", str(tmp_path / "cache"))
+        return request.param(*args, **kwargs)
+
+    request.cls.cache_factory = _factory
+
+
+def increment(path, n):
+    cache = MappedFileCache(str(path))
+    for _ in range(n):
+        cache.inc("count")
+    cache.set(f"worker-{multiprocessing.current_process().name}", n)
+
+
+class TestMappedFileCache(CommonTests, ClearTests, HasTests, SerializerTests):
+    def test_instances_share_items(self):
+        cache = self.cache_factory()
+        other = self.cache_factory()
+        assert cache.set("foo", "bar")
+        assert other.get("foo") == "bar"
+        assert other.delete("foo")
+        assert not cache.has("foo")
+
+    def test_processes_share_items(self, tmp_path):
+        cache = MappedFileCache(str(tmp_path / "cache"))
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=increment, args=(tmp_path / "cache", 100))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert cache.get("count") == 400
+        assert cache.get_many(*(f"worker-{w.name}" for w in workers)) == [100] * 4
+
+    def test_reopen(self, tmp_path):
+        cache = self.cache_factory()
+        assert cache.set_many({"a": 1, "b": 2})
+        assert cache.delete("b")
+        del cache
+        cache = self.cache_factory()
+        assert cache.get_many("a", "b") == [1, None]
+
+    def test_threshold(self):
+        cache = self.cache_factory(threshold=5)
+        for i in range(20):
+            assert cache.set(f"key-{i}", i)
+        assert sum(cache.has_many(*(f"key-{i}" for i in range(20)))) == 5
+        assert cache.get("key-19") == 19
+
+    def test_read_items_get_a_second_chance(self):
+        cache = self.cache_factory(threshold=4)
+        for i in range(4):
+            assert cache.set(f"key-{i}", i)
+        assert cache.get("key-0") == 0
+        for i in range(4, 7):
+            assert cache.set(f"key-{i}", i)
+        assert cache.has("key-0")
+        assert not cache.has("key-1")
+
+    def test_evicts_when_the_arena_is_full(self):
+        cache = self.cache_factory(max_bytes=4096)
+        for i in range(100):
+            assert cache.set(f"key-{i}", "x" * 100)
+        assert cache.get("key-99") == "x" * 100
+        assert not cache.has("key-0")
+        assert 0 < sum(cache.has_many(*(f"key-{i}" for i in range(100)))) < 40
+
+    def test_evicts_expired_items(self):
+        cache = self.cache_factory(threshold=2)
+        assert cache.set("a", 1, timeout=1)
+        assert cache.set("b", 2)
+        assert cache.get("a") == 1
+        sleep(2)
+        assert cache.set("c", 3)
+        assert cache.get_many("a", "b", "c") == [None, 2, 3]
+
+    def test_value_too_large(self):
+        cache = self.cache_factory(max_bytes=4096)
+        assert cache.set("small", 1)
+        assert cache.set("large", "x" * 5000) is False
+        assert cache.get("small") == 1
+
+    def test_set_fails_if_value_is_not_serialized(self):
+        cache = self.cache_factory()
+        with patch.object(cache.serializer, "dumps", return_value=None):
+            assert cache.set("foo", "bar") is False
+        assert not cache.has("foo")
+
+    @pytest.mark.parametrize("stored", [0, 2])
+    def test_count_out_of_step_is_repaired(self, stored):
+        cache = self.cache_factory(threshold=4)
+        for i in range(stored):
+            assert cache.set(f"key-{i}", i, timeout=0)
+            # read items get a second chance, so a pass frees nothing
+            assert cache.get(f"key-{i}") == i
+        # a writer died before it updated the count
+        _COUNT.pack_into(cache._map, _COUNT_OFFSET, 4)
+        assert cache.set("foo", "bar")
+        assert cache.get("foo") == "bar"
+        assert _COUNT.unpack_from(cache._map, _COUNT_OFFSET)[0] == stored + 1
+        assert all(cache.has(f"key-{i}") for i in range(stored))
+
+    def test_overwrite_with_other_size(self):
+        cache = self.cache_factory()
+        assert cache.set("foo", "x")
+        assert cache.set("foo", "x" * 1000)
+        assert cache.set("foo", "y")
+        assert cache.get("foo") == "y"
+
+    def test_deleted_slots_are_reused(self):
+        cache = self.cache_factory(threshold=4)
+        for i in range(100):
+            assert cache.set(f"key-{i}", i)
+            assert cache.delete(f"key-{i}")
+        assert cache.set("foo", "bar")
+        assert cache.get("foo") == "bar"
+
+    def test_interrupted_write(self):
+        cache = self.cache_factory()
+        assert cache.set("foo", "bar")
+        slot = cache._probe(*cache._locate("foo"))[0]
+        pos = cache._slot_pos(slot)
+        seq = int.from_bytes(cache._map[pos : pos + 4], "little")
+        cache._map[pos : pos + 4] = (seq | 1).to_bytes(4, "little")
+        assert cache.get("foo") is None
+        assert cache.set("foo", "baz")
+        assert cache.get("foo") == "baz"
+
+    def test_reads_during_writes(self):
+        cache = self.cache_factory(threshold=64, max_bytes=8192)
+        values = {f"key-{i}": [i] * (i % 7) for i in range(64)}
+        stop = threading.Event()
+        seen = []
+
+        def read():
+            while not stop.is_set():
+                for key, value in values.items():
+                    got = cache.get(key)
+                    if got is not None and got != value:
+                        seen.append((key, got))
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for _ in range(20):
+            assert cache.set_many(values)
+        stop.set()
+        reader.join()
+        assert seen == []
+
+    def test_different_layout(self, tmp_path):
+        self.cache_factory(threshold=32)
+        with pytest.raises(ValueError):
+            self.cache_factory(threshold=64)
+        with pytest.raises(ValueError):
+            MappedFileCache(str(tmp_path / "cache"), threshold=64)
+
+    def test_not_a_cache_file(self, tmp_path):
+        path = tmp_path / "other"
+        path.write_bytes(b"some other file")
+        with pytest.raises(ValueError):
+            self.cache_factory(path=str(path))
+
+    def test_invalid_threshold(self):
+        with pytest.raises(ValueError):
+            self.cache_factory(threshold=0)
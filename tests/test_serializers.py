@@ -7,6 +7,7 @@ from cachelib.serializers import BaseRedisSerializer
 from cachelib.serializers import BaseSerializer
 from cachelib.serializers import JSONSerializer
 from cachelib.serializers import RedisSerializer
+from cachelib.serializers import ReferenceSerializer
 from cachelib.serializers import ValkeySerializer
 
 PICKLE_VALUES = [
@@ -142,3 +143,49 @@ class TestJSONSerializer:
 
     def test_load_invalid_stream_returns_none(self):
         assert self.s.load(io.BytesIO(b"not valid json {{{{")) is None
+
+
+class TestReferenceSerializer:
+    @pytest.mark.parametrize("value", PICKLE_VALUES)
+    @pytest.mark.parametrize("copy", ["none", "shallow", "on-read"])
+    def test_dumps_loads_roundtrip(self, copy, value):
+        s = ReferenceSerializer(copy=copy)
+        assert s.loads(s.dumps(value)) == value
+
+    def test_no_copy_returns_same_object(self):
+        s = ReferenceSerializer()
+        value = {"a": [1]}
+        assert s.loads(s.dumps(value)) is value
+
+    def test_shallow_copy(self):
+        s = ReferenceSerializer(copy="shallow")
+        value = {"a": [1]}
+        stored = s.dumps(value)
+        value["b"] = 2
+        loaded = s.loads(stored)
+        assert loaded == {"a": [1]}
+        loaded["c"] = 3
+        assert s.loads(stored) == {"a": [1]}
+
+    def test_copy_on_read(self):
+        s = ReferenceSerializer(copy="on-read")
+        stored = s.dumps({"a": [1]})
+        s.loads(stored)["a"].append(2)
+        assert s.loads(stored) == {"a": [1]}
+
+    @pytest.mark.parametrize(
+        "value", [None, 1, "text", b"raw", (1, ("a", frozenset({2.5})))]
+    )
+    def test_immutable_only_accepts_immutable_values(self, value):
+        s = ReferenceSerializer(immutable_only=True)
+        assert s.dumps(value) is value
+
+    @pytest.mark.parametrize("value", [[], {}, (1, []), {1}, object()])
+    def test_immutable_only_rejects_mutable_values(self, value):
+        s = ReferenceSerializer(immutable_only=True)
+        with pytest.raises(TypeError):
+            s.dumps(value)
+
+    def test_invalid_copy_mode(self):
+        with pytest.raises(ValueError):
+            ReferenceSerializer(copy="deep")
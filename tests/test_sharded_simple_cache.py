@@ -0,0 +1,122 @@
+import threading
+from time import sleep
+
+import pytest
+from clear import ClearTests
+from common import CommonTests
+from has import HasTests
+from serializer import SerializerTests
+
+from cachelib import ShardedSimpleCache
+from cachelib.eviction import LRUPolicy
+from cachelib.serializers import BaseSerializer
+
+
+class SillySerializer(BaseSerializer):
+    """A pointless serializer only for testing"""
+
+    def dumps(self, value):
+        return repr(value).encode()
+
+    def loads(self, bvalue):
+        return eval(bvalue.decode())
+
+
+class CustomCache(ShardedSimpleCache):
+    """Our custom cache client with non-default serializer"""
+
+    # overwrite serializer
+    serializer = SillySerializer()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+@pytest.fixture(autouse=True, params=[ShardedSimpleCache, CustomCache])
+def cache_factory(request):
+    def _factory(self, *args, **kwargs):
+        return request.param(*args, **kwargs)
+
+    request.cls.cache_factory = _factory
+
+
+class TestShardedSimpleCache(CommonTests, HasTests, ClearTests, SerializerTests):
+    def test_shards_use_cache_serializer(self):
+        cache = self.cache_factory(shards=4)
+        for shard in cache._shards:
+            assert shard.serializer is cache.serializer
+
+    def test_keys_are_spread_over_shards(self):
+        cache = self.cache_factory(shards=4)
+        for i in range(100):
+            cache.set(f"key-{i}", i)
+        assert all(shard._cache for shard in cache._shards)
+        assert sum(len(shard._cache) for shard in cache._shards) == 100
+
+    def test_threshold_is_split_between_shards(self):
+        cache = self.cache_factory(threshold=100, shards=8)
+        assert all(shard._threshold == 13 for shard in cache._shards)
+        for i in range(1000):
+            cache.set(f"key-{i}", i)
+        assert all(len(shard._cache) <= 14 for shard in cache._shards)
+
+    def test_max_bytes_is_split_between_shards(self):
+        cache = self.cache_factory(shards=4, max_bytes=4000)
+        assert all(shard._max_bytes == 1000 for shard in cache._shards)
+        for i in range(100):
+            cache.set(f"key-{i}", "x" * 100)
+        assert 0 < cache.total_bytes <= 4000
+
+    def test_janitor_cleans_up_all_shards(self):
+        cache = self.cache_factory(shards=4, janitor_interval=0.1)
+        assert all(
+            shard._janitor is cache._shards[0]._janitor for shard in cache._shards
+        )
+        cache.set_many({f"key-{i}": i for i in range(100)}, timeout=0.1)
+        sleep(2)
+        assert not any(shard._cache for shard in cache._shards)
+
+    def test_eviction_policy_class_per_shard(self):
+        cache = self.cache_factory(shards=4, eviction_policy=LRUPolicy)
+        policies = [shard._policy for shard in cache._shards]
+        assert all(isinstance(p, LRUPolicy) for p in policies)
+        assert len(set(map(id, policies))) == 4
+
+    def test_eviction_policy_instance_is_copied_per_shard(self):
+        policy = LRUPolicy()
+        cache = self.cache_factory(shards=4, eviction_policy=policy)
+        policies = [shard._policy for shard in cache._shards]
+        assert all(isinstance(p, LRUPolicy) and p is not policy for p in policies)
+        assert len(set(map(id, policies))) == 4
+
+    def test_eviction_policy_factory_per_shard(self):
+        cache = self.cache_factory(shards=4, eviction_policy=lambda: LRUPolicy())
+        assert all(isinstance(shard._policy, LRUPolicy) for shard in cache._shards)
+
+    def test_invalid_shards(self):
+        with pytest.raises(ValueError):
+            self.cache_factory(shards=0)
+
+    def test_concurrent_set_get(self):
+        cache = self.cache_factory(threshold=10_000)
+        num_threads = 8
+        barrier = threading.Barrier(num_threads)
+        errors = []
+
+        def worker(thread_id: int) -> None:
+            barrier.wait()
+            for i in range(200):
+                key = f"thread-{thread_id}-key-{i}"
+                cache.set(key, i)
+                if cache.get(key) != i:
+                    errors.append(key)
+
+        threads = [
+            threading.Thread(target=worker, args=(t,)) for t in range(num_threads)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors
@@ -0,0 +1,160 @@
+import multiprocessing
+
+import pytest
+from clear import ClearTests
+from common import CommonTests
+from has import HasTests
+from serializer import SerializerTests
+
+from cachelib import SharedMemoryCache
+from cachelib.serializers import BaseSerializer
+
+
+class SillySerializer(BaseSerializer):
+    """A pointless serializer only for testing"""
+
+    def dumps(self, value):
+        return repr(value).encode()
+
+    def loads(self, bvalue):
+        return eval(bvalue.decode())
+
+
+class CustomCache(SharedMemoryCache):
+    """Our custom cache client with non-default serializer"""
+
+    # overwrite serializer
+    serializer = SillySerializer()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+@pytest.fixture(autouse=True, params=[SharedMemoryCache, CustomCache])
+def cache_factory(request, tmp_path):
+    def _factory(self, *args, **kwargs):
+        kwargs.setdefault("name", str(tmp_path / "cache"))
+        return request.param(*args, **kwargs)
+
+    request.cls.cache_factory = _factory
+
+
+def increment(path, n):
+    cache = SharedMemoryCache(str(path))
+    for _ in range(n):
+        cache.inc("count")
+    cache.set(f"worker-{multiprocessing.current_process().name}", n)
+
+
+class TestSharedMemoryCache(CommonTests, ClearTests, HasTests, SerializerTests):
+    def test_instances_share_items(self, tmp_path):
+        cache = self.cache_factory()
+        other = self.cache_factory()
+        assert cache.set("foo", "bar")
+        assert other.get("foo") == "bar"
+        assert other.delete("foo")
+        assert not cache.has("foo")
+
+    def test_processes_share_items(self, tmp_path):
+        cache = SharedMemoryCache(str(tmp_path / "cache"))
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=increment, args=(tmp_path / "cache", 100))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert cache.get("count") == 400
+        assert cache.get_many(*(f"worker-{w.name}" for w in workers)) == [100] * 4
+
+    def test_threshold(self):
+        cache = self.cache_factory(threshold=8, stripes=1)
+        for i in range(20):
+            assert cache.set(f"key-{i}", i)
+        assert sum(cache.has_many(*(f"key-{i}" for i in range(20)))) == 8
+        assert cache.get("key-19") == 19
+
+    def test_keeps_threshold_items_of_many(self):
+        cache = self.cache_factory(threshold=1000, stripes=1)
+        for i in range(5000):
+            assert cache.set(f"key-{i}", i)
+        kept = sum(cache.has_many(*(f"key-{i}" for i in range(5000))))
+        # evicting by count leaves no room for a key to be dropped early
+        assert 990 <= kept <= 1000
+        assert cache.get_many(*(f"key-{i}" for i in range(4990, 5000))) == list(
+            range(4990, 5000)
+        )
+
+    def test_evicts_least_recently_used(self):
+        cache = self.cache_factory(threshold=4, stripes=1)
+        for i in range(4):
+            cache.set(f"key-{i}", i)
+        cache.get("key-0")
+        cache.set("key-4", 4)
+        assert cache.has("key-0")
+        assert not cache.has("key-1")
+
+    def test_evicts_expired_first(self):
+        cache = self.cache_factory(threshold=4, stripes=1)
+        for i in range(4):
+            cache.set(f"key-{i}", i, timeout=-1 if i == 2 else 0)
+        cache.set("key-4", 4)
+        assert cache.get_many(*(f"key-{i}" for i in range(5))) == [0, 1, None, 3, 4]
+
+    def test_max_bytes(self):
+        cache = self.cache_factory(max_bytes=4096, page_size=4096)
+        for i in range(20):
+            assert cache.set(f"key-{i}", b"x" * 900)
+        values = cache.get_many(*(f"key-{i}" for i in range(20)))
+        assert 0 < sum(v is not None for v in values) < 20
+        assert values[-1] == b"x" * 900
+        assert cache.set("small", 1)
+        assert cache.get("small") == 1
+
+    def test_pages_move_between_sizes(self):
+        cache = self.cache_factory(max_bytes=2 * 4096, page_size=4096)
+        for step in range(10):
+            size = 900 if step % 2 else 90
+            for i in range(30):
+                assert cache.set(f"key-{step}-{i}", b"x" * size)
+            assert cache.get(f"key-{step}-29") == b"x" * size
+
+    def test_value_too_large(self):
+        cache = self.cache_factory(page_size=4096)
+        assert cache.set("foo", "bar")
+        assert cache.set("foo", b"x" * 4096) is False
+        assert not cache.has("foo")
+
+    def test_overwrite_with_other_size(self):
+        cache = self.cache_factory()
+        for size in (10, 1000, 100, 10_000, 10):
+            assert cache.set("foo", b"x" * size)
+            assert cache.get("foo") == b"x" * size
+
+    def test_deleted_slots_are_reused(self):
+        cache = self.cache_factory(threshold=4, stripes=1)
+        for _ in range(10):
+            for i in range(4):
+                assert cache.set(f"key-{i}", i)
+            for i in range(4):
+                assert cache.delete(f"key-{i}")
+        for i in range(4):
+            cache.set(f"key-{i}", i)
+        assert cache.get_many(*(f"key-{i}" for i in range(4))) == [0, 1, 2, 3]
+
+    def test_different_layout(self, tmp_path):
+        self.cache_factory(threshold=32)
+        with pytest.raises(ValueError):
+            self.cache_factory(threshold=64)
+
+    def test_not_a_cache_file(self, tmp_path):
+        path = tmp_path / "other"
+        path.write_bytes(b"some other file")
+        with pytest.raises(ValueError):
+            self.cache_factory(name=str(path))
+
+    def test_invalid_stripes(self):
+        with pytest.raises(ValueError):
+            self.cache_factory(stripes=0)
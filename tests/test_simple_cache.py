@@ -1,5 +1,7 @@
+import gc
 import threading
 from time import sleep
+from time import time
 
 import pytest
 from clear import ClearTests
@@ -8,7 +10,9 @@ from has import HasTests
 from serializer import SerializerTests
 
 from cachelib import SimpleCache
+from cachelib.eviction import LFUPolicy
 from cachelib.serializers import BaseSerializer
+from cachelib.serializers import ReferenceSerializer
 
 
 class SillySerializer(BaseSerializer):
@@ -58,6 +62,226 @@ class TestSimpleCache(CommonTests, HasTests, ClearTests, SerializerTests):
             assert f"{k}-t5.0" in cache._cache.keys()
             assert f"{k}-t0.1" not in cache._cache.keys()
 
+    def test_lru_evicts_least_recently_used(self):
+        cache = self.cache_factory(threshold=3, eviction_policy="lru")
+        for k in ("a", "b", "c"):
+            assert cache.set(k, k)
+        # refresh "a" so that "b" becomes the least recently used item
+        assert cache.get("a") == "a"
+        assert cache.set("d", "d")
+        assert cache.set("e", "e")
+        assert set(cache._cache) == {"c", "a", "d", "e"}
+        assert cache.get("b") is None
+
+    def test_lru_set_refreshes_existing_key(self):
+        cache = self.cache_factory(threshold=2, eviction_policy="lru")
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("a", 3)
+        cache.set("c", 4)
+        cache.set("d", 5)
+        assert "b" not in cache._cache
+        assert cache.get("a") == 3
+
+    @pytest.mark.parametrize(
+        "policy", ["expires", "lru", "lfu", "w-tinylfu", "arc", "greedy-dual-size"]
+    )
+    def test_eviction_policy_threshold(self, policy):
+        cache = self.cache_factory(threshold=10, eviction_policy=policy)
+        for i in range(100):
+            assert cache.set(f"key-{i}", i)
+            cache.get(f"key-{i // 2}")
+        assert len(cache._cache) <= 11
+        cache.delete("key-99")
+        assert cache.clear()
+        assert cache._policy.victim() is None
+
+    def test_eviction_policy_class(self):
+        cache = self.cache_factory(threshold=2, eviction_policy=LFUPolicy)
+        assert isinstance(cache._policy, LFUPolicy)
+        assert cache._policy.capacity == 2
+
+    def test_eviction_policy_instance(self):
+        policy = LFUPolicy()
+        cache = self.cache_factory(threshold=2, eviction_policy=policy)
+        assert cache._policy is policy
+        assert policy.capacity == 2
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        cache.set("d", 4)
+        assert "b" not in cache._cache
+
+    def test_reference_serializer_skips_pickling(self):
+        cache = self.cache_factory()
+        cache.serializer = ReferenceSerializer()
+        value = {"a": [1, 2, 3]}
+        assert cache.set("key", value)
+        assert cache.get("key") is value
+        assert cache.inc("count") == 1
+        assert cache.get("count") == 1
+
+    def test_reference_serializer_copy_on_read(self):
+        cache = self.cache_factory()
+        cache.serializer = ReferenceSerializer(copy="on-read")
+        cache.set("key", {"a": [1]})
+        cache.get("key")["a"].append(2)
+        assert cache.get("key") == {"a": [1]}
+
+    def test_reference_serializer_counts_strings_in_bytes(self):
+        cache = self.cache_factory()
+        cache.serializer = ReferenceSerializer()
+        cache.set("ascii", "x" * 100)
+        cache.set("text", "\u00e9" * 100)
+        assert cache.total_bytes == 300
+
+    def test_total_bytes(self):
+        cache = self.cache_factory()
+        assert cache.total_bytes == 0
+        cache.set("a", "x" * 100)
+        cache.set("b", "y" * 200)
+        expected = sum(size for _, _, size in cache._cache.values())
+        assert cache.total_bytes == expected > 300
+        cache.set("a", "z")
+        cache.delete("b")
+        assert cache.total_bytes == cache._cache["a"][2]
+        cache.clear()
+        assert cache.total_bytes == 0
+
+    def test_max_bytes(self):
+        size = len(type(self.cache_factory()).serializer.dumps("x" * 1000))
+        cache = self.cache_factory(max_bytes=5 * size, eviction_policy="lru")
+        for i in range(20):
+            assert cache.set(f"key-{i}", "x" * 1000)
+            assert cache.total_bytes <= 5 * size
+        assert set(cache._cache) == {f"key-{i}" for i in range(15, 20)}
+
+    def test_max_bytes_overwrite_frees_old_value(self):
+        size = len(type(self.cache_factory()).serializer.dumps("x" * 1000))
+        cache = self.cache_factory(max_bytes=2 * size)
+        cache.set("a", "x" * 1000)
+        cache.set("b", "x" * 1000)
+        cache.set("b", "y" * 1000)
+        assert set(cache._cache) == {"a", "b"}
+
+    def test_max_bytes_refuses_oversized_values(self):
+        cache = self.cache_factory(max_bytes=100)
+        assert cache.set("small", "x")
+        assert cache.set("large", "x")
+        assert not cache.set("large", "x" * 1000)
+        assert not cache.add("other", "x" * 1000)
+        assert cache.get("small") == "x"
+        assert cache.get("large") is None
+
+    def test_set_many_prunes_once(self, monkeypatch):
+        cache = self.cache_factory(threshold=5)
+        calls = []
+        prune = cache._prune
+        monkeypatch.setattr(cache, "_prune", lambda: calls.append(prune()))
+        assert cache.set_many(self.sample_pairs) == list(self.sample_pairs)
+        assert len(calls) == 1
+        assert len(cache._cache) == 5
+
+    def test_get_many_refreshes_lru(self):
+        cache = self.cache_factory(threshold=3, eviction_policy="lru")
+        cache.set_many({"a": 1, "b": 2, "c": 3})
+        assert cache.get_many("a", "missing", "b") == [1, None, 2]
+        cache.set_many({"d": 4})
+        assert set(cache._cache) == {"a", "b", "d"}
+
+    def test_batch_operations_skip_expired_keys(self):
+        cache = self.cache_factory()
+        cache.set_many({"short": 1}, timeout=0.1)
+        cache.set_many({"long": 2}, timeout=60)
+        sleep(1.5)
+        assert cache.get_many("short", "long") == [None, 2]
+        assert cache.has_many("short", "long") == [False, True]
+        assert cache.delete_many("short", "long", "missing") == ["short", "long"]
+        assert cache.total_bytes == 0
+
+    def test_set_many_skips_oversized_values(self):
+        cache = self.cache_factory(max_bytes=100)
+        cache.set("large", "x")
+        assert cache.set_many({"small": "x", "large": "x" * 1000}) == ["small"]
+        assert cache.get_many("small", "large") == ["x", None]
+
+    def test_janitor_removes_expired_items(self):
+        cache = self.cache_factory(janitor_interval=0.1)
+        cache.set_many({f"key-{i}": i for i in range(1000)}, timeout=0.1)
+        cache.set("forever", 1, timeout=0)
+        sleep(2)
+        assert set(cache._cache) == {"forever"}
+
+    def test_janitor_enforces_threshold(self):
+        cache = self.cache_factory(threshold=10, janitor_interval=0.1)
+        for i in range(1000):
+            assert cache.set(f"key-{i}", i)
+        sleep(1)
+        assert len(cache._cache) == 10
+
+    def test_janitor_stops_with_cache(self):
+        cache = self.cache_factory(janitor_interval=0.1)
+        janitor = cache._janitor
+        assert janitor.is_alive()
+        del cache
+        gc.collect()
+        janitor.join(timeout=2)
+        assert not janitor.is_alive()
+
+    def test_clean_up_in_slices(self, monkeypatch):
+        cache = self.cache_factory(threshold=10, janitor_interval=60)
+        monkeypatch.setattr(cache, "_janitor_slice", 7)
+        for i in range(100):
+            assert cache.set(f"key-{i}", i)
+        # the write path doesn't prune while the janitor is enabled
+        assert len(cache._cache) == 100
+        cache._clean_up()
+        assert len(cache._cache) == 10
+
+    def test_invalid_eviction_policy(self):
+        with pytest.raises(ValueError):
+            self.cache_factory(eviction_policy="random")
+        with pytest.raises(ValueError):
+            self.cache_factory(eviction_policy=dict)
+
+    def test_prune_keeps_non_expiring_entries(self):
+        cache = self.cache_factory(threshold=4)
+        cache.set("forever", "value", timeout=0)
+        for i in range(3):
+            cache.set(f"short-{i}", i, timeout=0.1)
+        sleep(1.5)
+        cache.set("trigger-1", 1)
+        cache.set("trigger-2", 2)
+        assert set(cache._cache) == {"forever", "trigger-1", "trigger-2"}
+
+    def test_expiry_index_ignores_stale_entries(self):
+        cache = self.cache_factory(threshold=2)
+        cache.set("a", 1, timeout=0.1)
+        # overwriting the key leaves a stale entry with the old expiry
+        cache.set("a", 2, timeout=60)
+        cache.set("b", 3, timeout=60)
+        sleep(1.5)
+        cache._remove_expired(time())
+        assert cache.get("a") == 2
+
+    @pytest.mark.parametrize("policy", ["expires", "lru"])
+    def test_expiry_index_is_compacted(self, policy):
+        cache = self.cache_factory(eviction_policy=policy)
+        for i in range(1000):
+            cache.set("key", i)
+        heap = cache._policy._heap if policy == "expires" else cache._expiry_heap
+        assert len(heap) <= 2 * len(cache._cache) + 64
+
+    def test_expires_policy_keeps_the_only_expiry_index(self):
+        cache = self.cache_factory(threshold=1)
+        cache.set("expiring", 1, timeout=1)
+        cache.set("forever", 2, timeout=0)
+        assert not cache._expiry_heap
+        sleep(1.5)
+        cache.set("new", 3)
+        assert set(cache._cache) == {"forever", "new"}
+
     def test_threshold_zero_defaults_to_500(self):
         """SimpleCache(threshold=0) should silently use 500, not 0."""
         cache = self.cache_factory(threshold=0)
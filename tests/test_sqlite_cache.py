@@ -0,0 +1,176 @@
+import multiprocessing
+import os
+import sqlite3
+import threading
+from time import perf_counter
+from time import sleep
+from unittest.mock import patch
+
+import pytest
+from clear import ClearTests
+from common import CommonTests
+from has import HasTests
+from serializer import SerializerTests
+
+from cachelib import SqliteCache
+from cachelib.serializers import BaseSerializer
+
+
+class SillySerializer(BaseSerializer):
+    """A pointless serializer only for testing"""
+
+    def dumps(self, value):
+        return repr(value).encode()
+
+    def loads(self, bvalue):
+        return eval(bvalue.decode())
+
+
+class CustomCache(SqliteCache):
+    """Our custom cache client with non-default serializer"""
+
+    # overwrite serializer
+    serializer = SillySerializer()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+@pytest.fixture(autouse=True, params=[SqliteCache, CustomCache])
+def cache_factory(request, tmp_path):
+    def _factory(self, *args, **kwargs):
+        return request.param(str(tmp_path / "cache.db"), *args, **kwargs)
+
+    request.cls.cache_factory = _factory
+
+
+def increment(path, n):
+    cache = SqliteCache(path)
+    for _ in range(n):
+        cache.inc("count")
+
+
+class TestSqliteCache(CommonTests, ClearTests, HasTests, SerializerTests):
+    def test_wal_mode(self):
+        cache = self.cache_factory()
+        mode = cache._connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+    def test_threshold(self):
+        cache = self.cache_factory(threshold=5)
+        for i in range(20):
+            assert cache.set(f"key-{i}", i)
+        assert sum(cache.has_many(*(f"key-{i}" for i in range(20)))) == 5
+        assert cache.get("key-19") == 19
+
+    def test_threshold_evicts_least_recently_used(self):
+        cache = self.cache_factory(threshold=3, touch_interval=0)
+        for i in range(3):
+            cache.set(f"key-{i}", i)
+        cache.get("key-0")
+        cache.set("key-3", 3)
+        assert cache.has("key-0")
+        assert not cache.has("key-1")
+
+    def test_touch_interval(self):
+        cache = self.cache_factory(threshold=3)
+        for i in range(3):
+            cache.set(f"key-{i}", i)
+        cache.get("key-0")
+        cache.set("key-3", 3)
+        assert not cache.has("key-0")
+
+    def test_read_does_not_wait_for_writers(self, tmp_path):
+        cache = self.cache_factory(busy_timeout=2.0, touch_interval=0)
+        cache.set("foo", "bar")
+        other = sqlite3.connect(str(tmp_path / "cache.db"), isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            start = perf_counter()
+            assert cache.get("foo") == "bar"
+            assert perf_counter() - start < 1
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+
+    def test_threshold_removes_expired_first(self):
+        cache = self.cache_factory(threshold=3)
+        cache.set("key-0", 0, timeout=0)
+        cache.set("key-1", 1, timeout=1)
+        cache.set("key-2", 2, timeout=0)
+        sleep(2)
+        cache.set("key-3", 3)
+        assert cache.get_many("key-0", "key-1", "key-2", "key-3") == [0, None, 2, 3]
+
+    def test_no_threshold(self):
+        cache = self.cache_factory(threshold=0)
+        cache.set_many({f"key-{i}": i for i in range(1000)})
+        assert all(cache.has_many(*(f"key-{i}" for i in range(1000))))
+
+    def test_add_replaces_expired(self):
+        cache = self.cache_factory()
+        cache.set("foo", "bar", timeout=1)
+        sleep(2)
+        assert cache.add("foo", "baz")
+        assert cache.get("foo") == "baz"
+
+    def test_set_fails_if_value_is_not_serialized(self):
+        cache = self.cache_factory()
+        with patch.object(cache.serializer, "dumps", return_value=None):
+            assert cache.set("foo", "bar") is False
+        assert not cache.has("foo")
+
+    def test_count_survives_reopening(self, tmp_path):
+        cache = self.cache_factory(threshold=10)
+        cache.set_many({f"key-{i}": i for i in range(10)})
+        cache.delete("key-0")
+        cache = self.cache_factory(threshold=10)
+        cache.set("key-10", 10)
+        assert all(cache.has_many(*(f"key-{i}" for i in range(1, 11))))
+
+    def test_large_batches(self):
+        cache = self.cache_factory(threshold=0)
+        mapping = {f"key-{i}": i for i in range(2000)}
+        assert cache.set_many(mapping) == list(mapping)
+        assert cache.get_many(*mapping) == list(mapping.values())
+        assert len(cache.delete_many(*mapping)) == 2000
+
+    def test_threads(self):
+        cache = self.cache_factory()
+
+        def work():
+            for _ in range(50):
+                cache.inc("count")
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert cache.get("count") == 200
+
+    @pytest.mark.skipif(
+        not os.path.isdir("/proc/self/fd"), reason="counts open files in /proc"
+    )
+    def test_threads_close_their_connections(self):
+        cache = self.cache_factory()
+        cache.set("foo", "bar")
+        before = len(os.listdir("/proc/self/fd"))
+        for _ in range(50):
+            thread = threading.Thread(target=cache.get, args=("foo",))
+            thread.start()
+            thread.join()
+        assert len(os.listdir("/proc/self/fd")) <= before + 2
+
+    def test_processes(self, tmp_path):
+        cache = SqliteCache(str(tmp_path / "cache.db"))
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=increment, args=(str(tmp_path / "cache.db"), 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert cache.get("count") == 200